@@ -66,6 +66,8 @@ from cola import git
 from cola import gitcfg
 from cola import inotify
 from cola import i18n
+from cola import lazy
+from cola import perf
 from cola import qtcompat
 from cola import qtutils
 from cola import resources
@@ -77,9 +79,11 @@ from cola.i18n import N_
 from cola.interaction import Interaction
 from cola.models import main
 from cola.widgets import cfgactions
-from cola.widgets import startup
 from cola.settings import Session
 
+# The startup dialog is only needed when no repository is found
+startup = lazy.module('cola.widgets.startup')
+
 
 def setup_environment():
     # Allow Ctrl-C to exit
@@ -193,6 +197,10 @@ class ColaApplication(object):
         else:
             self._app = QtCore.QCoreApplication(argv)
 
+    def current(self):
+        """Return the wrapped QApplication"""
+        return self._app
+
     def activeWindow(self):
         """Wrap activeWindow()"""
         return self._app.activeWindow()
@@ -245,6 +253,21 @@ class ColaQApplication(QtGui.QApplication):
         self.view.save_state(settings=session)
 
 
+class FirstPaintFilter(QtCore.QObject):
+    """Records the first paint event for the startup profiler"""
+
+    def __init__(self, app):
+        QtCore.QObject.__init__(self)
+        self.app = app
+        app.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QtCore.QEvent.Paint:
+            perf.mark('first paint')
+            self.app.removeEventFilter(self)
+        return False
+
+
 def process_args(args):
     if args.version:
         # Accept 'git cola --version' or 'git cola version'
@@ -286,22 +309,40 @@ def application_init(args, update=False):
     """
     # Ensure that we're working in a valid git repository.
     # If not, try to find one.  When found, chdir there.
+    if args.profile:
+        perf.enable()
+    perf.mark('imports')
+
     setup_environment()
     process_args(args)
 
     app = new_application(args)
+    perf.mark('application')
+
     model = new_model(app, args.repo, prompt=args.prompt)
+    perf.mark('model init')
     if update:
         model.update_status()
+        perf.mark_once('first update_status')
     cfg = gitcfg.current()
     return ApplicationContext(args, app, cfg, model)
 
 
 def application_start(context, view):
     """Show the GUI and start the main event loop"""
+    perf.mark('view')
+    if perf.enabled():
+        first_paint = FirstPaintFilter(context.app.current())
+    else:
+        first_paint = None
+
     # Store the view for session management
     context.app.set_view(view)
 
+    # Show the last known status while the first scan runs
+    if context.model.restore_snapshot():
+        perf.mark('snapshot')
+
     # Make sure that we start out on top
     view.show()
     view.raise_()
@@ -324,6 +365,7 @@ def application_start(context, view):
     inotify.stop()
     QtCore.QThreadPool.globalInstance().waitForDone()
     del task
+    del first_paint
 
     pattern = utils.tmp_file_pattern()
     for filename in glob.glob(pattern):
@@ -345,6 +387,10 @@ def add_common_arguments(parser):
     parser.add_argument('--prompt', action='store_true', default=False,
                         help='prompt for a repository')
 
+    # Report how long each stage of startup takes
+    parser.add_argument('--profile', action='store_true', default=False,
+                        help='report startup timings on stderr')
+
     # Resume an X Session Management session
     parser.add_argument('-session', metavar='<session>', default=None,
                         help=argparse.SUPPRESS)
@@ -379,6 +425,7 @@ def _start_update_thread(model):
     class UpdateTask(QtCore.QRunnable):
         def run(self):
             model.update_status(update_index=True)
+            perf.mark_once('first update_status')
 
     # Hold onto a reference to prevent PyQt from dereferencing
     task = UpdateTask()
@@ -0,0 +1,244 @@
+"""Fetches remotes periodically in the background
+
+Each remote is fetched every "cola.autofetchinterval" minutes.  A remote
+that fails to fetch is retried with an exponential backoff that is capped
+at "cola.autofetchbackoff" minutes.  Fetches run on a background thread
+through cola.remoteops so that they never hold the index lock.
+
+The ahead/behind counts of local branches are computed in the same thread
+after every fetch and whenever a ref changes.  Widgets read them from the
+cache without forking.
+
+"""
+from __future__ import division, absolute_import, unicode_literals
+
+import threading
+import time
+
+from cola import core
+from cola import gitcfg
+from cola import gitcmds
+from cola import remoteops
+from cola.decorators import memoize
+from cola.git import popen_extra
+from cola.git import trace
+from cola.i18n import N_
+
+
+INTERVAL = 'cola.autofetchinterval'
+BACKOFF = 'cola.autofetchbackoff'
+DEFAULT_BACKOFF = 60
+
+# Background fetches must fail instead of waiting for a password
+FETCH_ENV = {'GIT_TERMINAL_PROMPT': '0'}
+
+
+def _minutes(name, default):
+    """Return a config value in minutes, or the default when invalid"""
+    try:
+        return int(gitcfg.current().get(name, default) or default)
+    except (TypeError, ValueError):
+        return default
+
+
+def interval():
+    """Return the fetch interval in seconds, 0 when disabled"""
+    return max(0, _minutes(INTERVAL, 0)) * 60
+
+
+def max_backoff():
+    """Return the longest delay after a failed fetch in seconds"""
+    return max(1, _minutes(BACKOFF, DEFAULT_BACKOFF)) * 60
+
+
+def enabled_remotes(config=None):
+    """Return the remotes that "git fetch --all" would fetch"""
+    if config is None:
+        config = gitcfg.current()
+    return [remote for remote in gitcmds.ref_state().remotes
+            if not config.get('remote.%s.skipfetchall' % remote, False)]
+
+
+@memoize
+def tracking():
+    """Return the ahead/behind cache shared by all widgets"""
+    return AheadBehind()
+
+
+def ahead_behind(branch, state=None):
+    """Return the cached (ahead, behind) counts for a branch, or None"""
+    return tracking().counts(branch, state=state)
+
+
+def describe(counts):
+    """Return a description of (ahead, behind) counts"""
+    ahead, behind = counts
+    if not ahead and not behind:
+        return N_('Up to date with upstream')
+    return (N_('%(ahead)d ahead, %(behind)d behind upstream') %
+            dict(ahead=ahead, behind=behind))
+
+
+class AheadBehind(object):
+    """Caches the ahead/behind counts of local branches
+
+    Counts are stored with the commits they were computed for, so a count
+    is only returned while the branch and its upstream are unchanged.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}  # branch -> (key, ahead, behind)
+        self._sha1s = {}  # refname -> object id when last updated
+
+    def _key(self, state, branch):
+        upstream = state.upstreams.get(branch)
+        if not upstream:
+            return None
+        return (state.sha1('refs/heads/' + branch), state.sha1(upstream))
+
+    def counts(self, branch, state=None):
+        """Return (ahead, behind) for a branch without forking, or None"""
+        if state is None:
+            state = gitcmds.ref_state()
+        key = self._key(state, branch)
+        with self._lock:
+            entry = self._counts.get(branch)
+        if key is None or entry is None or entry[0] != key:
+            return None
+        return entry[1:]
+
+    def stale(self, state=None):
+        """Are there branches whose counts need to be computed?"""
+        if state is None:
+            state = gitcmds.ref_state()
+        return any(self.counts(branch, state=state) is None
+                   for branch in state.upstreams)
+
+    def update(self):
+        """Compute the counts of every branch with an upstream
+
+        A single "git for-each-ref" reports the counts of all branches.
+        It is run directly so that it does not wait on the index lock.
+        Returns True when a count or a branch changed since the last call.
+
+        """
+        cmd = ['git', 'for-each-ref', '--format=' + gitcmds.RefState.FORMAT,
+               'refs/heads', 'refs/remotes']
+        status, out, err = core.run_command(cmd, **popen_extra())
+        trace(cmd, status, out, err)
+        if status != 0:
+            return False
+        state = gitcmds.RefState()
+        state.parse(out)
+        counts = {}
+        for branch, (ahead, behind) in state.tracking.items():
+            counts[branch] = (self._key(state, branch), ahead, behind)
+        with self._lock:
+            changed = counts != self._counts or state.sha1s != self._sha1s
+            self._counts = counts
+            self._sha1s = state.sha1s
+        return changed
+
+
+class Remote(object):
+    """The fetch schedule of one remote"""
+
+    def __init__(self, name, due):
+        self.name = name
+        self.due = due
+        self.failures = 0
+
+
+class Scheduler(object):
+    """Fetches remotes on a schedule from a background thread
+
+    `on_update` is called from the background thread whenever a fetch
+    or a local change alters the branches or their ahead/behind counts.
+    Its argument tells whether a fetch ran.
+
+    """
+    POLL = 5.0
+
+    def __init__(self, interval, max_backoff, remotes=enabled_remotes,
+                 fetch=None, cache=None, on_update=None, clock=time.time):
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.remotes = remotes
+        self.fetch = fetch or self._fetch
+        self.cache = cache or tracking()
+        self.on_update = on_update
+        self.clock = clock
+        self.schedule = {}  # name -> Remote
+        self._stop = threading.Event()
+        self._running = False
+
+    @staticmethod
+    def _fetch(remote):
+        result = remoteops.run(remoteops.FETCH, remote,
+                               write_fetch_head=False, add_env=FETCH_ENV)
+        return result.status == 0
+
+    def due(self):
+        """Return the remotes that should be fetched now"""
+        now = self.clock()
+        names = self.remotes()
+        for name in list(self.schedule):
+            if name not in names:
+                del self.schedule[name]
+        result = []
+        for name in names:
+            remote = self.schedule.get(name)
+            if remote is None:
+                remote = self.schedule[name] = Remote(name, now)
+            if remote.due <= now:
+                result.append(remote)
+        return result
+
+    def record(self, remote, ok):
+        """Schedule the next fetch of a remote"""
+        now = self.clock()
+        if ok:
+            remote.failures = 0
+            remote.due = now + self.interval
+        else:
+            remote.failures += 1
+            delay = self.interval * (2 ** remote.failures)
+            remote.due = now + min(delay, self.max_backoff)
+
+    def run_pending(self):
+        """Fetch the remotes that are due and refresh the counts"""
+        fetched = False
+        for remote in self.due():
+            if self._stop.is_set():
+                return
+            self.record(remote, self.fetch(remote.name))
+            fetched = True
+        if fetched or self.cache.stale():
+            changed = self.cache.update()
+            if changed and self.on_update is not None:
+                self.on_update(fetched)
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        # Each thread gets its own event so that a stopped thread never
+        # resumes when the scheduler is started again
+        self._stop = threading.Event()
+        thread = threading.Thread(target=self._run, args=(self._stop,))
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._running = False
+
+    def _run(self, stop):
+        while not stop.is_set():
+            try:
+                self.run_pending()
+            except (OSError, IOError):
+                pass
+            stop.wait(self.POLL)
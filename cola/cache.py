@@ -0,0 +1,211 @@
+"""Provides bounded in-memory and on-disk caches"""
+from __future__ import division, absolute_import, unicode_literals
+
+import json
+import os
+import threading
+import time
+
+from cola import core
+
+
+# Indexes into the [prev, next, key, value] linked-list entries
+_PREV = 0
+_NEXT = 1
+_KEY = 2
+_VALUE = 3
+
+
+class LRUCache(object):
+    """A thread-safe mapping that evicts the least recently used entries
+
+    Entries are kept in a circular doubly-linked list so that lookups,
+    insertions and evictions are O(1).  A maxsize of None disables eviction.
+
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._lock = threading.RLock()
+        self._data = {}
+        self._root = root = []
+        root[:] = [root, root, None, None]
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Return the value for `key` and mark it as recently used"""
+        with self._lock:
+            try:
+                link = self._data[key]
+            except KeyError:
+                return default
+            self._unlink(link)
+            self._append(link)
+            return link[_VALUE]
+
+    def put(self, key, value):
+        """Store `value` under `key`, evicting the oldest entry when full"""
+        with self._lock:
+            link = self._data.get(key)
+            if link is not None:
+                self._unlink(link)
+                link[_VALUE] = value
+            else:
+                link = [None, None, key, value]
+                self._data[key] = link
+            self._append(link)
+            if self.maxsize is not None:
+                while len(self._data) > self.maxsize:
+                    self.pop(self._root[_NEXT][_KEY])
+
+    def pop(self, key, default=None):
+        """Remove `key` and return its value"""
+        with self._lock:
+            try:
+                link = self._data.pop(key)
+            except KeyError:
+                return default
+            self._unlink(link)
+            return link[_VALUE]
+
+    def prune(self, predicate):
+        """Remove all entries whose key satisfies `predicate`"""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                self.pop(key)
+
+    def keys(self):
+        """Return the keys ordered from least to most recently used"""
+        with self._lock:
+            keys = []
+            link = self._root[_NEXT]
+            while link is not self._root:
+                keys.append(link[_KEY])
+                link = link[_NEXT]
+            return keys
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            root = self._root
+            root[:] = [root, root, None, None]
+
+    def _append(self, link):
+        root = self._root
+        last = root[_PREV]
+        link[_PREV] = last
+        link[_NEXT] = root
+        last[_NEXT] = root[_PREV] = link
+
+    def _unlink(self, link):
+        prev_link, next_link = link[_PREV], link[_NEXT]
+        prev_link[_NEXT] = next_link
+        next_link[_PREV] = prev_link
+
+
+class DiskCache(object):
+    """A size-bounded directory of cached files with expiry times
+
+    Each entry is stored in a data file named after its key along with a
+    "<key>.json" file that records when it expires and the validator,
+    e.g. an HTTP ETag, that can be used to refresh it.  Keys must be safe
+    to use as filenames.  The least recently used entries are removed once
+    the data files exceed maxbytes.
+
+    """
+
+    def __init__(self, path, maxbytes=4*1024*1024):
+        self.path = path
+        self.maxbytes = maxbytes
+        self._lock = threading.RLock()
+
+    def _data_path(self, key):
+        return os.path.join(self.path, key)
+
+    def _meta_path(self, key):
+        return os.path.join(self.path, key + '.json')
+
+    def get(self, key):
+        """Return (data, metadata) for `key`, or (None, None)"""
+        with self._lock:
+            try:
+                with core.xopen(self._data_path(key), 'rb') as f:
+                    data = f.read()
+                with core.xopen(self._meta_path(key), 'rt') as f:
+                    meta = json.load(f)
+            except (IOError, OSError, ValueError):
+                return (None, None)
+            # Mark the entry as recently used
+            try:
+                os.utime(core.mkpath(self._data_path(key)), None)
+            except OSError:
+                pass
+            return (data, meta)
+
+    def put(self, key, data, expires, validator=None):
+        """Store `data` under `key` until the `expires` timestamp"""
+        with self._lock:
+            if not core.isdir(self.path):
+                core.makedirs(self.path)
+            self._write(self._data_path(key), data, 'wb')
+            self._write_meta(key, expires, validator)
+            self.prune()
+
+    def touch(self, key, expires, validator=None):
+        """Extend the lifetime of an entry that was revalidated"""
+        with self._lock:
+            if core.exists(self._data_path(key)):
+                self._write_meta(key, expires, validator)
+
+    def prune(self):
+        """Remove the least recently used entries beyond maxbytes"""
+        with self._lock:
+            entries = []
+            total = 0
+            try:
+                names = os.listdir(core.mkpath(self.path))
+            except OSError:
+                return
+            for name in names:
+                name = core.decode(name)
+                if name.endswith('.json') or name.endswith('.tmp'):
+                    continue
+                try:
+                    st = core.stat(self._data_path(name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, name))
+                total += st.st_size
+            entries.sort()
+            for mtime, size, name in entries:
+                if total <= self.maxbytes:
+                    break
+                for path in (self._data_path(name), self._meta_path(name)):
+                    try:
+                        core.unlink(path)
+                    except OSError:
+                        pass
+                total -= size
+
+    @staticmethod
+    def is_fresh(meta, now=None):
+        if now is None:
+            now = time.time()
+        return bool(meta) and meta.get('expires', 0) > now
+
+    def _write_meta(self, key, expires, validator):
+        meta = {'expires': expires, 'validator': validator}
+        self._write(self._meta_path(key), json.dumps(meta), 'wt')
+
+    def _write(self, path, content, mode):
+        tmp_path = path + '.tmp'
+        with core.xopen(tmp_path, mode) as f:
+            f.write(content)
+        if core.exists(path):
+            core.unlink(path)
+        os.rename(core.mkpath(tmp_path), core.mkpath(path))
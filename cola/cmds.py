@@ -1,8 +1,11 @@
 from __future__ import division, absolute_import, unicode_literals
 
+import collections
 import os
+import shutil
 import subprocess
 import sys
+import threading
 from fnmatch import fnmatch
 from io import StringIO
 
@@ -13,13 +16,14 @@ except ImportError:
 
 from cola import compat
 from cola import core
+from cola import diffparse
 from cola import gitcfg
 from cola import gitcmds
 from cola import inotify
 from cola import utils
 from cola import difftool
 from cola import resources
-from cola.diffparse import DiffParser
+from cola.decorators import memoize
 from cola.git import STDOUT
 from cola.i18n import N_
 from cola.interaction import Interaction
@@ -40,6 +44,12 @@ class BaseCommand(object):
     """Base class for all commands; provides the command pattern"""
 
     DISABLED = False
+    # Commands that only run git and update the model can run in the
+    # background.  See CommandQueue.
+    ASYNC = False
+    # Commands that only read from the repository set MUTATES = False so
+    # that they run right away instead of waiting for queued commands.
+    MUTATES = True
 
     def __init__(self):
         self.undoable = False
@@ -212,7 +222,8 @@ class ApplyDiffSelection(Command):
         self.apply_to_worktree = apply_to_worktree
 
     def do(self):
-        parser = DiffParser(self.model.filename, self.model.diff_text)
+        parser = diffparse.diff_parser(self.model.filename,
+                                       self.model.diff_text)
         if self.has_selection:
             patch = parser.generate_patch(self.first_line_idx,
                                           self.last_line_idx,
@@ -282,20 +293,26 @@ class Archive(BaseCommand):
         self.fmt = fmt
         self.prefix = prefix
         self.filename = filename
+        self.ok = False
+        # Optional callbacks used by core.stream_command()
+        self.progress = None
+        self.cancelled = None
 
     def do(self):
-        fp = core.xopen(self.filename, 'wb')
         cmd = ['git', 'archive', '--format='+self.fmt]
         if self.fmt in ('tgz', 'tar.gz'):
             cmd.append('-9')
         if self.prefix:
             cmd.append('--prefix=' + self.prefix)
         cmd.append(self.ref)
-        proc = core.start_command(cmd, stdout=fp)
-        out, err = proc.communicate()
-        fp.close()
-        status = proc.returncode
-        Interaction.log_status(status, out or '', err or '')
+        status, err = core.stream_command(cmd, self.filename,
+                                          progress=self.progress,
+                                          cancelled=self.cancelled)
+        self.ok = status == 0
+        if status is None:
+            Interaction.log(N_('Saving "%s" was cancelled.') % self.filename)
+        else:
+            Interaction.log_status(status, '', err)
 
 
 class Checkout(Command):
@@ -305,6 +322,7 @@ class Checkout(Command):
     'argv' is handed off directly to git.
 
     """
+    ASYNC = True
 
     def __init__(self, argv, checkout_branch=False):
         Command.__init__(self)
@@ -344,6 +362,8 @@ class CherryPick(Command):
 class ResetMode(Command):
     """Reset the mode and clear the model's diff text."""
 
+    MUTATES = False
+
     def __init__(self):
         Command.__init__(self)
         self.new_mode = self.model.mode_none
@@ -357,6 +377,7 @@ class ResetMode(Command):
 class Commit(ResetMode):
     """Attempt to create a new commit."""
 
+    MUTATES = True
     SHORTCUT = 'Ctrl+Return'
 
     def __init__(self, amend, msg, sign, no_verify=False):
@@ -571,6 +592,14 @@ class RemoveFiles(Command):
             self.model.update_file_status()
 
 
+def remove_path(path):
+    """Remove a file, or a directory tree for collapsed "dir/" entries"""
+    if path.endswith('/') and core.isdir(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
 class Delete(RemoveFiles):
     """Delete files."""
 
@@ -578,7 +607,7 @@ class Delete(RemoveFiles):
     ALT_SHORTCUT = 'Ctrl+Backspace'
 
     def __init__(self, filenames):
-        RemoveFiles.__init__(self, os.remove, filenames)
+        RemoveFiles.__init__(self, remove_path, filenames)
 
     def do(self):
         files = self.filenames
@@ -665,22 +694,33 @@ class DeleteRemoteBranch(Command):
 class Diff(Command):
     """Perform a diff and set the model's current text."""
 
+    MUTATES = False
+
     def __init__(self, filename, cached=False, deleted=False):
         Command.__init__(self)
-        opts = {}
-        if cached:
-            opts['ref'] = self.model.head
         self.new_filename = filename
         self.new_mode = self.model.mode_worktree
-        self.new_diff_text = gitcmds.diff_helper(filename=filename,
-                                                 cached=cached,
-                                                 deleted=deleted,
-                                                 **opts)
+        self.new_diff_text = self.diff_text_for(filename, self.model.head,
+                                                cached=cached,
+                                                deleted=deleted)
+
+    @staticmethod
+    def diff_text_for(filename, head, cached=False, deleted=False):
+        """Return the diff text for filename; safe to call from threads"""
+        opts = {}
+        if cached:
+            opts['ref'] = head
+        return gitcmds.diff_helper(filename=filename,
+                                   cached=cached,
+                                   deleted=deleted,
+                                   **opts)
 
 
 class Diffstat(Command):
     """Perform a diffstat and set the model's diff text."""
 
+    MUTATES = False
+
     def __init__(self):
         Command.__init__(self)
         cfg = gitcfg.current()
@@ -705,6 +745,8 @@ class DiffStaged(Diff):
 
 class DiffStagedSummary(Command):
 
+    MUTATES = False
+
     def __init__(self):
         Command.__init__(self)
         diff = self.model.git.diff(self.model.head,
@@ -1198,24 +1240,23 @@ class RevertEditsCommand(ConfirmAction):
         return False
 
     def checkout_args(self):
+        """Return the (args, paths) to hand to git checkout"""
         args = []
         s = selection.selection()
         if self.checkout_from_head():
             args.append(self.model.head)
-        args.append('--')
 
         if s.staged:
             items = s.staged
         else:
             items = s.modified
-        args.extend(items)
 
-        return args
+        return (args, items)
 
     def action(self):
-        git = self.model.git
-        checkout_args = self.checkout_args()
-        return git.checkout(*checkout_args)
+        args, paths = self.checkout_args()
+        return gitcmds.pathspec_op('checkout', paths, args=args,
+                                   git=self.model.git)
 
     def success(self):
         self.model.update_file_status()
@@ -1347,6 +1388,8 @@ class RunConfigAction(Command):
 
 class SetDiffText(Command):
 
+    MUTATES = False
+
     def __init__(self, text):
         Command.__init__(self)
         self.undoable = True
@@ -1356,6 +1399,8 @@ class SetDiffText(Command):
 class ShowUntracked(Command):
     """Show an untracked file."""
 
+    MUTATES = False
+
     def __init__(self, filename):
         Command.__init__(self)
         self.new_filename = filename
@@ -1363,6 +1408,8 @@ class ShowUntracked(Command):
         self.new_diff_text = self.diff_text_for(filename)
 
     def diff_text_for(self, filename):
+        if filename.endswith('/'):
+            return self.directory_text_for(filename)
         cfg = gitcfg.current()
         size = cfg.get('cola.readsize', 1024 * 2)
         try:
@@ -1375,6 +1422,41 @@ class ShowUntracked(Command):
             result += '...'
         return result
 
+    def directory_text_for(self, path, limit=100):
+        """List the contents of a collapsed untracked directory"""
+        contents = gitcmds.untracked_files(paths=[path])
+        suffix = len(contents) > 1 and 's' or ''
+        io = StringIO()
+        io.write('# %s untracked file%s in %s\n' %
+                 (len(contents), suffix, path))
+        for filename in contents[:limit]:
+            io.write(filename + '\n')
+        if len(contents) > limit:
+            io.write('...\n')
+        return io.getvalue()
+
+
+class ExpandUntracked(Command):
+    """List the contents of collapsed untracked directories."""
+
+    def __init__(self, paths):
+        Command.__init__(self)
+        self.paths = [p for p in paths if p.endswith('/')]
+
+    def do(self):
+        self.model.expand_untracked(self.paths)
+
+
+class CollapseUntracked(Command):
+    """Show an expanded untracked directory as a single entry."""
+
+    def __init__(self, path):
+        Command.__init__(self)
+        self.path = path
+
+    def do(self):
+        self.model.collapse_untracked(self.path)
+
 
 class SignOff(Command):
     SHORTCUT = 'Ctrl+I'
@@ -1412,7 +1494,9 @@ class SignOff(Command):
 
 class Stage(Command):
     """Stage a set of paths."""
+
     SHORTCUT = 'Ctrl+S'
+    ASYNC = True
 
     @staticmethod
     def name():
@@ -1543,6 +1627,7 @@ class Unstage(Command):
     """Unstage a set of paths."""
 
     SHORTCUT = 'Ctrl+S'
+    ASYNC = True
 
     @staticmethod
     def name():
@@ -1562,6 +1647,8 @@ class Unstage(Command):
 class UnstageAll(Command):
     """Unstage all files; resets the index."""
 
+    ASYNC = True
+
     def do(self):
         self.model.unstage_all()
 
@@ -1576,6 +1663,8 @@ class UnstageSelected(Unstage):
 class Untrack(Command):
     """Unstage a set of paths."""
 
+    ASYNC = True
+
     def __init__(self, paths):
         Command.__init__(self)
         self.paths = paths
@@ -1591,6 +1680,8 @@ class Untrack(Command):
 class UntrackedSummary(Command):
     """List possible .gitignore rules as the diff text."""
 
+    MUTATES = False
+
     def __init__(self):
         Command.__init__(self)
         untracked = self.model.untracked
@@ -1703,16 +1794,147 @@ class CommandDisabled(object):
         self.cmdclass.DISABLED = False
 
 
+class CommandQueue(object):
+    """Runs commands in order on a background thread
+
+    Commands that set ASYNC = True only run git and update the model, so
+    they can run off of the GUI thread.  The queue is disabled until a
+    GUI calls start(); commands run in-place until then.
+
+    Commands that are queued back to back are run inside a single
+    MainModel.defer_updates() block so that the refreshes they request
+    collapse into one, and their notifications are batched.  Commands that
+    are not ASYNC but modify the repository wait for the queue to drain
+    before running so that they run in the order in which they were issued.
+    Read-only commands run right away.
+
+    The callbacks are called from the worker thread:
+    started(cmd), finished(cmd, error) where error is None or a
+    (message, details) tuple, and idle() once the queue is empty.
+
+    """
+
+    def __init__(self):
+        self.started = None
+        self.finished = None
+        self.idle = None
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._busy = False
+        self._thread = None
+
+    def enabled(self):
+        return self._thread is not None
+
+    def in_worker(self):
+        return threading.current_thread() is self._thread
+
+    def start(self, started=None, finished=None, idle=None):
+        self.started = started
+        self.finished = finished
+        self.idle = idle
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def submit(self, cmd):
+        with self._cond:
+            self._queue.append(cmd)
+            self._busy = True
+            self._cond.notify_all()
+
+    def wait(self):
+        """Block until every queued command has finished"""
+        with self._cond:
+            while self._busy:
+                self._cond.wait()
+
+    def _next(self, block):
+        with self._cond:
+            while block and not self._queue:
+                self._cond.wait()
+            if self._queue:
+                return self._queue.popleft()
+            return None
+
+    def _run(self):
+        model = main.model()
+        while True:
+            cmd = self._next(True)
+            try:
+                with model.batch():
+                    with model.defer_updates():
+                        while cmd is not None:
+                            self._run_cmd(cmd)
+                            cmd = self._next(False)
+            except Exception as e:
+                # The refresh or an observer failed; the worker must survive
+                # so that wait() returns and later commands still run.
+                self._callback(self.finished, None, utils.format_exception(e))
+            finally:
+                idle = self._drained()
+            if idle:
+                self._callback(self.idle)
+
+    def _drained(self):
+        """Clear the busy flag unless more commands were queued"""
+        with self._cond:
+            if self._queue:
+                return False
+            self._busy = False
+            self._cond.notify_all()
+            return True
+
+    @staticmethod
+    def _callback(callback, *args):
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception:
+            pass
+
+    def _run_cmd(self, cmd):
+        self._callback(self.started, cmd)
+        error = None
+        try:
+            cmd.do()
+        except Exception as e:
+            error = utils.format_exception(e)
+        self._callback(self.finished, cmd, error)
+
+
+@memoize
+def command_queue():
+    """Return the queue used for asynchronous commands"""
+    return CommandQueue()
+
+
 def do(cls, *args, **opts):
     """Run a command in-place"""
     return do_cmd(cls(*args, **opts))
 
 
 def do_cmd(cmd):
+    """Run a command, or queue it when it can run in the background
+
+    Queued commands return None.
+
+    """
     if hasattr(cmd, 'DISABLED') and cmd.DISABLED:
         return None
+    queue = command_queue()
+    if queue.enabled() and not queue.in_worker():
+        if getattr(cmd, 'ASYNC', False):
+            queue.submit(cmd)
+            return None
+        if getattr(cmd, 'MUTATES', True):
+            queue.wait()
     try:
-        return cmd.do()
+        # Observers see the command's changes once it has finished
+        with main.model().batch():
+            return cmd.do()
     except Exception as e:
         msg, details = utils.format_exception(e)
         Interaction.critical(N_('Error'), message=msg, details=details)
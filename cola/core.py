@@ -11,6 +11,7 @@ import sys
 import itertools
 import platform
 import subprocess
+import tempfile
 
 from cola.decorators import interruptable
 from cola.compat import ustr
@@ -162,6 +163,91 @@ def run_command(cmd, encoding=None, *args, **kwargs):
     return (exit_code, output or '', errors or '')
 
 
+# Size of the chunks copied by stream_command()
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def stream_command(cmd, path, progress=None, cancelled=None,
+                   chunk_size=STREAM_CHUNK_SIZE, **kwargs):
+    """Run the given command and stream its raw output to a file.
+
+    The output is copied in fixed-size binary chunks without decoding it.
+    It is written to a temporary file next to `path` that replaces `path`
+    only when the command succeeds, so a failed or cancelled export never
+    leaves a truncated file behind.
+
+    `progress` is called with the number of bytes written after each
+    chunk.  `cancelled` is polled between chunks and the command is killed
+    when it returns True.
+
+    Returns (exit_code, errors).  exit_code is None when cancelled.
+
+    """
+    # The temporary file gets a unique name so that concurrent exports to
+    # the same path do not write into each other's output
+    dirname, basename = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(dir=mkpath(dirname or os.curdir),
+                                    prefix=mkpath('.' + basename + '.'),
+                                    suffix=mkpath('.tmp'))
+    errors_fp = tempfile.TemporaryFile()
+    written = 0
+    canceled = False
+    proc = None
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            proc = start_command(cmd, stdout=subprocess.PIPE,
+                                 stderr=errors_fp, **kwargs)
+            proc.stdin.close()
+            while True:
+                if cancelled is not None and cancelled():
+                    canceled = True
+                    proc.kill()
+                    break
+                chunk = proc.stdout.read(chunk_size)
+                if not chunk:
+                    break
+                fp.write(chunk)
+                written += len(chunk)
+                if progress is not None:
+                    progress(written)
+            proc.stdout.close()
+            exit_code = proc.wait()
+    except Exception:
+        # Do not leave a partial file behind, e.g. when the disk is full
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        errors_fp.close()
+        unlink(tmp_path)
+        raise
+
+    errors_fp.seek(0)
+    errors = decode(errors_fp.read())
+    errors_fp.close()
+
+    if canceled or exit_code != 0:
+        unlink(tmp_path)
+        return (None if canceled else exit_code, errors)
+
+    # mkstemp() creates files that only we can read
+    try:
+        mode = stat(path).st_mode & 0o7777
+    except OSError:
+        mode = _new_file_mode()
+    os.chmod(tmp_path, mode)
+    if exists(path):
+        unlink(path)
+    os.rename(tmp_path, mkpath(path))
+    return (exit_code, errors)
+
+
+def _new_file_mode():
+    """Return the mode of a new file given the current umask"""
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
 @interruptable
 def _fork_posix(args, cwd=None):
     """Launch a process in the background."""
@@ -2,7 +2,11 @@ from __future__ import division, absolute_import, unicode_literals
 
 __all__ = ('decorator', 'memoize', 'interruptable')
 
+import collections
 import errno
+import functools
+import threading
+import time
 
 
 def decorator(caller, func=None):
@@ -27,29 +31,89 @@ def decorator(caller, func=None):
         return _decorated
 
 
-def memoize(func):
+def memoize(func=None, maxsize=None, ttl=None):
     """
     A decorator for memoizing function calls
 
     http://en.wikipedia.org/wiki/Memoization
 
-    """
-    func.cache = {}
-    return decorator(_memoize, func)
+    Use @memoize for unbounded caches, e.g. singletons, or
+    @memoize(maxsize=N, ttl=seconds) to evict the least recently used
+    results and to expire results after a time.  Memoized functions are
+    safe to call from multiple threads; the function runs at most once
+    per key at a time.
 
+    The memoized function provides cache_clear(), invalidate(*args) and
+    cache_info(), which returns a CacheInfo of the hits and misses.
 
-def _memoize(func, *args, **opts):
-    """Implements memoized cache lookups"""
-    if opts: # frozenset is used to ensure hashability
-        key = args, frozenset(opts.items())
-    else:
-        key = args
-    cache = func.cache # attribute added by memoize
-    try:
-        result = cache[key]
-    except KeyError:
-        result = cache[key] = func(*args, **opts)
-    return result
+    """
+    if func is None:
+        return lambda f: memoize(f, maxsize=maxsize, ttl=ttl)
+    return Memoized(func, maxsize=maxsize, ttl=ttl)
+
+
+CacheInfo = collections.namedtuple('CacheInfo',
+                                   'hits misses maxsize currsize')
+
+
+class Memoized(object):
+    """Implements memoized cache lookups for memoize()"""
+
+    def __init__(self, func, maxsize=None, ttl=None):
+        # cola.cache depends on cola.core, which depends on this module
+        from cola.cache import LRUCache
+
+        self.func = func
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.cache = LRUCache(maxsize=maxsize)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self.__name__ = getattr(func, '__name__', 'memoized')
+        self.__doc__ = getattr(func, '__doc__', None)
+
+    @staticmethod
+    def key(args, opts):
+        if opts: # frozenset is used to ensure hashability
+            return args, frozenset(opts.items())
+        return args
+
+    def __call__(self, *args, **opts):
+        key = self.key(args, opts)
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is not None and (entry[1] is None or
+                                      entry[1] > time.time()):
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            result = self.func(*args, **opts)
+            expires = self.ttl is not None and time.time() + self.ttl or None
+            self.cache.put(key, (result, expires))
+            return result
+
+    def __get__(self, obj, objtype=None):
+        # Bind the instance when used on a method
+        if obj is None:
+            return self
+        return functools.partial(self, obj)
+
+    def invalidate(self, *args, **opts):
+        """Forget the result for one set of arguments"""
+        self.cache.pop(self.key(args, opts))
+
+    def cache_clear(self):
+        """Forget all results and reset the statistics"""
+        with self._lock:
+            self.cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def cache_info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses,
+                             self.maxsize, len(self.cache))
 
 
 @decorator
@@ -1,8 +1,9 @@
 from __future__ import division, absolute_import, unicode_literals
 
 import re
+from bisect import bisect_right
 
-from collections import defaultdict
+from cola import cache
 
 
 _HUNK_HEADER_RE = re.compile(r'^@@ -([0-9,]+) \+([0-9,]+) @@(.*)')
@@ -50,7 +51,9 @@ def _format_hunk_header(old_start, old_count,
 def _parse_diff(diff_text):
     hunks = []
     for line_idx, line in enumerate(diff_text.split('\n')):
-        match = _HUNK_HEADER_RE.match(line)
+        # Only lines starting with "@@" can be headers; skip the regex
+        # for everything else.
+        match = line.startswith('@@') and _HUNK_HEADER_RE.match(line)
         if match:
             old_start, old_count = _parse_range_str(match.group(1))
             new_start, new_count = _parse_range_str(match.group(2))
@@ -67,11 +70,36 @@ def _parse_diff(diff_text):
     return hunks
 
 
+# Parsed diffs keyed by (filename, diff_text) so that repeated selections
+# against the same diff do not reparse it.
+_parser_cache = cache.LRUCache(maxsize=4)
+
+
+def diff_parser(filename, diff_text):
+    """Return a DiffParser for diff_text, reusing a previous parse"""
+    key = (filename, diff_text)
+    parser = _parser_cache.get(key)
+    if parser is None:
+        parser = DiffParser(filename, diff_text)
+        _parser_cache.put(key, parser)
+    return parser
+
+
 class DiffParser(object):
 
     def __init__(self, filename, diff_text):
         self.filename = filename
         self.hunks = _parse_diff(diff_text)
+        # Sorted hunk start lines used to map line indexes onto hunks
+        self._hunk_starts = [hunk.first_line_idx for hunk in self.hunks]
+
+    def hunk_index(self, line_idx):
+        """Return the index of the hunk containing line_idx
+
+        Lines before the first hunk map to the first hunk.
+
+        """
+        return max(0, bisect_right(self._hunk_starts, line_idx) - 1)
 
     def generate_patch(self, first_line_idx, last_line_idx,
                        reverse=False):
@@ -86,18 +114,16 @@ class DiffParser(object):
 
         start_offset = 0
 
-        for hunk in self.hunks:
-            # skip hunks until we get to the one that contains the first
-            # selected line
+        # Only visit the hunks that overlap the selection
+        begin = self.hunk_index(first_line_idx)
+        end = bisect_right(self._hunk_starts, last_line_idx)
+
+        for hunk in self.hunks[begin:end]:
             if hunk.last_line_idx < first_line_idx:
                 continue
-            # once we have processed the hunk that contains the last selected
-            # line, we can stop
-            if hunk.first_line_idx > last_line_idx:
-                break
 
             prev_skipped = False
-            counts = defaultdict(int)
+            additions = deletions = context = 0
             filtered_lines = []
 
             for line_idx, line in enumerate(hunk.lines[1:],
@@ -124,16 +150,21 @@ class DiffParser(object):
                     # the "No newline" line as well.
                     continue
                 filtered_lines.append(line_type + line_content)
-                counts[line_type] += 1
+                if line_type == ADDITION:
+                    additions += 1
+                elif line_type == DELETION:
+                    deletions += 1
+                elif line_type == CONTEXT:
+                    context += 1
                 prev_skipped = False
 
             # Do not include hunks that, after filtering, have only context
             # lines (no additions or deletions).
-            if not counts[ADDITION] and not counts[DELETION]:
+            if not additions and not deletions:
                 continue
 
-            old_count = counts[CONTEXT] + counts[DELETION]
-            new_count = counts[CONTEXT] + counts[ADDITION]
+            old_count = context + deletions
+            new_count = context + additions
 
             if reverse:
                 old_start = hunk.new_start
@@ -145,7 +176,7 @@ class DiffParser(object):
             if new_count == 0:
                 new_start -= 1
 
-            start_offset += counts[ADDITION] - counts[DELETION]
+            start_offset += additions - deletions
 
             lines.append(_format_hunk_header(old_start, old_count,
                                              new_start, new_count,
@@ -165,8 +196,9 @@ class DiffParser(object):
         specified line."""
         if not self.hunks:
             return None
-        for hunk in self.hunks:
-            if line_idx <= hunk.last_line_idx:
-                break
+        idx = self.hunk_index(line_idx)
+        hunk = self.hunks[idx]
+        if line_idx > hunk.last_line_idx and idx + 1 < len(self.hunks):
+            hunk = self.hunks[idx + 1]
         return self.generate_patch(hunk.first_line_idx, hunk.last_line_idx,
                                    reverse=reverse)
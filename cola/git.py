@@ -55,6 +55,49 @@ def read_git_file(path):
     return None
 
 
+def trace(command, status, out, err):
+    """Log a finished command according to GIT_COLA_TRACE"""
+    cola_trace = GIT_COLA_TRACE
+    if cola_trace == 'trace':
+        msg = 'trace: ' + subprocess.list2cmdline(command)
+        Interaction.log_status(status, msg, '')
+    elif cola_trace == 'full':
+        if out or err:
+            core.stderr("%s -> %d: '%s' '%s'" %
+                        (' '.join(command), status, out, err))
+        else:
+            core.stderr("%s -> %d" % (' '.join(command), status))
+    elif cola_trace:
+        core.stderr(' '.join(command))
+
+
+def popen_extra():
+    """Return the extra subprocess arguments used when running git"""
+    extra = {}
+    if sys.platform == 'win32':
+        # If git-cola is invoked on Windows using "start pythonw git-cola",
+        # a console window will briefly flash on the screen each time
+        # git-cola invokes git, which is very annoying.  The code below
+        # prevents this by ensuring that any window will be hidden.
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags = subprocess.STARTF_USESHOWWINDOW
+        startupinfo.wShowWindow = subprocess.SW_HIDE
+        extra['startupinfo'] = startupinfo
+
+    if hasattr(os, 'setsid'):
+        # SSH uses the SSH_ASKPASS variable only if the process is really
+        # detached from the TTY (stdin redirection and setting the
+        # SSH_ASKPASS environment variable is not enough).  To detach a
+        # process from the console it should fork and call os.setsid().
+        # Python 3 calls setsid() in the child without running Python code,
+        # which is safe while other threads are also starting processes.
+        if PY3:
+            extra['start_new_session'] = True
+        else:
+            extra['preexec_fn'] = os.setsid
+    return extra
+
+
 class Git(object):
     """
     The Git class manages communication with the Git binary
@@ -163,23 +206,7 @@ class Git(object):
         if not _cwd:
             _cwd = core.getcwd()
 
-        extra = {}
-        if sys.platform == 'win32':
-            # If git-cola is invoked on Windows using "start pythonw git-cola",
-            # a console window will briefly flash on the screen each time
-            # git-cola invokes git, which is very annoying.  The code below
-            # prevents this by ensuring that any window will be hidden.
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags = subprocess.STARTF_USESHOWWINDOW
-            startupinfo.wShowWindow = subprocess.SW_HIDE
-            extra['startupinfo'] = startupinfo
-
-        if hasattr(os, 'setsid'):
-            # SSH uses the SSH_ASKPASS variable only if the process is really
-            # detached from the TTY (stdin redirection and setting the
-            # SSH_ASKPASS environment variable is not enough).  To detach a
-            # process from the console it should fork and call os.setsid().
-            extra['preexec_fn'] = os.setsid
+        extra = popen_extra()
 
         # Start the process
         # Guard against thread-unsafe .git/index.lock files
@@ -194,18 +221,7 @@ class Git(object):
         if not _raw and out is not None:
             out = out.rstrip('\n')
 
-        cola_trace = GIT_COLA_TRACE
-        if cola_trace == 'trace':
-            msg = 'trace: ' + subprocess.list2cmdline(command)
-            Interaction.log_status(status, msg, '')
-        elif cola_trace == 'full':
-            if out or err:
-                core.stderr("%s -> %d: '%s' '%s'" %
-                            (' '.join(command), status, out, err))
-            else:
-                core.stderr("%s -> %d" % (' '.join(command), status))
-        elif cola_trace:
-            core.stderr(' '.join(command))
+        trace(command, status, out, err)
 
         # Allow access to the command's status code
         return (status, out, err)
@@ -1,11 +1,16 @@
 """Provides commands and queries for Git."""
 from __future__ import division, absolute_import, unicode_literals
 
+import os
 import re
+import tempfile
+import threading
 from io import StringIO
 
+from cola import cache
 from cola import core
 from cola import gitcfg
+from cola import refs
 from cola import utils
 from cola import version
 from cola.git import git
@@ -84,6 +89,9 @@ class _current_branch:
 
 def reset():
     _current_branch.key = None
+    _ref_state.key = None
+    _ref_state.remotes_key = None
+    _ref_state.refdb = None
 
 
 def current_branch():
@@ -138,41 +146,244 @@ def branch_list(remote=False):
     This explicitly removes HEAD from the list of remote branches.
 
     """
+    state = ref_state()
     if remote:
-        return for_each_ref_basename('refs/remotes')
+        return list(state.remote_branches)
     else:
-        return for_each_ref_basename('refs/heads')
+        return list(state.local_branches)
 
 
 def for_each_ref_basename(refs, git=git):
     """Return refs starting with 'refs'."""
-    out = git.for_each_ref(refs, format='%(refname)')[STDOUT]
-    output = out.splitlines()
-    non_heads = filter(lambda x: not x.endswith('/HEAD'), output)
-    return list(map(lambda x: x[len(refs) + 1:], non_heads))
+    prefix = refs + '/'
+    return [ref[len(prefix):] for ref in ref_state(git=git).refnames
+            if ref.startswith(prefix) and not ref.endswith('/HEAD')]
 
 
 def all_refs(split=False, git=git):
     """Return a tuple of (local branches, remote branches, tags)."""
-    local_branches = []
-    remote_branches = []
-    tags = []
-    triple = lambda x, y: (x, len(x) + 1, y)
-    query = (triple('refs/tags', tags),
-             triple('refs/heads', local_branches),
-             triple('refs/remotes', remote_branches))
-    out = git.for_each_ref(format='%(refname)')[STDOUT]
-    for ref in out.splitlines():
-        for prefix, prefix_len, dst in query:
-            if ref.startswith(prefix) and not ref.endswith('/HEAD'):
-                dst.append(ref[prefix_len:])
-                continue
+    state = ref_state(git=git)
+    local_branches = list(state.local_branches)
+    remote_branches = list(state.remote_branches)
+    tags = list(state.tags)
     if split:
         return local_branches, remote_branches, tags
     else:
         return local_branches + remote_branches + tags
 
 
+class RefState(object):
+    """The refs, upstreams and remotes of a repository as of one moment
+
+    Refs are read directly from the repository when possible, and with a
+    single "git for-each-ref" otherwise, so that callers can share them
+    instead of forking their own queries.
+
+    """
+    # Fields are separated by NUL bytes and records by newlines
+    FORMAT = '%(refname)%00%(objectname)%00%(upstream)%00%(upstream:track)'
+    TRACK_FORMAT = '%(refname)%00%(upstream:track)'
+    TRACK_REGEX = re.compile(r'(ahead|behind) (\d+)')
+
+    def __init__(self, git=git):
+        self.git = git
+        self.refnames = []
+        self.local_branches = []
+        self.remote_branches = []
+        self.tags = []
+        self.remotes = []
+        self.sha1s = {}  # full refname -> object id
+        self.head = None  # object id of HEAD, None on an unborn branch
+        self.upstreams = {}  # local branch -> full upstream refname
+        self._tracking = None  # local branch -> (ahead, behind)
+
+    def sha1(self, ref):
+        return self.sha1s.get(ref)
+
+    def upstream(self, branch):
+        """Return the short name of the upstream of a local branch"""
+        ref = self.upstreams.get(branch)
+        if ref and ref.startswith('refs/remotes/'):
+            return ref[len('refs/remotes/'):]
+        return None
+
+    @property
+    def tracking(self):
+        """Return the ahead/behind counts of branches with an upstream
+
+        The counts need a history walk so they are only computed on
+        demand when the refs were read without git.
+
+        """
+        if self._tracking is None:
+            self._tracking = {}
+            status, out, err = self.git.for_each_ref('refs/heads',
+                                                     format=self.TRACK_FORMAT)
+            if status == 0:
+                for line in out.splitlines():
+                    ref, track = (line.split('\0') + [''])[:2]
+                    self._add_tracking(ref, track)
+        return self._tracking
+
+    def add(self, ref, sha1, upstream=''):
+        self.refnames.append(ref)
+        self.sha1s[ref] = sha1
+        query = (('refs/heads/', self.local_branches),
+                 ('refs/remotes/', self.remote_branches),
+                 ('refs/tags/', self.tags))
+        for prefix, dst in query:
+            if ref.startswith(prefix):
+                if not ref.endswith('/HEAD'):
+                    dst.append(ref[len(prefix):])
+                break
+        if upstream and ref.startswith('refs/heads/'):
+            self.upstreams[ref[len('refs/heads/'):]] = upstream
+
+    def parse(self, out):
+        """Add the refs from "git for-each-ref --format=<FORMAT>" output"""
+        for line in out.splitlines():
+            fields = line.split('\0')
+            ref, sha1, upstream, track = (fields + ['', '', ''])[:4]
+            self.add(ref, sha1, upstream)
+            if len(fields) > 3:
+                if self._tracking is None:
+                    self._tracking = {}
+                self._add_tracking(ref, track)
+
+    def _add_tracking(self, ref, track):
+        branch = ref[len('refs/heads/'):]
+        if not ref.startswith('refs/heads/') or branch not in self.upstreams:
+            return
+        counts = dict(self.TRACK_REGEX.findall(track))
+        self._tracking[branch] = (int(counts.get('ahead', 0)),
+                                  int(counts.get('behind', 0)))
+
+
+class _ref_state:
+    """Cache for ref_state()"""
+    key = None
+    value = None
+    remotes_key = None
+    remotes = []
+    refdb = None
+    lock = threading.Lock()
+
+
+def _stat_key(path):
+    try:
+        st = core.stat(path)
+        return (path, st.st_mtime, st.st_size)
+    except OSError:
+        return (path, None, None)
+
+
+def _ref_state_key(common_dir, git=git):
+    """Return a value that changes whenever a ref or remote changes
+
+    Updating a ref replaces its file through a rename, which changes the
+    mtime of the directory that contains it.
+
+    """
+    key = [_stat_key(git.git_path('HEAD')),
+           _stat_key(os.path.join(common_dir, 'packed-refs')),
+           _stat_key(os.path.join(common_dir, 'config'))]
+    refs_dir = os.path.join(common_dir, 'refs')
+    for dirpath, dirnames, filenames in core.walk(refs_dir):
+        try:
+            key.append((dirpath, core.stat(dirpath).st_mtime))
+        except OSError:
+            pass
+    return key
+
+
+def _head_sha1(values, git=git):
+    """Resolve .git/HEAD against the refs read by RefDatabase"""
+    try:
+        data = core.read(git.git_path('HEAD')).strip()
+    except (IOError, OSError):
+        return None
+    if data.startswith(refs.SYMREF_PREFIX):
+        return values.get(data[len(refs.SYMREF_PREFIX):].strip())
+    return data or None
+
+
+def _refdb(git=git):
+    git_dir = git.git_path()
+    db = _ref_state.refdb
+    if db is None or db.git_dir != git_dir:
+        db = _ref_state.refdb = refs.RefDatabase(git_dir)
+    return db
+
+
+def _upstream_ref(branch, config):
+    """Return the full refname that a local branch tracks"""
+    remote = config.get('branch.%s.remote' % branch)
+    merge_ref = config.get('branch.%s.merge' % branch)
+    if not remote or not merge_ref:
+        return ''
+    if remote == '.':
+        return merge_ref
+    refs_heads = 'refs/heads/'
+    if merge_ref.startswith(refs_heads):
+        return 'refs/remotes/%s/%s' % (remote, merge_ref[len(refs_heads):])
+    return ''
+
+
+def _remotes(common_dir, git=git):
+    """Return the configured remotes, re-reading them when the config changes"""
+    key = _stat_key(os.path.join(common_dir, 'config'))
+    with _ref_state.lock:
+        if _ref_state.remotes_key == key:
+            return list(_ref_state.remotes)
+    remotes = git.remote()[STDOUT].splitlines()
+    with _ref_state.lock:
+        _ref_state.remotes_key = key
+        _ref_state.remotes = remotes
+    return list(remotes)
+
+
+def ref_state(git=git):
+    """Return the current RefState, reusing it while the refs are unchanged
+
+    Refs are read without forking when the repository uses the files ref
+    backend.  Other setups, e.g. reftable, fall back to git for-each-ref.
+
+    """
+    with _ref_state.lock:
+        db = _refdb(git=git)
+    key = _ref_state_key(db.common_dir, git=git)
+    with _ref_state.lock:
+        if _ref_state.key == key:
+            return _ref_state.value
+
+    state = RefState(git=git)
+    if db.supported():
+        config = gitcfg.current()
+        values = db.refs()
+        for ref in sorted(values):
+            upstream = ''
+            if ref.startswith('refs/heads/'):
+                upstream = _upstream_ref(ref[len('refs/heads/'):], config)
+            state.add(ref, values[ref], upstream)
+        state.head = _head_sha1(values, git=git)
+    else:
+        status, out, err = git.for_each_ref(format=RefState.FORMAT)
+        if status != 0:
+            # Older versions of git do not understand %(upstream:track)
+            fmt = '%(refname)%00%(objectname)%00%(upstream)'
+            out = git.for_each_ref(format=fmt)[STDOUT]
+        state.parse(out)
+        status, out, err = git.rev_parse('HEAD')
+        if status == 0:
+            state.head = out.strip()
+    state.remotes = _remotes(db.common_dir, git=git)
+
+    with _ref_state.lock:
+        _ref_state.key = key
+        _ref_state.value = state
+    return state
+
+
 def tracked_branch(branch=None, config=None):
     """Return the remote branch associated with 'branch'."""
     if config is None:
@@ -193,22 +404,68 @@ def tracked_branch(branch=None, config=None):
     return None
 
 
-def untracked_files(git=git, paths=None):
-    """Returns a sorted list of untracked files."""
+def untracked_files(git=git, paths=None, directory=False):
+    """Returns a sorted list of untracked files.
+
+    Pass directory=True to report fully untracked directories as a single
+    "dir/" entry rather than listing their contents.  Like "git status",
+    directories that are empty or only hold ignored files are omitted.
 
+    """
     if paths is None:
         paths = []
     args = ['--'] + paths
     out = git.ls_files(z=True, others=True, exclude_standard=True,
+                       directory=directory, no_empty_directory=directory,
                        *args)[STDOUT]
     if out:
         return out[:-1].split('\0')
     return []
 
 
+def collapse_untracked(paths, prefix=''):
+    """Summarize paths below `prefix` one directory level deep
+
+    Paths inside subdirectories of `prefix` are replaced by a single
+    "prefix/subdir/" entry.
+
+    """
+    entries = []
+    seen = set()
+    offset = len(prefix)
+    for path in paths:
+        slash = path.find('/', offset)
+        if slash != -1:
+            path = path[:slash+1]
+            if path in seen:
+                continue
+            seen.add(path)
+        entries.append(path)
+    return entries
+
+
+def untracked_directories(expanded, git=git, paths=None):
+    """Returns untracked paths with untracked directories collapsed
+
+    Fully untracked directories are reported as "dir/" entries, except for
+    the directories in `expanded`, which are listed one level deep.
+
+    """
+    untracked = set(untracked_files(git=git, paths=paths, directory=True))
+    # Parents sort before their children so nested expansions find the
+    # entries produced by expanding their parent.
+    for path in sorted(expanded):
+        if path not in untracked:
+            continue
+        contents = untracked_files(git=git, paths=[path])
+        untracked.remove(path)
+        untracked.update(collapse_untracked(contents, prefix=path))
+    return sorted(untracked)
+
+
 def tag_list():
     """Return a list of tags."""
-    return list(reversed(for_each_ref_basename('refs/tags')))
+    return list(reversed(ref_state().tags))
 
 
 def log(git, *args, **kwargs):
@@ -276,6 +533,39 @@ def diff_info(sha1, git=git, filename=None):
     return decoded + sha1_diff(git, sha1, filename=filename)
 
 
+# Recently computed index/worktree diffs keyed by their arguments and the
+# stat() identity of the index and the worktree files involved.
+_diff_cache = cache.LRUCache(maxsize=64)
+
+
+def clear_diff_cache():
+    """Forget all cached diffs, e.g. when the status is refreshed"""
+    _diff_cache.clear()
+
+
+def invalidate_diff_cache(path):
+    """Forget cached diffs that involve `path`"""
+    _diff_cache.prune(lambda key: path in key[0])
+
+
+def _stat_identity(path):
+    """Return a tuple that changes whenever `path` is modified"""
+    try:
+        st = core.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime, st.st_size, st.st_ino)
+
+
+def _diff_cache_key(git, filenames, argv, cached, opts):
+    """Return a cache key for an index/worktree diff"""
+    identity = [_stat_identity(git.git_path('index'))]
+    if not cached:
+        identity.extend([_stat_identity(f) for f in filenames])
+    return (tuple(filenames), tuple(argv), cached,
+            tuple(sorted(opts.items())), tuple(identity))
+
+
 def diff_helper(commit=None,
                 ref=None,
                 endref=None,
@@ -301,19 +591,31 @@ def diff_helper(commit=None,
         argv.append(head)
 
     encoding = None
+    filenames = []
     if filename:
         argv.append('--')
         if type(filename) is list:
-            argv.extend(filename)
+            filenames = filename
         else:
-            argv.append(filename)
+            filenames = [filename]
             cfg = gitcfg.current()
             encoding = cfg.file_encoding(filename)
+        argv.extend(filenames)
 
-    status, out, err = git.diff(R=reverse, M=True, cached=cached,
-                                _encoding=encoding,
-                                *argv,
-                                **common_diff_opts())
+    opts = common_diff_opts()
+    opts.update(R=reverse, M=True, cached=cached, _encoding=encoding)
+
+    # Only diffs against the index and worktree for specific paths are
+    # cached; commit ranges are left alone.
+    key = None
+    if filenames and not endref:
+        key = _diff_cache_key(git, filenames, argv, cached, opts)
+        key += (deleted, with_diff_header, suppress_header)
+        result = _diff_cache.get(key)
+        if result is not None:
+            return result
+
+    status, out, err = git.diff(*argv, **opts)
     if status != 0:
         # git init
         if with_diff_header:
@@ -321,8 +623,11 @@ def diff_helper(commit=None,
         else:
             return ''
 
-    return extract_diff_header(status, deleted,
-                               with_diff_header, suppress_header, out)
+    result = extract_diff_header(status, deleted,
+                                 with_diff_header, suppress_header, out)
+    if key is not None:
+        _diff_cache.put(key, result)
+    return result
 
 
 def extract_diff_header(status, deleted,
@@ -414,8 +719,87 @@ def export_patchset(start, end, output='patches', **kwargs):
     return git.format_patch('-o', output, start + '^..' + end, **kwargs)
 
 
+def _paths_input(paths):
+    """Return a file containing NUL-terminated paths for use as stdin"""
+    fp = tempfile.TemporaryFile()
+    for path in paths:
+        fp.write(core.encode(path) + b'\0')
+    fp.seek(0)
+    return fp
+
+
+def sliced_op(items, map_fn):
+    """Slice items and call map_fn over every slice
+
+    This exists because of "errno: Argument list too long"
+
+    """
+    # This comment appeared near the top of include/linux/binfmts.h
+    # in the Linux source tree:
+    #
+    # /*
+    #  * MAX_ARG_PAGES defines the number of pages allocated for arguments
+    #  * and envelope for the new program. 32 should suffice, this gives
+    #  * a maximum env+arg of 128kB w/4KB pages!
+    #  */
+    # #define MAX_ARG_PAGES 32
+    #
+    # 'size' is a heuristic to keep things highly performant by minimizing
+    # the number of slices.  If we wanted it to run as few commands as
+    # possible we could call "getconf ARG_MAX" and make a better guess,
+    # but it's probably not worth the complexity (and the extra call to
+    # getconf that we can't do on Windows anyways).
+    #
+    # In my testing, getconf ARG_MAX on Mac OS X Mountain Lion reported
+    # 262144 and Debian/Linux-x86_64 reported 2097152.
+    #
+    # The hard-coded max_arg_len value is safely below both of these
+    # real-world values.
+
+    max_arg_len = 32 * 4 * 1024
+    avg_filename_len = 300
+    size = max_arg_len // avg_filename_len
+
+    status = 0
+    outs = []
+    errs = []
+
+    for start in range(0, len(items), size):
+        stat, out, err = map_fn(items[start:start+size])
+        status = max(stat, status)
+        outs.append(out)
+        errs.append(err)
+
+    return (status, '\n'.join(outs), '\n'.join(errs))
+
+
+def pathspec_op(cmd, paths, args=(), opts=None, git=git):
+    """Run "git <cmd> [opts] [args] -- <paths>" with a single process
+
+    The paths are fed to --pathspec-from-file on stdin so that any number
+    of paths can be used.  Older versions of git are given the paths on
+    the command-line in slices.
+
+    """
+    paths = list(paths)
+    if not paths:
+        return (0, '', '')
+    if opts is None:
+        opts = {}
+    action = getattr(git, cmd)
+    if not version.check('pathspec-from-file', version.git_version()):
+        args = list(args) + ['--']
+        return sliced_op(paths, lambda x: action(*(args + x), **opts))
+    stdin = _paths_input(paths)
+    try:
+        return action(pathspec_from_file='-', pathspec_file_nul=True,
+                      _stdin=stdin, *args, **opts)
+    finally:
+        stdin.close()
+
+
 def unstage_paths(args, head='HEAD'):
-    status, out, err = git.reset(head, '--', *set(args))
+    status, out, err = pathspec_op('reset', set(args), args=(head,))
     if status == 128:
         # handle git init: we have to use 'git rm --cached'
         # detect this condition by checking if the file is still staged
@@ -427,15 +811,26 @@ def unstage_paths(args, head='HEAD'):
 def untrack_paths(args, head='HEAD'):
     if not args:
         return (-1, N_('Nothing to do'), '')
-    return git.update_index('--', force_remove=True, *set(args))
+    stdin = _paths_input(set(args))
+    try:
+        # --stdin must come last, after the options for the paths it reads
+        return git.update_index('--force-remove', '-z', '--stdin',
+                                _stdin=stdin)
+    finally:
+        stdin.close()
 
 
 def worktree_state(head='HEAD',
                    update_index=False,
                    display_untracked=True,
-                   paths=None):
+                   paths=None,
+                   expanded_untracked=None):
     """Return a dict of files in various states of being
 
+    When `expanded_untracked` is not None, untracked directories are
+    collapsed into "dir/" entries except for the expanded directories.
+    See untracked_directories().
+
     :rtype: dict, keys are staged, unstaged, untracked, unmerged,
             changed_upstream, and submodule.
 
@@ -446,7 +841,12 @@ def worktree_state(head='HEAD',
     staged, unmerged, staged_deleted, staged_submods = diff_index(head,
                                                                   paths=paths)
     modified, unstaged_deleted, modified_submods = diff_worktree(paths)
-    untracked = display_untracked and untracked_files(paths=paths) or []
+    if not display_untracked:
+        untracked = []
+    elif expanded_untracked is None:
+        untracked = untracked_files(paths=paths)
+    else:
+        untracked = untracked_directories(expanded_untracked, paths=paths)
 
     # Remove unmerged paths from the modified list
     if unmerged:
@@ -529,12 +929,30 @@ def diff_worktree(paths=None):
     return modified, deleted, submodules
 
 
+# Upstream changes keyed by the object ids of HEAD and its upstream
+_upstream_cache = cache.LRUCache(maxsize=8)
+
+
 def diff_upstream(head):
     tracked = tracked_branch()
     if not tracked:
         return []
+    key = None
+    if head == 'HEAD':
+        state = ref_state()
+        key = (state.sha1('refs/heads/' + current_branch()),
+               state.sha1('refs/remotes/' + tracked))
+        if None in key:
+            key = None
+        else:
+            result = _upstream_cache.get(key)
+            if result is not None:
+                return list(result)
     base = merge_base(head, tracked)
-    return diff_filenames(base, tracked)
+    result = diff_filenames(base, tracked)
+    if key is not None:
+        _upstream_cache.put(key, result)
+    return list(result)
 
 
 def _branch_status(branch):
@@ -577,6 +995,32 @@ def parse_ls_tree(rev):
     return output
 
 
+# Tree objects never change, so their entries are cached by object id
+# and shared by every revision that contains the same tree.
+_tree_cache = cache.LRUCache(maxsize=1024)
+
+
+def tree_entries(oid, git=git):
+    """Return the (mode, type, sha1, name) tuples directly inside a tree"""
+    entries = _tree_cache.get(oid)
+    if entries is not None:
+        return entries
+    status, out, err = git.ls_tree('-z', oid)
+    if status != 0:
+        return []
+    entries = []
+    for line in out.split('\0'):
+        try:
+            info, name = line.split('\t', 1)
+            mode, objtype, sha1 = info.split(' ', 2)
+        except ValueError:
+            continue
+        entries.append((mode, objtype, sha1, name))
+    entries = tuple(entries)
+    _tree_cache.put(oid, entries)
+    return entries
+
+
 # A regex for matching the output of git(log|rev-list) --pretty=oneline
 REV_LIST_REGEX = re.compile(r'^([0-9a-f]{40}) (.*)$')
 
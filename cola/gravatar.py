@@ -1,5 +1,7 @@
 from __future__ import division, absolute_import, unicode_literals
 
+import collections
+import re
 import time
 
 from PyQt4 import QtGui
@@ -8,104 +10,282 @@ from PyQt4 import QtNetwork
 from PyQt4.QtCore import Qt
 from PyQt4.QtCore import SIGNAL
 
+from cola import cache
+from cola import gitcfg
 from cola import qtutils
 from cola import core
+from cola import resources
 from cola.compat import ustr, urllib
+from cola.decorators import memoize
 import hashlib
 
 
+GRAVATAR_URL = 'https://gravatar.com/avatar/'
+OFFLINE = 'cola.gravataroffline'
+
+
 class Gravatar(object):
     @staticmethod
-    def url_for_email(email, imgsize):
+    def url_for_email(email, imgsize, base_url=GRAVATAR_URL):
         email_hash = hashlib.md5(core.encode(email)).hexdigest()
         default_url = b'https://git-cola.github.io/images/git-64x64.jpg'
         encoded_url = urllib.quote(default_url, b'')
         query = '?s=%d&d=%s' % (imgsize, encoded_url)
-        url = 'https://gravatar.com/avatar/' + email_hash + query
+        url = base_url + email_hash + query
         return url
 
 
-class GravatarLabel(QtGui.QLabel):
-    def __init__(self, parent=None):
-        QtGui.QLabel.__init__(self, parent)
+def identicon_cells(email):
+    """Return the filled cells of a 5x5 identicon and its RGB color
 
-        self.email = None
-        self.response = None
-        self.timeout = 0
-        self.imgsize = 48
-        self.pixmaps = {}
+    The left half is derived from the email's hash and mirrored onto the
+    right half so that the same email always yields the same symmetric
+    pattern.
+
+    """
+    digest = hashlib.md5(core.encode(email.strip().lower())).hexdigest()
+    cells = []
+    for row in range(5):
+        for col in range(3):
+            if int(digest[row * 3 + col], 16) % 2 == 0:
+                cells.append((row, col))
+                if col != 2:
+                    cells.append((row, 4 - col))
+    color = (int(digest[-6:-4], 16),
+             int(digest[-4:-2], 16),
+             int(digest[-2:], 16))
+    return cells, color
+
+
+def identicon(email, size):
+    """Paint an identicon for `email` into a pixmap"""
+    cells, color = identicon_cells(email)
+    pixmap = QtGui.QPixmap(size, size)
+    pixmap.fill(Qt.white)
+    painter = QtGui.QPainter(pixmap)
+    cell_size = size / 6.0
+    margin = cell_size / 2.0
+    brush = QtGui.QBrush(QtGui.QColor(*color))
+    for row, col in cells:
+        rect = QtCore.QRectF(margin + col * cell_size,
+                             margin + row * cell_size,
+                             cell_size, cell_size)
+        painter.fillRect(rect, brush)
+    painter.end()
+    return pixmap
+
+
+@memoize
+def service():
+    """Return the AvatarService shared by all widgets"""
+    return AvatarService()
+
+
+class AvatarService(QtCore.QObject):
+    """Fetches avatars once and shares them between widgets
+
+    Avatars are kept in memory as pixmaps and on disk as image data.  Disk
+    entries are served immediately and revalidated with their ETag once
+    they expire.  Network failures switch to locally generated identicons
+    for a while, as does setting "cola.gravataroffline".
+
+    """
+    AVATAR_READY = SIGNAL('avatar_ready(PyQt_PyObject,int,PyQt_PyObject)')
+
+    MAX_REQUESTS = 4
+    RETRY_DELAY = 5 * 60
+    MIN_MAX_AGE = 60 * 60
+    DEFAULT_MAX_AGE = 24 * 60 * 60
+    MAX_AGE_REGEX = re.compile(r'max-age=(\d+)')
 
-        self.network = QtNetwork.QNetworkAccessManager()
+    def __init__(self, cache_dir=None, base_url=GRAVATAR_URL, parent=None):
+        QtCore.QObject.__init__(self, parent)
+        if cache_dir is None:
+            cache_dir = resources.cache_home('avatars')
+        self.base_url = base_url
+        self.memory = cache.LRUCache(maxsize=256)
+        self.identicons = cache.LRUCache(maxsize=256)
+        self.disk = cache.DiskCache(cache_dir)
+        self.failed_at = 0
+        self.queue = collections.deque()
+        self.pending = {}  # key -> (email, size, validator)
+        self.requests = {}  # url -> key
+
+        self.network = QtNetwork.QNetworkAccessManager(self)
         self.connect(self.network,
                      SIGNAL('finished(QNetworkReply*)'),
                      self.network_finished)
 
-    def set_email(self, email):
-        if email in self.pixmaps:
-            self.setPixmap(self.pixmaps[email])
+    @staticmethod
+    def key(email, size):
+        return '%s-%d' % (hashlib.md5(core.encode(email)).hexdigest(), size)
+
+    def offline(self):
+        if gitcfg.current().get(OFFLINE, False):
+            return True
+        return (self.failed_at > 0 and
+                time.time() - self.failed_at < self.RETRY_DELAY)
+
+    def avatar(self, email, size):
+        """Return the avatar pixmap for `email`, or None when it is pending
+
+        AVATAR_READY is emitted once a pending avatar arrives.
+
+        """
+        key = self.key(email, size)
+        pixmap = self.memory.get(key)
+        if pixmap is not None:
+            return pixmap
+
+        data, meta = self.disk.get(key)
+        if data is not None:
+            pixmap = self.pixmap_from_data(data)
+            self.memory.put(key, pixmap)
+            if not self.disk.is_fresh(meta) and not self.offline():
+                self.request(email, size, validator=meta.get('validator'))
+            return pixmap
+
+        if self.offline():
+            return self.identicon(email, size)
+
+        self.request(email, size)
+        return None
+
+    def prefetch(self, emails, size):
+        """Request the avatars that are not already cached"""
+        if self.offline():
             return
-        if (self.timeout > 0 and
-                (int(time.time()) - self.timeout) < (5 * 60)):
-            self.set_pixmap_from_response()
+        for email in emails:
+            key = self.key(email, size)
+            if key in self.memory or key in self.pending:
+                continue
+            data, meta = self.disk.get(key)
+            if data is None:
+                self.request(email, size)
+            elif not self.disk.is_fresh(meta):
+                self.request(email, size, validator=meta.get('validator'))
+
+    def request(self, email, size, validator=None):
+        key = self.key(email, size)
+        if key in self.pending:
             return
-        if email == self.email and self.response is not None:
-            self.set_pixmap_from_response()
+        self.pending[key] = (email, size, validator)
+        self.queue.append(key)
+        self._start_requests()
+
+    def _start_requests(self):
+        while self.queue and len(self.requests) < self.MAX_REQUESTS:
+            key = self.queue.popleft()
+            email, size, validator = self.pending[key]
+            url = Gravatar.url_for_email(email, size, base_url=self.base_url)
+            request = QtNetwork.QNetworkRequest(QtCore.QUrl(url))
+            if validator:
+                request.setRawHeader(QtCore.QByteArray('If-None-Match'),
+                                     QtCore.QByteArray(core.encode(validator)))
+            self.requests[url] = key
+            self.network.get(request)
+
+    def network_finished(self, reply):
+        url = ustr(reply.url().toString())
+        key = self.requests.pop(url, None)
+        reply.deleteLater()
+        if key is None:
+            self._start_requests()
             return
-        self.email = email
-        self.request(email)
+        email, size, validator = self.pending.pop(key)
 
-    def request(self, email):
-        url = Gravatar.url_for_email(email, self.imgsize)
-        self.network.get(QtNetwork.QNetworkRequest(QtCore.QUrl(url)))
+        if reply.error() == QtNetwork.QNetworkReply.NoError:
+            self.failed_at = 0
+            pixmap = self._store_reply(reply, key, email, size, validator)
+        else:
+            self.failed_at = time.time()
+            pixmap = self.memory.get(key) or self.identicon(email, size)
+
+        self._start_requests()
+        self.emit(self.AVATAR_READY, email, size, pixmap)
+
+    def _store_reply(self, reply, key, email, size, validator=None):
+        expires = time.time() + self._max_age(reply)
+        status, ok = reply.attribute(
+                QtNetwork.QNetworkRequest.HttpStatusCodeAttribute).toInt()
+        etag = ustr(QtCore.QString(reply.rawHeader(
+                QtCore.QByteArray('ETag')))) or None
+
+        if status == 304:
+            # Servers may omit the ETag from a 304; keep the one we sent
+            self.disk.touch(key, expires, validator=etag or validator)
+            pixmap = self.memory.get(key)
+            if pixmap is None:
+                data, meta = self.disk.get(key)
+                pixmap = self.pixmap_from_data(data or b'')
+        else:
+            location = ustr(QtCore.QString(reply.rawHeader(
+                    QtCore.QByteArray('Location')))).strip()
+            if location and location != ustr(reply.url().toString()):
+                # Gravatar redirects to the default image for unknown
+                # emails.  Save bandwidth by using a local pixmap.
+                data = self.default_pixmap_as_bytes(size)
+            else:
+                data = bytes(reply.readAll())
+            self.disk.put(key, data, expires, validator=etag)
+            pixmap = self.pixmap_from_data(data)
+
+        self.memory.put(key, pixmap)
+        return pixmap
+
+    def _max_age(self, reply):
+        cache_control = ustr(QtCore.QString(reply.rawHeader(
+                QtCore.QByteArray('Cache-Control'))))
+        match = self.MAX_AGE_REGEX.search(cache_control)
+        if match:
+            return max(int(match.group(1)), self.MIN_MAX_AGE)
+        return self.DEFAULT_MAX_AGE
+
+    def identicon(self, email, size):
+        key = self.key(email, size)
+        pixmap = self.identicons.get(key)
+        if pixmap is None:
+            pixmap = identicon(email, size)
+            self.identicons.put(key, pixmap)
+        return pixmap
+
+    @staticmethod
+    def pixmap_from_data(data):
+        pixmap = QtGui.QPixmap()
+        pixmap.loadFromData(data)
+        return pixmap
 
-    def default_pixmap_as_bytes(self):
-        xres = self.imgsize
-        pixmap = qtutils.git_icon().pixmap(xres)
+    @staticmethod
+    def default_pixmap_as_bytes(size):
+        pixmap = qtutils.git_icon().pixmap(size)
         byte_array = QtCore.QByteArray()
         buf = QtCore.QBuffer(byte_array)
         buf.open(QtCore.QIODevice.WriteOnly)
         pixmap.save(buf, 'PNG')
         buf.close()
-        return byte_array
+        return bytes(byte_array)
 
-    def network_finished(self, reply):
-        email = self.email
-
-        header = QtCore.QByteArray('Location')
-        raw_header = reply.rawHeader(header)
-        if raw_header:
-            location = ustr(QtCore.QString(raw_header)).strip()
-            request_location = ustr(
-                    Gravatar.url_for_email(self.email, self.imgsize))
-            relocated = location != request_location
-        else:
-            relocated = False
 
-        if reply.error() == QtNetwork.QNetworkReply.NoError:
-            if relocated:
-                # We could do get_url(urllib.unquote(location)) to
-                # download the default image.
-                # Save bandwidth by using a pixmap.
-                self.response = self.default_pixmap_as_bytes()
-            else:
-                self.response = reply.readAll()
-            self.timeout = 0
-        else:
-            self.response = self.default_pixmap_as_bytes()
-            self.timeout = int(time.time())
+class GravatarLabel(QtGui.QLabel):
+    def __init__(self, parent=None):
+        QtGui.QLabel.__init__(self, parent)
+
+        self.email = None
+        self.imgsize = 48
+        self.service = service()
+        self.connect(self.service, AvatarService.AVATAR_READY,
+                     self.avatar_ready)
 
-        pixmap = self.set_pixmap_from_response()
+    def set_email(self, email):
+        self.email = email
+        pixmap = self.service.avatar(email, self.imgsize)
+        if pixmap is not None:
+            self.setPixmap(pixmap)
 
-        # If the email has not changed (e.g. no other requests)
-        # then we know that this pixmap corresponds to this specific
-        # email address.  We can't blindly trust self.email else
-        # we may add cache entries for thee wrong email address.
-        url = Gravatar.url_for_email(email, self.imgsize)
-        if url == ustr(reply.url().toString()):
-            self.pixmaps[email] = pixmap
+    def prefetch(self, emails):
+        """Fetch the avatars for `emails` ahead of time"""
+        self.service.prefetch(emails, self.imgsize)
 
-    def set_pixmap_from_response(self):
-        pixmap = QtGui.QPixmap()
-        pixmap.loadFromData(self.response)
-        self.setPixmap(pixmap)
-        return pixmap
+    def avatar_ready(self, email, size, pixmap):
+        if email == self.email and size == self.imgsize:
+            self.setPixmap(pixmap)
@@ -11,6 +11,7 @@ from cola import cmds
 from cola import core
 from cola import difftool
 from cola import gitcmds
+from cola import lazy
 from cola import qtutils
 from cola import utils
 from cola.git import git
@@ -18,11 +19,13 @@ from cola.i18n import N_
 from cola.interaction import Interaction
 from cola.models import main
 from cola.widgets import completion
-from cola.widgets.browse import BrowseDialog
 from cola.widgets.selectcommits import select_commits
 from cola.compat import ustr
 
 
+browse = lazy.module('cola.widgets.browse')
+
+
 def delete_branch():
     """Launch the 'Delete Branch' dialog."""
     branch = choose_branch(N_('Delete Branch'), N_('Delete'))
@@ -46,7 +49,7 @@ def delete_remote_branch():
 def browse_current():
     """Launch the 'Browse Current Branch' dialog."""
     branch = gitcmds.current_branch()
-    BrowseDialog.browse(branch)
+    browse.BrowseDialog.browse(branch)
 
 
 def browse_other():
@@ -55,7 +58,7 @@ def browse_other():
     branch = choose_ref(N_('Browse Commits...'), N_('Browse'))
     if not branch:
         return
-    BrowseDialog.browse(branch)
+    browse.BrowseDialog.browse(branch)
 
 
 def checkout_branch():
@@ -33,6 +33,7 @@ if utils.is_win32():
 from PyQt4 import QtCore
 
 from cola import gitcfg
+from cola import gitcmds
 from cola import core
 from cola.compat import ustr, PY3
 from cola.git import STDOUT
@@ -115,6 +116,7 @@ class Handler():
 
     def handle(self, path):
         """Queues up filesystem events for broadcast"""
+        gitcmds.invalidate_diff_cache(path)
         with self._lock:
             if self._timer is None:
                 self._timer = Timer(0.888, self.broadcast)
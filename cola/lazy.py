@@ -0,0 +1,60 @@
+"""Defers importing modules until they are first used
+
+Rarely used dialogs pull in a lot of code.  Importing them on first use
+keeps them off of the startup path.
+
+"""
+from __future__ import division, absolute_import, unicode_literals
+
+import sys
+import threading
+
+from cola import perf
+
+
+class LazyModule(object):
+    """Stands in for a module and imports it on first attribute access"""
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+        self.__dict__['_lock'] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is not None:
+            return module
+        with self.__dict__['_lock']:
+            module = self.__dict__['_module']
+            if module is None:
+                name = self.__dict__['_name']
+                with perf.Timer('import ' + name):
+                    __import__(name)
+                    module = sys.modules[name]
+                self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        return '<lazy module %r>' % self.__dict__['_name']
+
+
+def module(name):
+    """Return a proxy that imports the named module on first use"""
+    return LazyModule(name)
+
+
+def function(module, name):
+    """Return a callable that resolves module.name only when it is called
+
+    This allows callbacks to be registered without importing their module.
+
+    """
+    def call(*args, **kwargs):
+        return getattr(module, name)(*args, **kwargs)
+    return call
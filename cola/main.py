@@ -4,6 +4,8 @@ import os
 import subprocess
 import sys
 
+# Imported first so that the startup profiler can time the other imports
+from cola import perf
 from cola.app import add_common_arguments
 from cola.app import application_init
 from cola.app import application_start
@@ -269,6 +271,7 @@ def cmd_cola(args):
     context = application_init(args)
     from cola.widgets.main import MainView
     view = MainView(context.model, settings=args.settings)
+    perf.mark('main window')
     if args.amend:
         cmds.do(cmds.AmendMode, True)
 
@@ -1,5 +1,6 @@
 from __future__ import division, absolute_import, unicode_literals
 
+import bisect
 import collections
 import time
 
@@ -50,6 +51,56 @@ class Columns(object):
             raise NotImplementedError('Mapping required for "%s"' % column)
 
 
+class PathList(object):
+    """A sorted list of paths that answers directory listings
+
+    Directory listings bisect into the sorted list instead of walking
+    every path, and the paths below a subdirectory are skipped with a
+    single bisection, so listing a directory costs O(entries * log(n)).
+
+    """
+
+    def __init__(self, paths=()):
+        self.paths = sorted(set(paths))
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, path):
+        idx = bisect.bisect_left(self.paths, path)
+        return idx < len(self.paths) and self.paths[idx] == path
+
+    def add(self, path):
+        """Add a path, keeping the list sorted"""
+        idx = bisect.bisect_left(self.paths, path)
+        if idx == len(self.paths) or self.paths[idx] != path:
+            self.paths.insert(idx, path)
+
+    def children(self, dirname):
+        """Return the (subdirectories, files) directly inside dirname"""
+        paths = self.paths
+        prefix = dirname and dirname + '/' or ''
+        prefix_len = len(prefix)
+        dirs = []
+        files = []
+        idx = bisect.bisect_left(paths, prefix)
+        end = len(paths)
+        while idx < end:
+            path = paths[idx]
+            if not path.startswith(prefix):
+                break
+            slash = path.find('/', prefix_len)
+            if slash < 0:
+                files.append(path)
+                idx += 1
+                continue
+            subdir = path[:slash]
+            dirs.append(subdir)
+            # '0' sorts right after '/', so this skips everything below
+            idx = bisect.bisect_left(paths, subdir + '0', idx, end)
+        return dirs, files
+
+
 def _item_path(item):
     """Return the item's path"""
     try:
@@ -78,7 +129,9 @@ class GitRepoModel(QtGui.QStandardItemModel):
             text = Columns.text(header)
             self.setHeaderData(idx, Qt.Horizontal, QtCore.QVariant(text))
 
+        self._paths = PathList()
         self._direntries = {'': self.invisibleRootItem()}
+        self._populated = set()
         self._initialize()
 
     def mimeData(self, indexes):
@@ -120,7 +173,7 @@ class GitRepoModel(QtGui.QStandardItemModel):
         done = False
         for idx in range(parent.rowCount()):
             child = parent.child(idx, 0)
-            if child.rowCount() > 0:
+            if child.path in self._direntries:
                 continue
             if path < child.path:
                 parent.insertRow(idx, row_items)
@@ -181,42 +234,73 @@ class GitRepoModel(QtGui.QStandardItemModel):
         self._interesting_paths = new_paths
 
     def _initialize(self):
-        """Iterate over the cola model and create GitRepoItems."""
-        for path in gitcmds.all_files():
-            self.add_file(path)
+        """Read the repository's paths and list the top-level entries.
 
-    def add_file(self, path, insert=False):
-        """Add a file to the model."""
-        dirname = utils.dirname(path)
-        if dirname in self._direntries:
-            parent = self._direntries[dirname]
-        else:
-            parent = self._create_dir_entry(dirname, self._direntries)
-            self._direntries[dirname] = parent
-        self._add_file(parent, path, insert=insert)
+        Directories are populated when they are expanded.
 
-    def _create_dir_entry(self, dirname, direntries):
         """
-        Create a directory entry for the model.
+        self._paths = PathList(gitcmds.all_files())
+        self.populate('')
 
-        This ensures that directories are always listed before files.
+    def populate(self, dirname):
+        """Create the rows for the entries directly inside dirname."""
+        if dirname in self._populated:
+            return
+        self._populated.add(dirname)
+        parent = self._direntries[dirname]
+        dirs, files = self._paths.children(dirname)
+        for path in dirs:
+            self._direntries[path] = self.add_directory(parent, path)
+        for path in files:
+            self._add_file(parent, path)
 
-        """
-        entries = dirname.split('/')
-        curdir = []
+    def add_file(self, path, insert=False):
+        """Add a file to the model."""
+        self._paths.add(path)
+        # Only directories that have been populated need new rows.
+        # Unpopulated directories will list the file when expanded.
         parent = self.invisibleRootItem()
-        curdir_append = curdir.append
-        self_add_directory = self.add_directory
-        for entry in entries:
-            curdir_append(entry)
-            path = '/'.join(curdir)
+        curdir = []
+        for entry in path.split('/')[:-1]:
+            parent_path = '/'.join(curdir)
+            curdir.append(entry)
+            dirname = '/'.join(curdir)
+            if parent_path not in self._populated:
+                return
             try:
-                parent = direntries[path]
+                parent = self._direntries[dirname]
             except KeyError:
-                grandparent = parent
-                parent = self_add_directory(grandparent, path)
-                direntries[path] = parent
-        return parent
+                parent = self.add_directory(parent, dirname)
+                self._direntries[dirname] = parent
+                return
+        if utils.dirname(path) in self._populated:
+            self._add_file(parent, path, insert=insert)
+
+    def _unpopulated_dir(self, index):
+        """Return the directory path for an index that needs populating."""
+        if not index.isValid() or index.column() != 0:
+            return None
+        path = _item_path(self.itemFromIndex(index))
+        if path in self._direntries and path not in self._populated:
+            return path
+        return None
+
+    # Qt overrides used by views to populate directories on demand
+    def hasChildren(self, index=QtCore.QModelIndex()):
+        if self._unpopulated_dir(index) is not None:
+            return True
+        return QtGui.QStandardItemModel.hasChildren(self, index)
+
+    def canFetchMore(self, index):
+        if self._unpopulated_dir(index) is not None:
+            return True
+        return QtGui.QStandardItemModel.canFetchMore(self, index)
+
+    def fetchMore(self, index):
+        path = self._unpopulated_dir(index)
+        if path is None:
+            return QtGui.QStandardItemModel.fetchMore(self, index)
+        self.populate(path)
 
     def entry(self, path):
         """Return the GitRepoEntry for a path."""
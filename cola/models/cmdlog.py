@@ -0,0 +1,150 @@
+"""Keeps the command log shown by the console
+
+The console only shows the most recent lines.  Messages are buffered so
+that the widget can display them with one edit per flush, and the full
+history is appended to a rotating file in ~/.cache/git-cola/log.
+Older history files are compressed with gzip.
+
+Messages may be logged from any thread.
+
+"""
+from __future__ import division, absolute_import, unicode_literals
+
+import collections
+import gzip
+import os
+import shutil
+import threading
+import time
+
+from cola import core
+from cola import gitcfg
+from cola import resources
+
+
+LINES = 'cola.loglines'
+HISTORY = 'cola.loghistory'
+DEFAULT_LINES = 5000
+
+
+def max_lines():
+    """Return the number of lines that the console keeps"""
+    value = gitcfg.current().get(LINES, DEFAULT_LINES)
+    return max(100, int(value or DEFAULT_LINES))
+
+
+def history_path():
+    return resources.cache_home('log', 'git-cola.log')
+
+
+def history_enabled():
+    return gitcfg.current().get(HISTORY, True)
+
+
+def format_message(msg, now=None):
+    """Return the lines logged for a message, including its timestamp"""
+    if now is None:
+        now = time.time()
+    return [time.asctime(time.localtime(now))] + msg.splitlines() + ['']
+
+
+class CommandLog(object):
+    """A ring buffer of logged lines with batched delivery
+
+    `append()` returns True when the message is the first one since the
+    last `take_pending()`, i.e. when the caller should schedule a flush.
+
+    """
+
+    def __init__(self, maxlines=DEFAULT_LINES, history=None):
+        self.maxlines = maxlines
+        self.history = history
+        self._lines = collections.deque(maxlen=maxlines)
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def append(self, msg, now=None):
+        if not msg:
+            return False
+        lines = format_message(msg, now=now)
+        with self._lock:
+            first = not self._pending
+            self._lines.extend(lines)
+            self._pending.extend(lines)
+        return first
+
+    def take_pending(self):
+        """Return the lines appended since the last call
+
+        The lines are also written to the history file.
+
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = []
+        if pending and self.history is not None:
+            self.history.write('\n'.join(pending) + '\n')
+        return pending
+
+    def lines(self):
+        """Return the lines that are currently kept"""
+        with self._lock:
+            return list(self._lines)
+
+    def clear(self):
+        with self._lock:
+            self._lines.clear()
+            self._pending = []
+
+
+class RotatingFile(object):
+    """An append-only text file that is rotated once it grows too large
+
+    The current file is compressed into "<path>.1.gz" when it exceeds
+    maxbytes.  Older files are shifted to "<path>.2.gz" and so on, and
+    the oldest is removed once there are more than `backups`.
+
+    """
+
+    def __init__(self, path, maxbytes=1024*1024, backups=5):
+        self.path = path
+        self.maxbytes = maxbytes
+        self.backups = backups
+        self._lock = threading.Lock()
+
+    def backup_path(self, idx):
+        return '%s.%d.gz' % (self.path, idx)
+
+    def write(self, text):
+        with self._lock:
+            try:
+                self._write(text)
+            except (IOError, OSError):
+                # The history is a convenience; never fail the caller
+                pass
+
+    def _write(self, text):
+        dirname = os.path.dirname(self.path)
+        if not core.isdir(dirname):
+            core.makedirs(dirname)
+        with core.xopen(self.path, 'ab') as f:
+            f.write(core.encode(text))
+            size = f.tell()
+        if size > self.maxbytes:
+            self.rotate()
+
+    def rotate(self):
+        for idx in range(self.backups, 1, -1):
+            src = self.backup_path(idx - 1)
+            dst = self.backup_path(idx)
+            if core.exists(src):
+                if core.exists(dst):
+                    core.unlink(dst)
+                os.rename(core.mkpath(src), core.mkpath(dst))
+        with core.xopen(self.path, 'rb') as src:
+            gz = gzip.open(core.mkpath(self.backup_path(1)), 'wb')
+            try:
+                shutil.copyfileobj(src, gz)
+            finally:
+                gz.close()
+        core.unlink(self.path)
@@ -3,8 +3,8 @@
 """
 from __future__ import division, absolute_import, unicode_literals
 
-import copy
 import os
+import threading
 
 from cola import core
 from cola import git
@@ -14,6 +14,7 @@ from cola.observable import Observable
 from cola.decorators import memoize
 from cola.models.selection import selection_model
 from cola.models import prefs
+from cola.models import snapshot
 from cola.compat import ustr
 
 
@@ -85,13 +86,18 @@ class MainModel(Observable):
         self.untracked = []
         self.unmerged = []
         self.upstream_changed = []  # paths that've changed upstream
+        self.expanded_untracked = set()  # opened "dir/" untracked entries
         self.staged_deleted = set()
         self.unstaged_deleted = set()
         self.submodules = set()
+        self.status_scanned = False  # has update_status() completed?
+        self._snapshot = None  # the status that was last saved
 
         self.local_branches = []
         self.remote_branches = []
         self.tags = []
+        # Refreshes requested by the current thread while deferred
+        self._deferred = threading.local()
         if cwd:
             self.set_worktree(cwd)
 
@@ -173,27 +179,111 @@ class MainModel(Observable):
         self.update_file_status()
 
     def update_file_status(self, update_index=False):
+        if self._defer_update(False, update_index):
+            return
         self.notify_observers(self.message_about_to_update)
         self._update_files(update_index=update_index)
         self.notify_observers(self.message_updated)
 
     def update_status(self, update_index=False):
+        if self._defer_update(True, update_index):
+            return
         # Give observers a chance to respond
         self.notify_observers(self.message_about_to_update)
         self._update_merge_rebase_status()
         self._update_files(update_index=update_index)
-        self._update_remotes()
-        self._update_branches_and_tags()
+        self._update_refs()
         self._update_branch_heads()
         self._update_commitmsg()
+        self.status_scanned = True
         self.notify_observers(self.message_updated)
+        self.save_snapshot()
+
+    def defer_updates(self):
+        """Collapse the refreshes requested by the current thread
+
+        Returns a context manager.  update_status() and update_file_status()
+        calls made by the current thread inside of it are recorded, and a
+        single refresh that covers all of them runs when it exits.
+
+        """
+        return DeferredUpdates(self)
+
+    def _defer_update(self, full, update_index):
+        state = self._deferred
+        if not getattr(state, 'depth', 0):
+            return False
+        state.full = state.full or full
+        state.update_index = state.update_index or update_index
+        state.requested = True
+        return True
+
+    def _begin_deferred_updates(self):
+        state = self._deferred
+        if not getattr(state, 'depth', 0):
+            state.depth = 0
+            state.requested = False
+            state.full = False
+            state.update_index = False
+        state.depth += 1
+
+    def _end_deferred_updates(self):
+        state = self._deferred
+        state.depth -= 1
+        if state.depth or not state.requested:
+            return
+        state.requested = False
+        if state.full:
+            self.update_status(update_index=state.update_index)
+        else:
+            self.update_file_status(update_index=state.update_index)
+
+    def save_snapshot(self):
+        """Remember the current status for the next startup
+
+        The snapshot is only rewritten when the status or its key changed.
+
+        """
+        if (self.filter_paths is not None or self.amending() or
+                not snapshot.enabled()):
+            return
+        data = snapshot.values(self)
+        if data != self._snapshot:
+            snapshot.save(self, data)
+            self._snapshot = data
+
+    def restore_snapshot(self):
+        """Show the status saved by a previous session when it is current
+
+        Returns True when a snapshot was applied.  A full update should
+        follow since the worktree may have changed in the meantime.
+
+        """
+        if (self.status_scanned or self.filter_paths is not None or
+                not snapshot.enabled()):
+            return False
+        state = snapshot.load(self.git)
+        if state is None:
+            return False
+        self.notify_observers(self.message_about_to_update)
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._update_selection()
+        self.notify_observers(self.message_updated)
+        return True
 
     def _update_files(self, update_index=False):
+        gitcmds.clear_diff_cache()
         display_untracked = prefs.display_untracked()
+        if prefs.collapse_untracked():
+            expanded_untracked = self.expanded_untracked
+        else:
+            expanded_untracked = None
         state = gitcmds.worktree_state(head=self.head,
                                        update_index=update_index,
                                        display_untracked=display_untracked,
-                                       paths=self.filter_paths)
+                                       paths=self.filter_paths,
+                                       expanded_untracked=expanded_untracked)
         self.staged = state.get('staged', [])
         self.modified = state.get('modified', [])
         self.unmerged = state.get('unmerged', [])
@@ -202,7 +292,9 @@ class MainModel(Observable):
         self.staged_deleted = state.get('staged_deleted', set())
         self.unstaged_deleted = state.get('unstaged_deleted', set())
         self.submodules = state.get('submodules', set())
+        self._update_selection()
 
+    def _update_selection(self):
         sel = selection_model()
         if self.is_empty():
             sel.reset()
@@ -211,23 +303,33 @@ class MainModel(Observable):
         if selection_model().is_empty():
             self.set_diff_text('')
 
+    def expand_untracked(self, paths):
+        """List the contents of collapsed "dir/" untracked entries"""
+        self.expanded_untracked.update(paths)
+        self.update_file_status()
+
+    def collapse_untracked(self, path):
+        """Show an expanded untracked directory as a single entry again"""
+        self.expanded_untracked = set([p for p in self.expanded_untracked
+                                       if not p.startswith(path)])
+        self.update_file_status()
+
     def is_empty(self):
         return not(bool(self.staged or self.modified or
                         self.unmerged or self.untracked))
 
-    def _update_remotes(self):
-        self.remotes = self.git.remote()[STDOUT].splitlines()
+    def _update_refs(self):
+        """Update the remotes, branches and tags from a single ref query"""
+        state = gitcmds.ref_state(git=self.git)
+        self.remotes = list(state.remotes)
+        self.local_branches = list(state.local_branches)
+        self.remote_branches = list(state.remote_branches)
+        self.tags = list(state.tags)
 
     def _update_branch_heads(self):
         # Set these early since they are used to calculate 'upstream_changed'.
         self.currentbranch = gitcmds.current_branch()
 
-    def _update_branches_and_tags(self):
-        local_branches, remote_branches, tags = gitcmds.all_refs(split=True)
-        self.local_branches = local_branches
-        self.remote_branches = remote_branches
-        self.tags = tags
-
     def _update_merge_rebase_status(self):
         self.is_merging = core.exists(self.git.git_path('MERGE_HEAD'))
         self.is_rebasing = core.exists(self.git.git_path('rebase-merge'))
@@ -252,85 +354,37 @@ class MainModel(Observable):
             self.set_commitmsg(self._prev_commitmsg)
 
     def update_remotes(self):
-        self._update_remotes()
-        self._update_branches_and_tags()
+        self._update_refs()
 
     def delete_branch(self, branch):
         status, out, err = self.git.branch(branch, D=True)
-        self._update_branches_and_tags()
+        self._update_refs()
         return status, out, err
 
     def rename_branch(self, branch, new_branch):
         status, out, err = self.git.branch(branch, new_branch, M=True)
         self.notify_observers(self.message_about_to_update)
-        self._update_branches_and_tags()
+        self._update_refs()
         self._update_branch_heads()
         self.notify_observers(self.message_updated)
         return status, out, err
 
-    def _sliced_op(self, input_items, map_fn):
-        """Slice input_items and call map_fn over every slice
-
-        This exists because of "errno: Argument list too long"
-
-        """
-        # This comment appeared near the top of include/linux/binfmts.h
-        # in the Linux source tree:
-        #
-        # /*
-        #  * MAX_ARG_PAGES defines the number of pages allocated for arguments
-        #  * and envelope for the new program. 32 should suffice, this gives
-        #  * a maximum env+arg of 128kB w/4KB pages!
-        #  */
-        # #define MAX_ARG_PAGES 32
-        #
-        # 'size' is a heuristic to keep things highly performant by minimizing
-        # the number of slices.  If we wanted it to run as few commands as
-        # possible we could call "getconf ARG_MAX" and make a better guess,
-        # but it's probably not worth the complexity (and the extra call to
-        # getconf that we can't do on Windows anyways).
-        #
-        # In my testing, getconf ARG_MAX on Mac OS X Mountain Lion reported
-        # 262144 and Debian/Linux-x86_64 reported 2097152.
-        #
-        # The hard-coded max_arg_len value is safely below both of these
-        # real-world values.
-
-        max_arg_len = 32 * 4 * 1024
-        avg_filename_len = 300
-        size = max_arg_len // avg_filename_len
-
-        status = 0
-        outs = []
-        errs = []
-
-        items = copy.copy(input_items)
-        while items:
-            stat, out, err = map_fn(items[:size])
-            status = max(stat, status)
-            outs.append(out)
-            errs.append(err)
-            items = items[size:]
-
-        return (status, '\n'.join(outs), '\n'.join(errs))
-
-    def _sliced_add(self, input_items):
-        lambda_fn = lambda x: self.git.add('--', force=True, verbose=True, *x)
-        return self._sliced_op(input_items, lambda_fn)
+    def _add_paths(self, paths):
+        return gitcmds.pathspec_op('add', paths, git=self.git,
+                                   opts=dict(force=True, verbose=True))
 
     def stage_modified(self):
-        status, out, err = self._sliced_add(self.modified)
+        status, out, err = self._add_paths(self.modified)
         self.update_file_status()
         return (status, out, err)
 
     def stage_untracked(self):
-        status, out, err = self._sliced_add(self.untracked)
+        status, out, err = self._add_paths(self.untracked)
         self.update_file_status()
         return (status, out, err)
 
     def reset(self, *items):
-        lambda_fn = lambda x: self.git.reset('--', *x)
-        status, out, err = self._sliced_op(items, lambda_fn)
+        status, out, err = gitcmds.pathspec_op('reset', items, git=self.git)
         self.update_file_status()
         return (status, out, err)
 
@@ -390,17 +444,6 @@ class MainModel(Observable):
                 return url
         return self.git.config('remote.%s.url' % name, get=True)[STDOUT]
 
-    def fetch(self, remote, **opts):
-        return run_remote_action(self.git.fetch, remote, **opts)
-
-    def push(self, remote, remote_branch='', local_branch='', **opts):
-        # Swap the branches in push mode (reverse of fetch)
-        opts.update(dict(local_branch=remote_branch, remote_branch=local_branch))
-        return run_remote_action(self.git.push, remote, **opts)
-
-    def pull(self, remote, **opts):
-        return run_remote_action(self.git.pull, remote, pull=True, **opts)
-
     def create_branch(self, name, base, track=False, force=False):
         """Create a branch named 'name' from revision 'base'
 
@@ -449,21 +492,16 @@ class MainModel(Observable):
             else:
                 remove.append(path)
 
-        self.notify_observers(self.message_about_to_update)
-
         # `git add -u` doesn't work on untracked files
         if add:
-            self._sliced_add(add)
+            self._add_paths(add)
 
         # If a path doesn't exist then that means it should be removed
         # from the index.   We use `git add -u` for that.
         if remove:
-            while remove:
-                self.git.add('--', u=True, *remove[:42])
-                remove = remove[42:]
+            gitcmds.pathspec_op('add', remove, git=self.git, opts=dict(u=True))
 
-        self._update_files()
-        self.notify_observers(self.message_updated)
+        self.update_file_status()
 
     def unstage_paths(self, paths):
         if not paths:
@@ -485,6 +523,20 @@ class MainModel(Observable):
 
 
 # Helpers
+class DeferredUpdates(object):
+    """Context manager returned by MainModel.defer_updates()"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def __enter__(self):
+        self.model._begin_deferred_updates()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.model._end_deferred_updates()
+
+
 def remote_args(remote,
                 local_branch='',
                 remote_branch='',
@@ -520,8 +572,3 @@ def refspec_arg(local_branch, remote_branch, ffwd, pull):
     else:
         what = local_branch or remote_branch or None
     return what
-
-
-def run_remote_action(action, remote, **kwargs):
-    args, kwargs = remote_args(remote, **kwargs)
-    return action(*args, **kwargs)
@@ -19,13 +19,36 @@ MERGE_KEEPBACKUP = 'merge.keepbackup'
 MERGE_VERBOSITY = 'merge.verbosity'
 MERGETOOL = 'merge.tool'
 SAVEWINDOWSETTINGS = 'cola.savewindowsettings'
+SHOW_UNTRACKED_FILES = 'status.showuntrackedfiles'
 USER_EMAIL = 'user.email'
 USER_NAME = 'user.name'
 
 
 
 def display_untracked():
-    return gitcfg.current().get(DISPLAY_UNTRACKED, True)
+    return (gitcfg.current().get(DISPLAY_UNTRACKED, True) and
+            show_untracked_files() != 'no')
+
+
+def show_untracked_files():
+    """Return "no", "normal" or "all"
+
+    Every untracked file is listed unless collapsing is requested, so
+    this defaults to "all".
+
+    """
+    value = gitcfg.current().get(SHOW_UNTRACKED_FILES, 'all')
+    # git also accepts booleans
+    if value is True:
+        return 'normal'
+    if value is False:
+        return 'no'
+    return value
+
+
+def collapse_untracked():
+    """Should fully untracked directories be shown as a single entry?"""
+    return show_untracked_files() == 'normal'
 
 
 def editor():
@@ -0,0 +1,110 @@
+"""Persists the last known status so that it can be shown on startup
+
+A snapshot is only trusted when HEAD and the index are unchanged since it
+was written.  It is always followed by a fresh scan, so it only needs to
+be close enough to show something useful while the scan runs.
+
+"""
+from __future__ import division, absolute_import, unicode_literals
+
+import hashlib
+
+from cola import core
+from cola import gitcfg
+from cola import gitcmds
+from cola import resources
+from cola.models import prefs
+from cola.settings import read_json
+from cola.settings import write_json
+
+
+SNAPSHOT = 'cola.statussnapshot'
+VERSION = 1
+
+# List-valued model attributes that are saved in the snapshot
+LISTS = (
+    'staged',
+    'modified',
+    'unmerged',
+    'untracked',
+    'upstream_changed',
+    'local_branches',
+    'remote_branches',
+    'tags',
+    'remotes',
+)
+
+# Set-valued model attributes that are saved in the snapshot
+SETS = (
+    'staged_deleted',
+    'unstaged_deleted',
+    'submodules',
+)
+
+
+def enabled():
+    return gitcfg.current().get(SNAPSHOT, True)
+
+
+def path(git):
+    key = hashlib.sha1(core.encode(git.worktree())).hexdigest()
+    return resources.cache_home('status', key + '.json')
+
+
+def key(git):
+    """Return the values that must match for a snapshot to be used"""
+    head = gitcmds.ref_state(git=git).head
+    try:
+        st = core.stat(git.git_path('index'))
+        index = [st.st_mtime, st.st_size]
+    except OSError:
+        index = None
+    return {
+        'version': VERSION,
+        'head': head,
+        'index': index,
+        'display_untracked': bool(prefs.display_untracked()),
+        'collapse_untracked': bool(prefs.collapse_untracked()),
+    }
+
+
+def values(model):
+    """Return the model's status as it would be saved"""
+    result = {
+        'key': key(model.git),
+        'currentbranch': model.currentbranch,
+        'is_merging': model.is_merging,
+        'is_rebasing': model.is_rebasing,
+    }
+    for name in LISTS:
+        result[name] = list(getattr(model, name))
+    for name in SETS:
+        result[name] = sorted(getattr(model, name))
+    return result
+
+
+def save(model, data=None):
+    """Write the model's status to the snapshot for its repository"""
+    if data is None:
+        data = values(model)
+    write_json(data, path(model.git))
+
+
+def load(git):
+    """Return the saved status as a dict, or None when it is out of date"""
+    snapshot_path = path(git)
+    if not core.exists(snapshot_path):
+        return None
+    values = read_json(snapshot_path)
+    if not values or values.get('key') != key(git):
+        return None
+    state = {
+        'currentbranch': values.get('currentbranch', ''),
+        'is_merging': bool(values.get('is_merging')),
+        'is_rebasing': bool(values.get('is_rebasing')),
+    }
+    for name in LISTS:
+        state[name] = list(values.get(name, []))
+    for name in SETS:
+        state[name] = set(values.get(name, []))
+    return state
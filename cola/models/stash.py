@@ -1,6 +1,11 @@
 from __future__ import division, absolute_import, unicode_literals
 
+import os
+
+from cola import cache
+from cola import core
 from cola import observable
+from cola import refs
 from cola.git import git
 from cola.git import STDOUT
 from cola.interaction import Interaction
@@ -8,11 +13,56 @@ from cola.models import main
 
 
 class StashModel(observable.Observable):
+    """Lists stashes and shows their diffs
+
+    The stash list is read from the stash reflog with a single command and
+    reused until the reflog changes.  Stash commits never change, so their
+    diffs are cached by sha1.
+
+    """
+    # Stash lists keyed by the reflog path
+    _stash_lists = cache.LRUCache(maxsize=8)
+    # Diffs keyed by stash sha1
+    _diffs = cache.LRUCache(maxsize=32)
+
     def __init__(self):
         observable.Observable.__init__(self)
 
+    def stash_entries(self):
+        """Return a list of (sha1, revid, subject) tuples"""
+        # The stash reflog is shared by all worktrees
+        common_dir = refs.common_dir(git.git_path())
+        if core.isdir(os.path.join(common_dir, 'reftable')):
+            # There is no reflog file to watch
+            return self._read_entries()
+        path = os.path.join(common_dir, 'logs', 'refs', 'stash')
+        try:
+            st = core.stat(path)
+        except OSError:
+            return []
+        key = (st.st_mtime, st.st_size)
+        cached = self._stash_lists.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        entries = self._read_entries()
+        self._stash_lists.put(path, (key, entries))
+        return entries
+
+    @staticmethod
+    def _read_entries():
+        out = git.stash('list', '--format=%H%x00%gd%x00%gs')[STDOUT]
+        entries = []
+        for line in out.splitlines():
+            try:
+                sha1, revid, subject = line.split('\0', 2)
+            except ValueError:
+                continue
+            entries.append((sha1, revid, subject))
+        return entries
+
     def stash_list(self):
-        return git.stash('list')[STDOUT].splitlines()
+        return ['%s: %s' % (revid, subject)
+                for sha1, revid, subject in self.stash_entries()]
 
     def has_stashable_changes(self):
         model = main.model()
@@ -20,16 +70,35 @@ class StashModel(observable.Observable):
 
     def stash_info(self, revids=False, names=False):
         """Parses "git stash list" and returns a list of stashes."""
-        stashes = self.stash_list()
-        revids = [s[:s.index(':')] for s in stashes]
-        names = [s.split(': ', 2)[-1] for s in stashes]
+        entries = self.stash_entries()
+        stashes = ['%s: %s' % (revid, subject)
+                   for sha1, revid, subject in entries]
+        revids = [revid for sha1, revid, subject in entries]
+        names = [subject.split(': ', 1)[-1]
+                 for sha1, revid, subject in entries]
 
         return stashes, revids, names
 
+    def stash_sha1(self, rev):
+        """Return the sha1 of the stash named by `rev`"""
+        for sha1, revid, subject in self.stash_entries():
+            if rev in (revid, sha1):
+                return sha1
+        return git.rev_parse(rev)[STDOUT].strip()
+
+    def cached_stash_diff(self, rev):
+        """Return the stash's diff if it has been read already, or None"""
+        return self._diffs.get(self.stash_sha1(rev))
+
     def stash_diff(self, rev):
-        diffstat = git.stash('show', rev)[STDOUT]
-        diff = git.stash('show', '-p', '--no-ext-diff', rev)[STDOUT]
-        return diffstat + '\n\n' + diff
+        sha1 = self.stash_sha1(rev)
+        diff = self._diffs.get(sha1)
+        if diff is None:
+            diff = git.stash('show', '--stat', '-p', '--no-ext-diff',
+                             sha1 or rev)[STDOUT]
+            if sha1:
+                self._diffs.put(sha1, diff)
+        return diff
 
 
 class ApplyStash(object):
@@ -2,29 +2,141 @@
 """This module provides the Observable class"""
 from __future__ import division, absolute_import, unicode_literals
 
+import threading
+
 
 class Observable(object):
     """Handles subject/observer notifications."""
     def __init__(self):
         self.notification_enabled = True
         self.observers = {}
+        # message -> tuple of observers, rebuilt when observers change
+        self._observer_lists = {}
+        # Notifications batched by the current thread
+        self._batch = threading.local()
 
     def add_observer(self, message, observer):
         """Add an observer for a specific message."""
         observers = self.observers.setdefault(message, set())
         observers.add(observer)
+        self._observer_lists.pop(message, None)
 
     def remove_observer(self, observer):
         """Remove an observer."""
         for message, observers in self.observers.items():
             if observer in observers:
                 observers.remove(observer)
+                self._observer_lists.pop(message, None)
+
+    def batch(self):
+        """Collapse the notifications sent by the current thread
+
+        Returns a context manager.  Notifications sent inside of it are
+        delivered when the outermost batch exits.  Repeated notifications
+        are delivered once, at the position where they were last sent, so
+        the final notification always describes the final state.
+
+        """
+        return NotificationBatch(self)
+
+    def unbatched(self):
+        """Suspend the current thread's batch
+
+        Returns a context manager.  Pending notifications are delivered
+        when it is entered and notifications sent inside of it are
+        delivered immediately.  Modal dialogs use it so that their nested
+        event loop does not hold back notifications until they close.
+
+        """
+        return NotificationPause(self)
 
     def notify_observers(self, message, *args, **opts):
         """Pythonic signals and slots."""
         if not self.notification_enabled:
             return
-        # observers can remove themselves during their callback so grab a copy
-        observers = set(self.observers.get(message, set()))
+        pending = getattr(self._batch, 'pending', None)
+        if pending is not None:
+            notification = (message, args, opts)
+            if notification in pending:
+                pending.remove(notification)
+            pending.append(notification)
+            return
+        self._deliver(message, args, opts)
+
+    def _deliver(self, message, args, opts):
+        # The snapshot is immutable so observers can remove themselves
+        # during their callback
+        observers = self._observer_lists.get(message)
+        if observers is None:
+            observers = tuple(self.observers.get(message, ()))
+            self._observer_lists[message] = observers
         for method in observers:
             method(*args, **opts)
+
+    def _begin_batch(self):
+        state = self._batch
+        if not getattr(state, 'depth', 0):
+            state.depth = 0
+            state.pending = []
+        state.depth += 1
+
+    def _end_batch(self):
+        state = self._batch
+        state.depth -= 1
+        if state.depth:
+            return
+        pending = state.pending
+        state.pending = None
+        for message, args, opts in pending:
+            if self.notification_enabled:
+                self._deliver(message, args, opts)
+
+
+    def _pause_batch(self):
+        state = self._batch
+        depth = getattr(state, 'depth', 0)
+        if not depth:
+            return 0
+        pending = state.pending
+        state.depth = 0
+        state.pending = None
+        for message, args, opts in pending:
+            if self.notification_enabled:
+                self._deliver(message, args, opts)
+        return depth
+
+    def _resume_batch(self, depth):
+        if not depth:
+            return
+        state = self._batch
+        state.depth = depth
+        state.pending = []
+
+
+class NotificationBatch(object):
+    """Context manager returned by Observable.batch()"""
+
+    def __init__(self, observable):
+        self.observable = observable
+
+    def __enter__(self):
+        self.observable._begin_batch()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.observable._end_batch()
+
+
+class NotificationPause(object):
+    """Context manager returned by Observable.unbatched()"""
+
+    def __init__(self, observable):
+        self.observable = observable
+        self.depth = 0
+
+    def __enter__(self):
+        self.depth = self.observable._pause_batch()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.observable._resume_batch(self.depth)
@@ -0,0 +1,80 @@
+"""Provides a lightweight startup profiler
+
+Set GIT_COLA_PROFILE=1 or pass --profile to report how long the startup
+milestones take.  Milestones are measured from the moment this module is
+first imported, which happens before the rest of cola is loaded.
+
+"""
+from __future__ import division, absolute_import, unicode_literals
+
+import threading
+import time
+
+from cola import core
+
+
+_start = time.time()
+_lock = threading.Lock()
+_marks = []
+_seen = set()
+_enabled = bool(core.getenv('GIT_COLA_PROFILE', ''))
+
+
+def enabled():
+    return _enabled
+
+
+def enable():
+    """Report the marks recorded so far along with all subsequent marks"""
+    global _enabled
+    with _lock:
+        if _enabled:
+            return
+        _enabled = True
+        for name, elapsed in _marks:
+            _report(name, elapsed)
+
+
+def mark(name):
+    """Record the time elapsed since startup for a milestone"""
+    elapsed = time.time() - _start
+    with _lock:
+        _marks.append((name, elapsed))
+        if _enabled:
+            _report(name, elapsed)
+
+
+def mark_once(name):
+    """Record a milestone the first time it is reached"""
+    with _lock:
+        if name in _seen:
+            return
+        _seen.add(name)
+    mark(name)
+
+
+def marks():
+    with _lock:
+        return list(_marks)
+
+
+def _report(name, elapsed):
+    core.stderr('profile: %8.1f ms  %s' % (elapsed * 1000.0, name))
+
+
+class Timer(object):
+    """Context manager that records how long a block takes"""
+
+    def __init__(self, name):
+        self.name = name
+        self.begin = 0
+
+    def __enter__(self):
+        self.begin = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if _enabled:
+            duration = (time.time() - self.begin) * 1000.0
+            mark('%s (%.1f ms)' % (self.name, duration))
+        return False
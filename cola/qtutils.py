@@ -20,6 +20,7 @@ from cola import resources
 from cola.decorators import memoize
 from cola.i18n import N_
 from cola.interaction import Interaction
+from cola.models import main
 from cola.models.prefs import FONTDIFF
 from cola.widgets import defs
 from cola.compat import ustr
@@ -197,6 +198,18 @@ def cached_icon_from_path(filename):
     return QtGui.QIcon(filename)
 
 
+def exec_dialog(dialog):
+    """Run a modal dialog without holding back model notifications
+
+    Commands batch the model's notifications while they run.  The
+    dialog's event loop may refresh the model, so the batch is suspended
+    until it closes.
+
+    """
+    with main.model().unbatched():
+        return dialog.exec_()
+
+
 def confirm(title, text, informative_text, ok_text,
             icon=None, default=True):
     """Confirm that an action should take place"""
@@ -216,7 +229,7 @@ def confirm(title, text, informative_text, ok_text,
         msgbox.setDefaultButton(ok)
     else:
         msgbox.setDefaultButton(cancel)
-    msgbox.exec_()
+    exec_dialog(msgbox)
     return msgbox.clickedButton() == ok
 
 
@@ -255,7 +268,7 @@ def critical(title, message=None, details=None):
     mbox.setDefaultButton(QtGui.QMessageBox.Close)
     if details:
         mbox.setDetailedText(details)
-    mbox.exec_()
+    exec_dialog(mbox)
 
 
 def information(title, message=None, details=None, informative_text=None):
@@ -276,7 +289,7 @@ def information(title, message=None, details=None, informative_text=None):
     # Render git-cola.svg into a 1-inch wide pixmap
     pixmap = git_icon().pixmap(96)
     mbox.setIconPixmap(pixmap)
-    mbox.exec_()
+    exec_dialog(mbox)
 
 
 def question(title, msg, default=True):
@@ -289,8 +302,9 @@ def question(title, msg, default=True):
         default = yes
     else:
         default = no
-    result = (QtGui.QMessageBox
-                   .question(active_window(), title, msg, buttons, default))
+    with main.model().unbatched():
+        result = (QtGui.QMessageBox
+                       .question(active_window(), title, msg, buttons, default))
     return result == QtGui.QMessageBox.Yes
 
 
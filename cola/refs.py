@@ -0,0 +1,146 @@
+"""Reads refs directly from the repository without running git
+
+Refs are stored as loose files below refs/ and in the packed-refs file.
+Both live in the "common" directory, which is the git directory itself
+except in linked worktrees, where it is named by the "commondir" file.
+
+Directories are re-read only when their mtime changes.  Git updates a
+loose ref by renaming a lock file over it, which always changes the mtime
+of the containing directory.  Repositories that use a ref backend that we
+do not understand, e.g. reftable, are reported as unsupported so that
+callers can fall back to "git for-each-ref".
+
+"""
+from __future__ import division, absolute_import, unicode_literals
+
+import os
+import threading
+
+from cola import core
+
+
+SYMREF_PREFIX = 'ref: '
+
+
+def common_dir(git_dir):
+    """Return the directory that holds the refs shared by all worktrees"""
+    try:
+        value = core.read(os.path.join(git_dir, 'commondir')).strip()
+    except (IOError, OSError):
+        return git_dir
+    if not value:
+        return git_dir
+    return os.path.normpath(os.path.join(git_dir, value))
+
+
+def parse_packed_refs(text):
+    """Return a dict mapping refnames to object ids from packed-refs text"""
+    refs = {}
+    for line in text.splitlines():
+        # Skip the header and the peeled values of annotated tags
+        if not line or line[0] in '#^':
+            continue
+        try:
+            sha1, refname = line.split(' ', 1)
+        except ValueError:
+            continue
+        refs[refname] = sha1
+    return refs
+
+
+class RefDatabase(object):
+    """Reads the refs of one repository and remembers what it has read"""
+
+    def __init__(self, git_dir):
+        self.git_dir = git_dir
+        self.common_dir = common_dir(git_dir)
+        self._lock = threading.Lock()
+        self._packed_key = None
+        self._packed = {}
+        # directory path -> (mtime, {refname: value}, [subdirectories])
+        self._dirs = {}
+
+    def supported(self):
+        """Can the refs be read without git?"""
+        if core.isdir(os.path.join(self.common_dir, 'reftable')):
+            return False
+        return core.isdir(os.path.join(self.common_dir, 'refs'))
+
+    def refs(self):
+        """Return a dict mapping refnames to object ids
+
+        Loose refs take precedence over packed refs.  Symbolic refs are
+        resolved when their target is known and omitted otherwise.
+
+        """
+        with self._lock:
+            result = dict(self._packed_refs())
+            seen = set()
+            loose = {}
+            self._read_dir(os.path.join(self.common_dir, 'refs'), 'refs',
+                           loose, seen)
+            # Forget directories that no longer exist
+            for path in [p for p in self._dirs if p not in seen]:
+                del self._dirs[path]
+
+        symrefs = {}
+        for refname, value in loose.items():
+            if value.startswith(SYMREF_PREFIX):
+                symrefs[refname] = value[len(SYMREF_PREFIX):]
+            else:
+                result[refname] = value
+        for refname, target in symrefs.items():
+            sha1 = result.get(target)
+            if sha1:
+                result[refname] = sha1
+        return result
+
+    def _packed_refs(self):
+        path = os.path.join(self.common_dir, 'packed-refs')
+        try:
+            st = core.stat(path)
+        except OSError:
+            self._packed_key = None
+            self._packed = {}
+            return self._packed
+        key = (st.st_mtime, st.st_size)
+        if key != self._packed_key:
+            self._packed = parse_packed_refs(core.read(path))
+            self._packed_key = key
+        return self._packed
+
+    def _read_dir(self, path, prefix, dest, seen):
+        try:
+            mtime = core.stat(path).st_mtime
+        except OSError:
+            return
+        seen.add(path)
+        cached = self._dirs.get(path)
+        if cached is None or cached[0] != mtime:
+            refs = {}
+            subdirs = []
+            try:
+                names = os.listdir(core.mkpath(path))
+            except OSError:
+                names = []
+            for name in names:
+                name = core.decode(name)
+                if name.endswith('.lock'):
+                    continue
+                child = os.path.join(path, name)
+                if core.isdir(child):
+                    subdirs.append(name)
+                    continue
+                try:
+                    value = core.read(child).strip()
+                except (IOError, OSError):
+                    continue
+                if value:
+                    refs[prefix + '/' + name] = value
+            cached = (mtime, refs, subdirs)
+            self._dirs[path] = cached
+
+        dest.update(cached[1])
+        for name in cached[2]:
+            self._read_dir(os.path.join(path, name), prefix + '/' + name,
+                           dest, seen)
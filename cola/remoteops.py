@@ -0,0 +1,214 @@
+"""Runs fetch, push and pull against several remotes at once
+
+Each operation runs "git <action> --progress" in its own process.  The
+progress meter that git writes to stderr is parsed as it arrives so that
+callers can show the object counts and throughput of every remote.
+
+Operations run on a bounded pool of worker threads.  Fetch and push do
+not touch the index so they run concurrently; pull merges into the
+worktree and therefore holds the index lock while it runs.
+
+"""
+from __future__ import division, absolute_import, unicode_literals
+
+import os
+import re
+import subprocess
+import tempfile
+import threading
+
+from cola import core
+from cola import version
+from cola.git import INDEX_LOCK
+from cola.git import git
+from cola.git import popen_extra
+from cola.git import trace
+from cola.models.main import remote_args
+
+
+FETCH = 'fetch'
+PUSH = 'push'
+PULL = 'pull'
+
+# The number of remotes that are contacted at the same time
+MAX_WORKERS = 4
+
+# e.g. "Receiving objects:  45% (450/1000), 1.20 MiB | 2.40 MiB/s"
+PROGRESS_RGX = re.compile(
+    r'^(?:remote: )?(?P<phase>[A-Za-z][A-Za-z ]*):\s+'
+    r'(?P<percent>\d+)% \((?P<done>\d+)/(?P<total>\d+)\)'
+    r'(?:, (?P<size>[\d.]+ \w+)(?: \| (?P<rate>[\d.]+ \w+/s))?)?')
+
+
+class Progress(object):
+    """One progress report from git for a remote"""
+
+    def __init__(self, remote, phase, percent, done, total,
+                 size=None, rate=None):
+        self.remote = remote
+        self.phase = phase
+        self.percent = percent
+        self.done = done
+        self.total = total
+        self.size = size
+        self.rate = rate
+
+    def __repr__(self):
+        return ('Progress(%r, %r, %d%%, %d/%d, %r, %r)' %
+                (self.remote, self.phase, self.percent, self.done,
+                 self.total, self.size, self.rate))
+
+
+def parse_progress(remote, line):
+    """Parse a line of git's progress meter, returning Progress or None"""
+    match = PROGRESS_RGX.match(line.strip())
+    if not match:
+        return None
+    return Progress(remote, match.group('phase'),
+                    int(match.group('percent')),
+                    int(match.group('done')),
+                    int(match.group('total')),
+                    size=match.group('size'),
+                    rate=match.group('rate'))
+
+
+class Result(object):
+    """The outcome of one remote operation"""
+
+    def __init__(self, remote, status, out, err):
+        self.remote = remote
+        self.status = status
+        self.out = out
+        self.err = err
+
+
+def command(action, remote, **kwargs):
+    """Return the git command line for a fetch, push or pull"""
+    if action == PUSH:
+        # Swap the branches in push mode (reverse of fetch)
+        local_branch = kwargs.pop('local_branch', '')
+        remote_branch = kwargs.pop('remote_branch', '')
+        kwargs['local_branch'] = remote_branch
+        kwargs['remote_branch'] = local_branch
+    elif action == PULL:
+        kwargs['pull'] = True
+    args, opts = remote_args(remote, **kwargs)
+    opts['progress'] = True
+    return ['git', action] + git.transform_kwargs(**opts) + args
+
+
+def run(action, remote, progress=None, write_fetch_head=True, add_env=None,
+        **kwargs):
+    """Run a remote operation and return a Result
+
+    `progress` is called with a Progress instance for each update.
+    Pass write_fetch_head=False when other fetches may run at the same
+    time, since they would otherwise overwrite each other's FETCH_HEAD.
+
+    """
+    cmd = command(action, remote, **kwargs)
+    if action == FETCH and not write_fetch_head and version.check(
+            'fetch-no-write-fetch-head', version.git_version()):
+        cmd.insert(2, '--no-write-fetch-head')
+    if action == PULL:
+        with INDEX_LOCK:
+            return _run(cmd, remote, progress, add_env)
+    return _run(cmd, remote, progress, add_env)
+
+
+def _run(cmd, remote, progress, add_env):
+    out_fp = tempfile.TemporaryFile()
+    proc = core.start_command(cmd, add_env=add_env,
+                              stdout=out_fp, stderr=subprocess.PIPE,
+                              **popen_extra())
+    proc.stdin.close()
+
+    # git redraws its progress meter with carriage returns
+    lines = []
+    pending = b''
+    fd = proc.stderr.fileno()
+    while True:
+        data = os.read(fd, 4096)
+        if not data:
+            break
+        pending += data.replace(b'\r', b'\n')
+        chunks = pending.split(b'\n')
+        pending = chunks.pop()
+        for chunk in chunks:
+            _stderr_line(remote, core.decode(chunk), lines, progress)
+    if pending:
+        _stderr_line(remote, core.decode(pending), lines, progress)
+    proc.stderr.close()
+    status = proc.wait()
+
+    out_fp.seek(0)
+    out = core.decode(out_fp.read()).rstrip('\n')
+    out_fp.close()
+    err = '\n'.join(lines)
+    trace(cmd, status, out, err)
+    return Result(remote, status, out, err)
+
+
+def _stderr_line(remote, line, lines, progress):
+    info = parse_progress(remote, line)
+    if info is None:
+        if line.strip():
+            lines.append(line)
+        return
+    if progress is not None:
+        progress(info)
+    # Keep only the final state of each progress meter
+    if info.percent == 100 and (info.done == info.total):
+        lines.append(line.strip())
+
+
+def run_all(action, remotes, progress=None, max_workers=MAX_WORKERS,
+            **kwargs):
+    """Run an operation against several remotes concurrently
+
+    Returns a list of Results in the same order as `remotes`.
+
+    """
+    remotes = list(remotes)
+    concurrent = len(remotes) > 1
+    if action == FETCH and concurrent and not version.check(
+            'fetch-no-write-fetch-head', version.git_version()):
+        max_workers = 1
+    results = [None] * len(remotes)
+    slots = threading.Semaphore(max(1, max_workers))
+
+    def worker(idx, remote):
+        try:
+            results[idx] = run(action, remote, progress=progress,
+                               write_fetch_head=not concurrent,
+                               **dict(kwargs))
+        except (OSError, IOError) as e:
+            results[idx] = Result(remote, 1, '', core.decode(str(e)))
+        finally:
+            slots.release()
+
+    threads = []
+    for idx, remote in enumerate(remotes):
+        slots.acquire()
+        thread = threading.Thread(target=worker, args=(idx, remote))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def combine(results):
+    """Aggregate Results into a single (status, out, err) tuple"""
+    status = 0
+    outs = []
+    errs = []
+    many = len(results) > 1
+    for result in results:
+        status = max(status, result.status)
+        header = many and ('%s:\n' % result.remote) or ''
+        if result.out:
+            outs.append(header + result.out)
+        if result.err:
+            errs.append(header + result.err)
+    return (status, '\n\n'.join(outs), '\n\n'.join(errs))
@@ -70,3 +70,9 @@ def config_home(*args):
     config = core.getenv('XDG_CONFIG_HOME',
                          os.path.join(core.expanduser('~'), '.config'))
     return os.path.join(config, 'git-cola', *args)
+
+
+def cache_home(*args):
+    cache = core.getenv('XDG_CACHE_HOME',
+                        os.path.join(core.expanduser('~'), '.cache'))
+    return os.path.join(cache, 'git-cola', *args)
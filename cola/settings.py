@@ -5,7 +5,10 @@ from __future__ import division, absolute_import, unicode_literals
 
 import os
 import sys
+import threading
+import time
 
+from cola import cache
 from cola import core
 from cola import git
 from cola import resources
@@ -45,6 +48,94 @@ def write_json(values, path):
         sys.stderr.write('git-cola: error writing "%s"\n' % path)
 
 
+class PathVerifier(object):
+    """Checks repository paths concurrently and remembers the verdicts
+
+    Paths on network shares and automounted directories can take seconds
+    to stat, so every path is checked in its own thread and callers only
+    wait until a deadline.  Paths that have not answered by then have an
+    unknown verdict.  Verdicts are reused until they are `ttl` seconds old.
+
+    """
+
+    def __init__(self, verify, ttl=60.0):
+        self.verify = verify
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._verdicts = cache.LRUCache(maxsize=256)  # path -> (time, ok)
+        self._threads = {}
+
+    def cached(self, path, now=None):
+        """Return the cached verdict for `path`, or None when unknown"""
+        if now is None:
+            now = time.time()
+        entry = self._verdicts.get(path)
+        if entry is None or now - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    def remember(self, path, ok):
+        self._verdicts.put(path, (time.time(), ok))
+
+    def forget(self, path):
+        """Check `path` again the next time it is needed"""
+        self._verdicts.pop(path)
+
+    def check(self, paths, timeout=2.0):
+        """Return a dict mapping each path to True, False or None
+
+        None means that the path did not answer within `timeout` seconds.
+        A timeout of zero only starts the checks and returns cached verdicts.
+
+        """
+        verdicts = {}
+        threads = []
+        with self._lock:
+            for path in paths:
+                verdict = self.cached(path)
+                if verdict is not None:
+                    verdicts[path] = verdict
+                    continue
+                thread = self._threads.get(path)
+                if thread is None:
+                    thread = threading.Thread(target=self._verify,
+                                              args=(path,))
+                    # Do not keep the process alive for a hung mount
+                    thread.daemon = True
+                    self._threads[path] = thread
+                    thread.start()
+                threads.append((path, thread))
+
+        deadline = time.time() + timeout
+        for path, thread in threads:
+            remaining = deadline - time.time()
+            if remaining > 0:
+                thread.join(remaining)
+            verdicts[path] = self.cached(path)
+        return verdicts
+
+    def _verify(self, path):
+        try:
+            ok = bool(self.verify(path))
+        except (IOError, OSError):
+            ok = False
+        self.remember(path, ok)
+        with self._lock:
+            self._threads.pop(path, None)
+
+
+_verifiers = {}
+
+
+def verifier(verify):
+    """Return the PathVerifier shared by all users of `verify`"""
+    try:
+        return _verifiers[verify]
+    except KeyError:
+        result = _verifiers[verify] = PathVerifier(verify)
+        return result
+
+
 class Settings(object):
     _file = resources.config_home('settings')
     bookmarks = property(lambda self: mklist(self.values['bookmarks']))
@@ -59,33 +150,38 @@ class Settings(object):
                 'recent': [],
         }
         self.verify = verify
+        self.verifier = verifier(verify)
 
-    def remove_missing(self):
-        missing_bookmarks = []
-        missing_recent = []
+    def verify_all(self, timeout=2.0):
+        """Check the bookmarks and recent repositories concurrently
 
-        for bookmark in self.bookmarks:
-            if not self.verify(bookmark):
-                missing_bookmarks.append(bookmark)
+        Returns a dict mapping each path to True, False, or None when the
+        path did not answer in time.
 
-        for bookmark in missing_bookmarks:
-            try:
-                self.bookmarks.remove(bookmark)
-            except:
-                pass
+        """
+        return self.verifier.check(self.bookmarks + self.recent,
+                                   timeout=timeout)
 
-        for recent in self.recent:
-            if not self.verify(recent):
-                missing_recent.append(recent)
+    def remove_missing(self, timeout=2.0):
+        """Remove the entries that are known to be missing
 
-        for recent in missing_recent:
-            try:
-                self.recent.remove(recent)
-            except:
-                pass
+        Entries that do not answer within `timeout` seconds are kept.
+
+        """
+        verdicts = self.verify_all(timeout=timeout)
+        self.remove_paths([path for path, ok in verdicts.items()
+                           if ok is False])
+
+    def remove_paths(self, paths):
+        """Remove the given paths from the bookmarks and recent repos"""
+        for path in paths:
+            for entries in (self.bookmarks, self.recent):
+                while path in entries:
+                    entries.remove(path)
 
     def add_bookmark(self, bookmark):
         """Adds a bookmark to the saved settings"""
+        self.verifier.forget(bookmark)
         if bookmark not in self.bookmarks:
             self.bookmarks.append(bookmark)
 
@@ -100,6 +196,7 @@ class Settings(object):
             self.recent.remove(entry)
 
     def add_recent(self, entry):
+        self.verifier.forget(entry)
         if entry in self.recent:
             self.recent.remove(entry)
         self.recent.insert(0, entry)
@@ -112,9 +209,16 @@ class Settings(object):
     def save(self):
         write_json(self.values, self.path())
 
-    def load(self):
+    def load(self, check_missing=True):
+        """Load the settings and remove missing repositories
+
+        Pass check_missing=False to skip the repository checks, e.g. when
+        the caller verifies them in the background with verify_all().
+
+        """
         self.values.update(self.asdict())
-        self.remove_missing()
+        if check_missing:
+            self.remove_missing()
 
     def asdict(self):
         path = self.path()
@@ -0,0 +1,470 @@
+"""Provides a precompiled symmetric-delete spelling dictionary
+
+The dictionary word lists are compiled into a sorted index file that maps
+"delete keys" onto the words that produce them.  The index is searched in
+place through mmap so that nothing needs to be loaded up front, and it is
+rebuilt only when the source word lists change.
+
+Words are stored under their single-character deletes, which keeps the
+index small.  A misspelled word is corrected by looking up its own
+deletes, plus the deletes of its single substitutions, insertions and
+transpositions so that words two edits away are found as well.  Every
+candidate is verified with edit_distance().
+
+"""
+from __future__ import division, absolute_import, unicode_literals
+
+import hashlib
+import mmap
+import os
+import re
+import string
+
+from cola import core
+from cola import gitcmds
+from cola import resources
+from cola.git import git
+from cola.git import STDOUT
+
+
+DICTIONARIES = (
+    ('/usr/share/dict/words', True),
+    ('/usr/share/dict/propernames', False),
+)
+
+# Bump the version whenever the index format changes
+INDEX_VERSION = 3
+
+# Only the leading characters of a word are used to build its keys,
+# which keeps the index small.  Candidates are verified in full.
+PREFIX_LENGTH = 7
+
+# The maximum edit distance considered when making suggestions
+MAX_DISTANCE = 2
+
+# The number of recent commits whose messages feed the project vocabulary,
+# and how many of them must use a word before it is trusted
+COMMIT_COUNT = 500
+COMMIT_WORD_MIN_COUNT = 2
+
+# Letters used to generate substitutions and insertions for lookups
+LETTERS = string.ascii_lowercase
+
+WORDS = re.compile(r"(?u)[\w']+")
+IDENTIFIER_PARTS = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+')
+SYMBOL_DEFINITION = re.compile(
+    r'\b(?:def|class|struct|enum|union|interface|function|func|fn|sub|'
+    r'module|type)\s+([A-Za-z_]\w*)')
+SYMBOL_GREP = (r'^[[:space:]]*(def|class|struct|enum|union|interface|'
+               r'function|func|fn|sub|module|type)[[:space:]]+[A-Za-z_]')
+
+
+def read_words(dictionaries=DICTIONARIES):
+    """Yield the words from the dictionary files that exist"""
+    for path, title in dictionaries:
+        try:
+            with core.xopen(path, 'rb') as f:
+                for line in f:
+                    word = core.decode(line).strip()
+                    if not word or ' ' in word or '\t' in word:
+                        continue
+                    yield word
+                    if title:
+                        yield word.title()
+        except (IOError, OSError):
+            pass
+
+
+def deletes(word, distance=1):
+    """Return the strings produced by deleting up to `distance` characters"""
+    result = set([word])
+    edits = set([word])
+    for _ in range(distance):
+        edits = set([e[:i] + e[i+1:] for e in edits for i in range(len(e))])
+        result.update(edits)
+    return result
+
+
+def edit_distance(a, b, limit=MAX_DISTANCE):
+    """Return the optimal string alignment distance between a and b
+
+    Distances greater than `limit` are reported as limit + 1.
+
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev_prev = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i-1] != b[j-1] and 1 or 0
+            current[j] = min(prev[j] + 1,
+                             current[j-1] + 1,
+                             prev[j-1] + cost)
+            if (prev_prev is not None and i > 1 and j > 1 and
+                    a[i-1] == b[j-2] and a[i-2] == b[j-1]):
+                current[j] = min(current[j], prev_prev[j-2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        prev_prev, prev = prev, current
+    return min(prev[-1], limit + 1)
+
+
+def index_keys(word):
+    """Return the keys under which `word` is stored in the index"""
+    return deletes(word[:PREFIX_LENGTH], distance=1)
+
+
+def growing_edits(word):
+    """Return the substitutions, insertions and transpositions of `word`
+
+    These are the edits that a delete on the query side cannot undo.
+
+    """
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    edits = set()
+    for a, b in splits:
+        for c in LETTERS:
+            edits.add(a + c + b)
+            if b:
+                edits.add(a + c + b[1:])
+        if len(b) > 1:
+            edits.add(a + b[1] + b[0] + b[2:])
+    return edits
+
+
+def query_keys(word):
+    """Return the keys to look up when searching for corrections of `word`
+
+    The index only holds single deletes.  Deletes up to MAX_DISTANCE find
+    words that are one growing edit away, and the deletes of each growing
+    edit find words that need two, e.g. two substitutions.
+
+    """
+    prefix = word[:PREFIX_LENGTH]
+    keys = deletes(prefix, distance=MAX_DISTANCE)
+    for edit in growing_edits(word[:PREFIX_LENGTH+1]):
+        keys.update(deletes(edit[:PREFIX_LENGTH], distance=1))
+    return keys
+
+
+def suggest(word, sources):
+    """Return the closest words from `sources` ordered by edit distance
+
+    Each source provides candidates(word); see SpellingIndex.
+
+    """
+    candidates = set()
+    for source in sources:
+        candidates.update(source.candidates(word))
+    scored = []
+    for candidate in candidates:
+        distance = edit_distance(word, candidate)
+        if distance <= MAX_DISTANCE:
+            scored.append((distance, candidate))
+    if not scored:
+        return [word]
+    scored.sort()
+    best = scored[0][0]
+    return [candidate for distance, candidate in scored
+            if distance == best]
+
+
+def dictionary_stamp(dictionaries=DICTIONARIES):
+    """Return a string that changes whenever the dictionaries change"""
+    parts = ['v%d' % INDEX_VERSION]
+    for path, title in dictionaries:
+        try:
+            st = core.stat(path)
+        except OSError:
+            continue
+        parts.append('%s:%s:%s:%s' % (path, st.st_mtime, st.st_size, title))
+    return ' '.join(parts)
+
+
+def build_index(words, path, stamp):
+    """Write an index for `words` to `path`
+
+    Each line holds a key followed by a tab and the space-separated words
+    stored under that key.  Lines are sorted by their utf-8 encoded key
+    so that they can be binary searched.  The first line holds the stamp.
+
+    """
+    table = {}
+    for word in set(words):
+        for key in index_keys(word):
+            table.setdefault(key, []).append(word)
+
+    lines = []
+    for key, values in table.items():
+        values.sort()
+        lines.append(core.encode(key + '\t' + ' '.join(values) + '\n'))
+    lines.sort()
+
+    write_cache(path, stamp, lines)
+
+
+def write_cache(path, stamp, lines):
+    """Atomically write encoded `lines` to `path` below a stamp header"""
+    dirname = os.path.dirname(path)
+    if dirname and not core.isdir(dirname):
+        core.makedirs(dirname)
+    tmp_path = path + '.tmp'
+    with core.xopen(tmp_path, 'wb') as f:
+        f.write(core.encode('#' + stamp + '\n'))
+        for line in lines:
+            f.write(line)
+    if core.exists(path):
+        core.unlink(path)
+    os.rename(core.mkpath(tmp_path), core.mkpath(path))
+
+
+class SpellingIndex(object):
+    """Searches a compiled index file in place through mmap"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = core.xopen(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0,
+                               access=mmap.ACCESS_READ)
+        header_end = self._mmap.find(b'\n') + 1
+        self.stamp = core.decode(self._mmap[1:header_end-1])
+        self._start = header_end
+        self._size = len(self._mmap)
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def lookup(self, key):
+        """Return the words stored under `key`"""
+        mm = self._mmap
+        needle = core.encode(key)
+        lo, hi = self._start, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            line_start = mm.rfind(b'\n', lo - 1, mid) + 1
+            line_end = mm.find(b'\n', line_start)
+            tab = mm.find(b'\t', line_start, line_end)
+            line_key = mm[line_start:tab]
+            if line_key == needle:
+                return core.decode(mm[tab+1:line_end]).split(' ')
+            elif line_key < needle:
+                lo = line_end + 1
+            else:
+                hi = line_start
+        return []
+
+    def contains(self, word):
+        return word in self.lookup(word[:PREFIX_LENGTH])
+
+    def candidates(self, word):
+        result = set()
+        for key in query_keys(word):
+            result.update(self.lookup(key))
+        return result
+
+    def suggest(self, word, extra_words=()):
+        """Return the closest known words ordered by edit distance
+
+        `extra_words` may be a WordIndex or a sequence of words.
+
+        """
+        if not isinstance(extra_words, WordIndex):
+            extra_words = WordIndex(extra_words)
+        if self.contains(word) or extra_words.contains(word):
+            return [word]
+        return suggest(word, (self, extra_words))
+
+
+class WordIndex(object):
+    """An in-memory index with the same keys as SpellingIndex
+
+    Used for the handful of words that are added at runtime.
+
+    """
+
+    def __init__(self, words=()):
+        self.words = set()
+        self.table = {}
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return len(self.words)
+
+    def add(self, word):
+        if word in self.words:
+            return
+        self.words.add(word)
+        for key in index_keys(word):
+            self.table.setdefault(key, set()).add(word)
+
+    def contains(self, word):
+        return word in self.words
+
+    def lookup(self, key):
+        return self.table.get(key, ())
+
+    def candidates(self, word):
+        result = set()
+        for key in query_keys(word):
+            result.update(self.lookup(key))
+        return result
+
+
+class WordSet(object):
+    """The plain dictionary words, used until the index has been built
+
+    Only single edits are suggested since generating every edit two
+    steps away is too slow.
+
+    """
+
+    def __init__(self, words):
+        self.words = frozenset(words)
+
+    def close(self):
+        pass
+
+    def contains(self, word):
+        return word in self.words
+
+    def candidates(self, word):
+        edits = growing_edits(word)
+        edits.update(deletes(word, distance=1))
+        return edits.intersection(self.words)
+
+    def suggest(self, word, extra_words=()):
+        if not isinstance(extra_words, WordIndex):
+            extra_words = WordIndex(extra_words)
+        if self.contains(word) or extra_words.contains(word):
+            return [word]
+        return suggest(word, (self, extra_words))
+
+
+def index_path():
+    return resources.cache_home('spelling.idx')
+
+
+def open_index(path=None, dictionaries=DICTIONARIES):
+    """Return the SpellingIndex if it is up to date, otherwise None
+
+    This never builds the index, so it is cheap enough for the GUI thread.
+
+    """
+    if path is None:
+        path = index_path()
+    if not core.exists(path):
+        return None
+    index = SpellingIndex(path)
+    if index.stamp == dictionary_stamp(dictionaries):
+        return index
+    index.close()
+    return None
+
+
+def load_index(path=None, dictionaries=DICTIONARIES):
+    """Return a SpellingIndex, rebuilding it when the dictionaries change
+
+    Building the index takes a while, so call this from a background
+    thread; see open_index().
+
+    """
+    if path is None:
+        path = index_path()
+    index = open_index(path=path, dictionaries=dictionaries)
+    if index is not None:
+        return index
+    stamp = dictionary_stamp(dictionaries)
+    build_index(read_words(dictionaries), path, stamp)
+    return SpellingIndex(path)
+
+
+def split_identifier(word):
+    """Return the word-like parts of a snake_case or CamelCase identifier"""
+    return [part for part in IDENTIFIER_PARTS.findall(word) if len(part) > 1]
+
+
+def identifier_words(names):
+    """Yield identifiers along with their individual parts"""
+    for name in names:
+        for word in WORDS.findall(name):
+            yield word
+            for part in split_identifier(word):
+                yield part
+
+
+def file_name_words(git=git):
+    """Yield the words used in the names of tracked files"""
+    out = git.ls_files(z=True)[STDOUT]
+    names = set()
+    for path in out.split('\0'):
+        names.update(path.split('/'))
+    return identifier_words(names)
+
+
+def symbol_words(git=git):
+    """Yield the symbols defined in tracked files"""
+    out = git.grep('-I', '-h', '-E', '-e', SYMBOL_GREP,
+                   no_color=True)[STDOUT]
+    return identifier_words(SYMBOL_DEFINITION.findall(out))
+
+
+def commit_message_words(count=COMMIT_COUNT):
+    """Yield the words that are used repeatedly in recent commit messages"""
+    revs, summaries = gitcmds.log_helper(extra_args=['-%d' % count])
+    seen = {}
+    for summary in summaries:
+        for word in set(WORDS.findall(summary)):
+            seen[word] = seen.get(word, 0) + 1
+    return [word for word, n in seen.items() if n >= COMMIT_WORD_MIN_COUNT]
+
+
+def vocabulary_stamp(git=git):
+    """Return a string that changes whenever HEAD or the index changes"""
+    head = git.rev_parse('HEAD')[STDOUT].strip()
+    try:
+        mtime = core.stat(git.git_path('index')).st_mtime
+    except OSError:
+        mtime = 0
+    return 'v%d %s %s' % (INDEX_VERSION, head, mtime)
+
+
+def vocabulary_path(git=git):
+    key = hashlib.sha1(core.encode(git.worktree())).hexdigest()
+    return resources.cache_home('vocabulary', key)
+
+
+def build_vocabulary(git=git):
+    """Return the set of words known to the current project"""
+    words = set()
+    words.update(file_name_words(git=git))
+    words.update(symbol_words(git=git))
+    words.update(commit_message_words())
+    return words
+
+
+def load_vocabulary(git=git, path=None):
+    """Return the project vocabulary, rebuilding the cache when it is stale
+
+    The cache holds one word per line so that it can be loaded without
+    touching the repository when nothing has changed.
+
+    """
+    if path is None:
+        path = vocabulary_path(git=git)
+    stamp = vocabulary_stamp(git=git)
+    if core.exists(path):
+        try:
+            with core.xopen(path, 'rb') as f:
+                lines = core.decode(f.read()).splitlines()
+        except (IOError, OSError):
+            lines = []
+        if lines and lines[0] == '#' + stamp:
+            return frozenset(lines[1:])
+    words = build_vocabulary(git=git)
+    write_cache(path, stamp,
+                [core.encode(word + '\n') for word in sorted(words)])
+    return frozenset(words)
@@ -10,6 +10,7 @@ from __future__ import division, absolute_import, unicode_literals
 
 import re
 
+from cola.cache import LRUCache
 from cola.compat import ustr
 
 
@@ -112,8 +113,10 @@ class TextWrapper(object):
         lines = []
 
         # Arrange in reverse order so items can be efficiently popped
-        # from a stack of chucks.
+        # from a stack of chucks.  The length of each chunk is computed
+        # once and kept on a parallel stack.
         chunks = list(reversed(chunks))
+        lengths = [self.chunklen(chunk) for chunk in chunks]
 
         while chunks:
 
@@ -129,13 +132,15 @@ class TextWrapper(object):
             # is the very beginning of the text (ie. no lines started yet).
             if self.drop_whitespace and chunks[-1] == ' ' and lines:
                 chunks.pop()
+                lengths.pop()
 
             while chunks:
-                l = self.chunklen(chunks[-1])
+                l = lengths[-1]
 
                 # Can at least squeeze this chunk onto the current line.
                 if cur_len + l <= width:
                     cur_line.append(chunks.pop())
+                    lengths.pop()
                     cur_len += l
                 # Nope, this line is full.
                 else:
@@ -143,9 +148,10 @@ class TextWrapper(object):
 
             # The current line is full, and the next chunk is too big to
             # fit on *any* line (not just this one).
-            if chunks and self.chunklen(chunks[-1]) > width:
+            if chunks and lengths[-1] > width:
                 if not cur_line:
                     cur_line.append(chunks.pop())
+                    lengths.pop()
 
             # If the last chunk on this line is all a space, drop it.
             if self.drop_whitespace and cur_line and cur_line[-1] == ' ':
@@ -171,7 +177,7 @@ class TextWrapper(object):
         33
 
         """
-        return len(word.replace('\t', '')) + word.count('\t') * self.tabwidth
+        return len(word) + word.count('\t') * (self.tabwidth - 1)
 
 
     # -- Public interface ----------------------------------------------
@@ -198,6 +204,48 @@ class TextWrapper(object):
         return "\n".join(self.wrap(text))
 
 
+# Acked-by:, Signed-off-by:, Helped-by:, etc.
+SPECIAL_TAG_RGX = re.compile(
+    r'^('
+    r'Acked-by|'
+    r"Ack'd-by|"
+    r'Based-on-patch-by|'
+    r'Cheered-on-by|'
+    r'Co-authored-by|'
+    r'Comments-by|'
+    r'Confirmed-by|'
+    r'Contributions-by|'
+    r'Debugged-by|'
+    r'Discovered-by|'
+    r'Explained-by|'
+    r'Backtraced-by|'
+    r'Helped-by|'
+    r'Liked-by|'
+    r'Improved-by|'
+    r'Inspired-by|'
+    r'Initial-patch-by|'
+    r'Noticed-by|'
+    r'Original-patch-by|'
+    r'Originally-by|'
+    r'Mentored-by|'
+    r'Patch-by|'
+    r'Proposed-by|'
+    r'Reported-by|'
+    r'Requested-by|'
+    r'Reviewed-by|'
+    r'Signed-off-by|'
+    r'Signed-Off-by|'
+    r'Spotted-by|'
+    r'Suggested-by|'
+    r'Tested-by|'
+    r'Tested-on-([a-zA-Z-_]+)-by|'
+    r'With-suggestions-by'
+    r'):')
+
+# Wrapped lines keyed by (tabwidth, limit, line)
+_wrapped_lines = LRUCache(maxsize=1024)
+
+
 def word_wrap(text, tabwidth, limit):
     r"""Wrap long lines to the specified limit
 
@@ -212,57 +260,28 @@ def word_wrap(text, tabwidth, limit):
     >>> word_wrap(text, 8, 4)
     u'a bb\nccc\ndddd\n\t\neeeee'
 
-    """
+    Each line is a paragraph of its own and is only re-wrapped when it
+    has changed since an earlier call, so re-wrapping a long message after
+    a small edit only re-flows the edited paragraph.
 
+    """
     lines = []
-
-    # Acked-by:, Signed-off-by:, Helped-by:, etc.
-    special_tag_rgx = re.compile(
-            r'^('
-            r'Acked-by|'
-            r"Ack'd-by|"
-            r'Based-on-patch-by|'
-            r'Cheered-on-by|'
-            r'Co-authored-by|'
-            r'Comments-by|'
-            r'Confirmed-by|'
-            r'Contributions-by|'
-            r'Debugged-by|'
-            r'Discovered-by|'
-            r'Explained-by|'
-            r'Backtraced-by|'
-            r'Helped-by|'
-            r'Liked-by|'
-            r'Improved-by|'
-            r'Inspired-by|'
-            r'Initial-patch-by|'
-            r'Noticed-by|'
-            r'Original-patch-by|'
-            r'Originally-by|'
-            r'Mentored-by|'
-            r'Patch-by|'
-            r'Proposed-by|'
-            r'Reported-by|'
-            r'Requested-by|'
-            r'Reviewed-by|'
-            r'Signed-off-by|'
-            r'Signed-Off-by|'
-            r'Spotted-by|'
-            r'Suggested-by|'
-            r'Tested-by|'
-            r'Tested-on-([a-zA-Z-_]+)-by|'
-            r'With-suggestions-by'
-            r'):')
-
-    w = TextWrapper(width=limit,
-                    tabwidth=tabwidth,
-                    break_on_hyphens=True,
-                    drop_whitespace=True)
+    w = None
 
     for line in text.split('\n'):
-        if special_tag_rgx.match(line):
+        if SPECIAL_TAG_RGX.match(line):
             lines.append(line)
-        else:
-            lines.append(w.fill(line))
+            continue
+        key = (tabwidth, limit, line)
+        wrapped = _wrapped_lines.get(key)
+        if wrapped is None:
+            if w is None:
+                w = TextWrapper(width=limit,
+                                tabwidth=tabwidth,
+                                break_on_hyphens=True,
+                                drop_whitespace=True)
+            wrapped = w.fill(line)
+            _wrapped_lines.put(key, wrapped)
+        lines.append(wrapped)
 
     return '\n'.join(lines)
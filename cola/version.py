@@ -24,6 +24,11 @@ _versions = {
     'pyqt': '4.4',
     'pyqt_qrunnable': '4.4',
     'diff-submodule': '1.6.6',
+    # git-fetch learned --no-write-fetch-head in 2.29.0
+    'fetch-no-write-fetch-head': '2.29.0',
+    # git-add, git-checkout and git-reset learned --pathspec-from-file
+    # and --pathspec-file-nul in 2.26.0
+    'pathspec-from-file': '2.26.0',
 }
 
 
@@ -5,15 +5,18 @@ from PyQt4 import QtCore
 from PyQt4 import QtGui
 
 from cola import cmds
+from cola import lazy
 from cola.i18n import N_
 from cola.models.selection import selection_model
 from cola.widgets import defs
-from cola.widgets import remote
-from cola.widgets import stash
 from cola.qtutils import create_button
 from cola.qtutils import connect_button
 
 
+remote = lazy.module('cola.widgets.remote')
+stash = lazy.module('cola.widgets.stash')
+
+
 class QFlowLayoutWidget(QtGui.QWidget):
 
     _horizontal = QtGui.QBoxLayout.LeftToRight
@@ -67,10 +70,10 @@ class ActionButtons(QFlowLayoutWidget):
 
         # Add callbacks
         connect_button(self.refresh_button, cmds.run(cmds.Refresh))
-        connect_button(self.fetch_button, remote.fetch)
-        connect_button(self.push_button, remote.push)
-        connect_button(self.pull_button, remote.pull)
-        connect_button(self.stash_button, stash.stash)
+        connect_button(self.fetch_button, lazy.function(remote, 'fetch'))
+        connect_button(self.push_button, lazy.function(remote, 'push'))
+        connect_button(self.pull_button, lazy.function(remote, 'pull'))
+        connect_button(self.stash_button, lazy.function(stash, 'stash'))
         connect_button(self.stage_button, self.stage)
         connect_button(self.unstage_button, self.unstage)
 
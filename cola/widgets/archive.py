@@ -14,6 +14,7 @@ from cola.git import git
 from cola.git import STDOUT
 from cola.i18n import N_
 from cola.widgets import defs
+from cola.widgets.standard import ExportDialog
 from cola.compat import ustr
 
 
@@ -181,9 +182,19 @@ class GitArchiveDialog(QtGui.QDialog):
         qtutils.connect_button(self.save, self.save_archive)
 
     def archive_saved(self):
-        cmds.do(cmds.Archive, self.ref, self.fmt, self.prefix, self.filename)
-        qtutils.information(N_('File Saved'),
-                            N_('File saved to "%s"') % self.filename)
+        cmd = cmds.Archive(self.ref, self.fmt, self.prefix, self.filename)
+        dlg = ExportDialog(N_('Save Archive'),
+                           N_('Saving "%s"') % self.filename, 0,
+                           self.parent())
+        if not dlg.run(cmd):
+            return
+        if cmd.ok:
+            qtutils.information(N_('File Saved'),
+                                N_('File saved to "%s"') % self.filename)
+        else:
+            qtutils.critical(N_('Error'),
+                             N_('Unable to save "%s"') % self.filename,
+                             details=dlg.details())
 
     def save_archive(self):
         filename = self.filename
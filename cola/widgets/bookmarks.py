@@ -5,6 +5,7 @@ import os
 
 from PyQt4 import QtCore
 from PyQt4 import QtGui
+from PyQt4.QtCore import Qt
 from PyQt4.QtCore import SIGNAL
 
 
@@ -69,11 +70,24 @@ class BookmarksWidget(QtGui.QWidget):
         self.connect(self.tree, SIGNAL('itemSelectionChanged()'),
                      self.tree_item_selection_changed)
 
+        self.connect(self, SIGNAL('verified(PyQt_PyObject)'),
+                     self.verified, Qt.QueuedConnection)
+
+        self.tasks = set()
         QtCore.QTimer.singleShot(0, self.reload_bookmarks)
 
     def reload_bookmarks(self):
-        # Called once after the GUI is initialized
-        self.settings.load()
+        # Called once after the GUI is initialized.  The entries are shown
+        # immediately and missing repositories are marked once verified.
+        self.settings.load(check_missing=False)
+        self.tree.refresh()
+        task = VerifyTask(self, self.settings)
+        self.tasks.add(task)
+        QtCore.QThreadPool.globalInstance().start(task)
+
+    def verified(self, result):
+        task, verdicts = result
+        self.tasks.discard(task)
         self.tree.refresh()
 
     def tree_item_selection_changed(self):
@@ -140,6 +154,10 @@ class BookmarksTreeWidget(standard.TreeWidget):
                         for path in settings.recent]
         else:
             items = []
+        verifier = settings.verifier
+        for item in items:
+            if verifier.cached(item.path) is False:
+                item.set_missing()
         self.clear()
         self.addTopLevelItems(items)
 
@@ -244,3 +262,33 @@ class BookmarksTreeWidgetItem(QtGui.QTreeWidgetItem):
         basename = os.path.basename(normpath)
         self.setText(0, basename)
         self.setToolTip(0, path)
+
+    def set_missing(self):
+        """Show that the repository could not be found"""
+        mark_missing(self, self.path)
+
+
+def mark_missing(item, path):
+    """Gray out a tree or list item whose repository could not be found"""
+    brush = QtGui.QBrush(Qt.gray)
+    tooltip = N_('%s is not a Git repository.') % path
+    if isinstance(item, QtGui.QTreeWidgetItem):
+        item.setForeground(0, brush)
+        item.setToolTip(0, tooltip)
+    else:
+        item.setForeground(brush)
+        item.setToolTip(tooltip)
+
+
+class VerifyTask(QtCore.QRunnable):
+    """Checks the bookmarks and recent repositories in the background"""
+
+    def __init__(self, sender, settings):
+        QtCore.QRunnable.__init__(self)
+        self.sender = sender
+        self.settings = settings
+
+    def run(self):
+        verdicts = self.settings.verify_all()
+        self.sender.emit(SIGNAL('verified(PyQt_PyObject)'),
+                         (self, verdicts))
@@ -348,6 +348,7 @@ class BrowserController(QtCore.QObject):
         """Update information about a directory as it is expanded."""
         item = self.view.item_from_index(model_index)
         path = item.path
+        self.view.model().populate(path)
         if path in self.updated:
             return
         self.updated.add(path)
@@ -380,25 +381,38 @@ class SaveBlob(BaseCommand):
     def __init__(self, model):
         BaseCommand.__init__(self)
         self.model = model
+        self.ok = False
+        # Optional callbacks used by core.stream_command()
+        self.progress = None
+        self.cancelled = None
 
-    def do(self):
+    def blob(self):
         model = self.model
-        cmd = ['git', 'show', '%s:%s' % (model.ref, model.relpath)]
-        with core.xopen(model.filename, 'wb') as fp:
-            proc = core.start_command(cmd, stdout=fp)
-            out, err = proc.communicate()
+        return '%s:%s' % (model.ref, model.relpath)
+
+    def size(self):
+        """Return the size of the blob, or 0 when unknown"""
+        status, out, err = git.cat_file('-s', self.blob())
+        try:
+            return int(out.strip())
+        except ValueError:
+            return 0
 
-        status = proc.returncode
+    def do(self):
+        model = self.model
+        cmd = ['git', 'cat-file', 'blob', self.blob()]
+        status, err = core.stream_command(cmd, model.filename,
+                                          progress=self.progress,
+                                          cancelled=self.cancelled)
+        self.ok = status == 0
+        if status is None:
+            Interaction.log(N_('Saving "%s" was cancelled.') % model.filename)
+            return
         msg = (N_('Saved "%(filename)s" from "%(ref)s" to "%(destination)s"') %
                dict(filename=model.relpath,
                     ref=model.ref,
                     destination=model.filename))
-        Interaction.log_status(status, msg, '')
-
-        Interaction.information(
-                N_('File Saved'),
-                N_('File saved to "%s"') % model.filename)
-
+        Interaction.log_status(status, msg, err)
 
 
 class BrowseDialog(QtGui.QDialog):
@@ -513,7 +527,20 @@ class BrowseDialog(QtGui.QDialog):
         if not filename:
             return
         model.filename = filename
-        cmds.do(SaveBlob, model)
+        cmd = SaveBlob(model)
+        dlg = standard.ExportDialog(N_('Save File'),
+                                    N_('Saving "%s"') % filename,
+                                    cmd.size(), self)
+        if not dlg.run(cmd):
+            return
+        if cmd.ok:
+            Interaction.information(
+                    N_('File Saved'),
+                    N_('File saved to "%s"') % model.filename)
+        else:
+            Interaction.critical(N_('Error'),
+                                 N_('Unable to save "%s"') % model.filename,
+                                 details=dlg.details())
         self.accept()
 
     def save_blob(self):
@@ -643,33 +670,63 @@ class GitFileTreeModel(QtGui.QStandardItemModel):
 
 
 class GitTreeModel(GitFileTreeModel):
+    """Presents the tree of a revision, reading one directory at a time
+
+    Each directory is read with a non-recursive "git ls-tree" when it is
+    first expanded.  Trees are cached by object id in gitcmds, so trees
+    that are shared between revisions are only read once.
+
+    """
     def __init__(self, ref, parent):
         GitFileTreeModel.__init__(self, parent)
         self.ref = ref
         self._initialize()
 
     def _initialize(self):
-        """Iterate over git-ls-tree and create GitTreeItems."""
-        status, out, err = git.ls_tree('--full-tree', '-r', '-t', '-z',
-                                       self.ref)
+        """Read the top-level entries of the revision"""
+        status, out, err = git.rev_parse(self.ref + '^{tree}')
         if status != 0:
             Interaction.log_status(status, out, err)
             return
+        self.populate(self.invisibleRootItem(), '', out.strip())
+
+    def populate(self, parent, dirname, oid):
+        """Create rows for the entries of the tree `oid`"""
+        prefix = dirname and dirname + '/' or ''
+        for mode, objtype, sha1, name in gitcmds.tree_entries(oid):
+            relpath = prefix + name
+            if objtype == 'tree':
+                item = self.add_directory(parent, relpath)
+                item.oid = sha1
+            elif objtype == 'blob':
+                parent.appendRow(self.create_row(relpath, False))
+
+    def _unpopulated_item(self, index):
+        """Return the directory item for an index that needs populating"""
+        if not index.isValid():
+            return None
+        item = self.itemFromIndex(index)
+        if item is None or item.oid is None:
+            return None
+        return item
 
-        if not out:
-            return
+    # Qt overrides used by views to populate directories on demand
+    def hasChildren(self, index=QtCore.QModelIndex()):
+        if self._unpopulated_item(index) is not None:
+            return True
+        return GitFileTreeModel.hasChildren(self, index)
 
-        for line in out[:-1].split('\0'):
-            # .....6 ...4 ......................................40
-            # 040000 tree c127cde9a0c644a3a8fef449a244f47d5272dfa6	relative
-            # 100644 blob 139e42bf4acaa4927ec9be1ec55a252b97d3f1e2	relative/path
-            objtype = line[7]
-            relpath = line[6 + 1 + 4 + 1 + 40 + 1:]
-            if objtype == 't':
-                parent = self.dir_entries[utils.dirname(relpath)]
-                self.add_directory(parent, relpath)
-            elif objtype == 'b':
-                self.add_file(relpath)
+    def canFetchMore(self, index):
+        if self._unpopulated_item(index) is not None:
+            return True
+        return GitFileTreeModel.canFetchMore(self, index)
+
+    def fetchMore(self, index):
+        item = self._unpopulated_item(index)
+        if item is None:
+            return GitFileTreeModel.fetchMore(self, index)
+        oid, item.oid = item.oid, None
+        self.populate(item, item.path, oid)
 
 
 class GitTreeItem(QtGui.QStandardItem):
@@ -685,6 +742,8 @@ class GitTreeItem(QtGui.QStandardItem):
         QtGui.QStandardItem.__init__(self)
         self.is_dir = is_dir
         self.path = path
+        # The tree id of a directory that has not been read yet
+        self.oid = None
         self.setEditable(False)
         self.setDragEnabled(False)
         self.setText(utils.basename(path))
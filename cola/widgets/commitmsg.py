@@ -530,6 +530,9 @@ class CommitMessageEditor(QtGui.QWidget):
             spellcheck.add_word('Closes')
             spellcheck.add_word('Fixes')
 
+            # Identifiers, file names and jargon used by the project
+            self.description.load_vocabulary()
+
         self.description.highlighter.enable(enabled)
 
 
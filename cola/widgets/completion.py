@@ -344,7 +344,8 @@ class CompletionModel(QtGui.QStandardItemModel):
         self.match_text = ''
         self.full_text = ''
         self.case_sensitive = False
-        self.icon_from_filename = decorators.memoize(qtutils.icon_from_filename)
+        self.icon_from_filename = decorators.memoize(
+                qtutils.icon_from_filename, maxsize=1024)
 
         self.update_thread = GatherCompletionsThread(self)
         self.connect(self.update_thread,
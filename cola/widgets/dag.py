@@ -320,6 +320,9 @@ class CommitTreeWidget(ViewerMixin, standard.TreeWidget):
 class GitDAG(standard.MainWindow):
     """The git-dag widget."""
 
+    # Limits the avatar requests made for each batch of commits
+    MAX_PREFETCH_AVATARS = 64
+
     def __init__(self, model, ctx, parent=None, settings=None):
         standard.MainWindow.__init__(self, parent)
 
@@ -544,6 +547,20 @@ class GitDAG(standard.MainWindow):
                 self.commits[tag] = commit_obj
         self.graphview.add_commits(commits)
         self.treewidget.add_commits(commits)
+        self.prefetch_avatars(commits)
+
+    def prefetch_avatars(self, commits):
+        """Fetch the avatars of the authors shown in a batch of commits"""
+        emails = []
+        seen = set()
+        for commit_obj in commits:
+            email = commit_obj.email
+            if email and email not in seen:
+                seen.add(email)
+                emails.append(email)
+                if len(emails) >= self.MAX_PREFETCH_AVATARS:
+                    break
+        self.diffwidget.gravatar_label.prefetch(emails)
 
     def thread_done(self):
         self.focus_tree()
@@ -11,7 +11,8 @@ class FileTree(standard.TreeWidget):
 
     def __init__(self, parent=None):
         standard.TreeWidget.__init__(self, parent=parent)
-        self.icon_from_filename = decorators.memoize(qtutils.icon_from_filename)
+        self.icon_from_filename = decorators.memoize(
+                qtutils.icon_from_filename, maxsize=1024)
         self.setSelectionMode(self.ExtendedSelection)
         self.setHeaderHidden(True)
 
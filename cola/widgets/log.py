@@ -1,10 +1,12 @@
 from __future__ import division, absolute_import, unicode_literals
 
-import time
-
+from PyQt4 import QtCore
 from PyQt4 import QtGui
+from PyQt4.QtCore import Qt
+from PyQt4.QtCore import SIGNAL
 
 from cola.i18n import N_
+from cola.models import cmdlog
 from cola.widgets import defs
 from cola.widgets.text import MonoTextView
 from cola import qtutils
@@ -12,17 +14,38 @@ from cola import qtutils
 
 class LogWidget(QtGui.QWidget):
     """A simple dialog to display command logs."""
+
+    # Messages are shown in batches at most this often (in milliseconds)
+    FLUSH_INTERVAL = 100
+
     def __init__(self, parent=None, output=None):
         QtGui.QWidget.__init__(self, parent)
 
+        history = None
+        if cmdlog.history_enabled():
+            history = cmdlog.RotatingFile(cmdlog.history_path())
+        self.model = cmdlog.CommandLog(cmdlog.max_lines(), history=history)
+
         self.output_text = MonoTextView(self)
+        # The document drops its oldest lines beyond the cap
+        self.output_text.document().setMaximumBlockCount(self.model.maxlines)
         if output:
             self.set_output(output)
         self.main_layout = qtutils.vbox(defs.no_margin, defs.spacing,
                                         self.output_text)
         self.setLayout(self.main_layout)
 
+        self.flush_timer = QtCore.QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(self.FLUSH_INTERVAL)
+        self.connect(self.flush_timer, SIGNAL('timeout()'), self.flush)
+
+        # log() can be called from any thread
+        self.connect(self, SIGNAL('log_pending()'),
+                     self.schedule_flush, Qt.QueuedConnection)
+
     def clear(self):
+        self.model.clear()
         self.output_text.clear()
 
     def set_output(self, output):
@@ -39,14 +62,21 @@ class LogWidget(QtGui.QWidget):
         self.log('\n'.join(msg))
 
     def log(self, msg):
-        if not msg:
+        if self.model.append(msg):
+            self.emit(SIGNAL('log_pending()'))
+
+    def schedule_flush(self):
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        """Show the pending messages with a single edit"""
+        lines = self.model.take_pending()
+        if not lines:
             return
-        cursor = self.output_text.textCursor()
-        cursor.movePosition(cursor.End)
         text = self.output_text
-        cursor.insertText(time.asctime() + '\n')
-        for line in msg.splitlines():
-            cursor.insertText(line + '\n')
-        cursor.insertText('\n')
+        cursor = text.textCursor()
+        cursor.movePosition(cursor.End)
+        cursor.insertText('\n'.join(lines) + '\n')
         cursor.movePosition(cursor.End)
         text.setTextCursor(cursor)
@@ -9,10 +9,12 @@ from PyQt4 import QtGui
 from PyQt4.QtCore import Qt
 from PyQt4.QtCore import SIGNAL
 
+from cola import autofetch
 from cola import cmds
 from cola import core
 from cola import guicmds
 from cola import gitcfg
+from cola import lazy
 from cola import qtutils
 from cola import resources
 from cola import utils
@@ -31,31 +33,33 @@ from cola.qtutils import connect_action_bool
 from cola.qtutils import create_dock
 from cola.qtutils import create_menu
 from cola.settings import Settings
-from cola.widgets import about
 from cola.widgets import action
-from cola.widgets import archive
 from cola.widgets import bookmarks
-from cola.widgets import browse
 from cola.widgets import cfgactions
 from cola.widgets import commitmsg
-from cola.widgets import compare
-from cola.widgets import createbranch
-from cola.widgets import createtag
-from cola.widgets import dag
 from cola.widgets import diff
-from cola.widgets import finder
-from cola.widgets import editremotes
-from cola.widgets import grep
 from cola.widgets import log
-from cola.widgets import merge
-from cola.widgets import patch
-from cola.widgets import prefs as prefs_widget
-from cola.widgets import recent
-from cola.widgets import remote
-from cola.widgets import search
 from cola.widgets import standard
 from cola.widgets import status
-from cola.widgets import stash
+
+# Dialogs that are not needed at startup are imported on first use
+about = lazy.module('cola.widgets.about')
+archive = lazy.module('cola.widgets.archive')
+browse = lazy.module('cola.widgets.browse')
+compare = lazy.module('cola.widgets.compare')
+createbranch = lazy.module('cola.widgets.createbranch')
+createtag = lazy.module('cola.widgets.createtag')
+dag = lazy.module('cola.widgets.dag')
+editremotes = lazy.module('cola.widgets.editremotes')
+finder = lazy.module('cola.widgets.finder')
+grep = lazy.module('cola.widgets.grep')
+merge = lazy.module('cola.widgets.merge')
+patch = lazy.module('cola.widgets.patch')
+recent = lazy.module('cola.widgets.recent')
+remote = lazy.module('cola.widgets.remote')
+search = lazy.module('cola.widgets.search')
+stash = lazy.module('cola.widgets.stash')
+prefs_widget = lazy.module('cola.widgets.prefs')
 
 
 class MainView(standard.MainWindow):
@@ -166,7 +170,7 @@ class MainView(standard.MainWindow):
         self.stage_untracked_action.setIcon(qtutils.icon('add.svg'))
 
         self.apply_patches_action = add_action(self,
-                N_('Apply Patches...'), patch.apply_patches)
+                N_('Apply Patches...'), lazy.function(patch, 'apply_patches'))
 
         self.export_patches_action = add_action(self,
                 N_('Export Patches...'), guicmds.export_patches, 'Alt+E')
@@ -189,12 +193,13 @@ class MainView(standard.MainWindow):
         self.rescan_action.setIcon(qtutils.reload_icon())
 
         self.find_files_action = add_action(self,
-                N_('Find Files'), finder.finder, 'Ctrl+T', 'T')
+                N_('Find Files'), lazy.function(finder, 'finder'),
+                'Ctrl+T', 'T')
         self.find_files_action.setIcon(qtutils.theme_icon('zoom-in.png'))
 
         self.browse_recently_modified_action = add_action(self,
                 N_('Recently Modified Files...'),
-                recent.browse_recent_files, 'Shift+Ctrl+E')
+                lazy.function(recent, 'browse_recent_files'), 'Shift+Ctrl+E')
 
         self.cherry_pick_action = add_action(self,
                 N_('Cherry-Pick...'),
@@ -209,19 +214,20 @@ class MainView(standard.MainWindow):
         self.quit_action = add_action(self,
                 N_('Quit'), self.close, 'Ctrl+Q')
         self.grep_action = add_action(self,
-                N_('Grep'), grep.grep, 'Ctrl+G')
+                N_('Grep'), lazy.function(grep, 'grep'), 'Ctrl+G')
         self.merge_local_action = add_action(self,
-                N_('Merge...'), merge.local_merge, 'Shift+Ctrl+M')
+                N_('Merge...'), lazy.function(merge, 'local_merge'),
+                'Shift+Ctrl+M')
 
         self.merge_abort_action = add_action(self,
-                N_('Abort Merge...'), merge.abort_merge)
+                N_('Abort Merge...'), lazy.function(merge, 'abort_merge'))
 
         self.fetch_action = add_action(self,
-                N_('Fetch...'), remote.fetch, 'Ctrl+F')
+                N_('Fetch...'), lazy.function(remote, 'fetch'), 'Ctrl+F')
         self.push_action = add_action(self,
-                N_('Push...'), remote.push, 'Ctrl+P')
+                N_('Push...'), lazy.function(remote, 'push'), 'Ctrl+P')
         self.pull_action = add_action(self,
-                N_('Pull...'), remote.pull, 'Shift+Ctrl+P')
+                N_('Pull...'), lazy.function(remote, 'pull'), 'Shift+Ctrl+P')
 
         self.open_repo_action = add_action(self,
                 N_('Open...'), guicmds.open_repo)
@@ -232,7 +238,7 @@ class MainView(standard.MainWindow):
         self.open_repo_new_action.setIcon(qtutils.open_icon())
 
         self.stash_action = add_action(self,
-                N_('Stash...'), stash.stash, 'Alt+Shift+S')
+                N_('Stash...'), lazy.function(stash, 'stash'), 'Alt+Shift+S')
 
         self.clone_repo_action = add_action(self,
                 N_('Clone...'), self.clone_repo)
@@ -243,7 +249,8 @@ class MainView(standard.MainWindow):
                 QtGui.QKeySequence.HelpContents)
 
         self.help_shortcuts_action = add_action(self,
-                N_('Keyboard Shortcuts'), about.show_shortcuts,
+                N_('Keyboard Shortcuts'),
+                lazy.function(about, 'show_shortcuts'),
                 Qt.Key_Question)
 
         self.visualize_current_action = add_action(self,
@@ -253,7 +260,7 @@ class MainView(standard.MainWindow):
                 N_('Visualize All Branches...'),
                 cmds.run(cmds.VisualizeAll))
         self.search_commits_action = add_action(self,
-                N_('Search...'), search.search)
+                N_('Search...'), lazy.function(search, 'search'))
         self.browse_branch_action = add_action(self,
                 N_('Browse Current Branch...'), guicmds.browse_current)
         self.browse_other_branch_action = add_action(self,
@@ -262,18 +269,19 @@ class MainView(standard.MainWindow):
                 N_('Get Commit Message Template'),
                 cmds.run(cmds.LoadCommitMessageFromTemplate))
         self.help_about_action = add_action(self,
-                N_('About'), about.launch_about_dialog)
+                N_('About'), lazy.function(about, 'launch_about_dialog'))
 
         self.diff_expression_action = add_action(self,
                 N_('Expression...'), guicmds.diff_expression)
         self.branch_compare_action = add_action(self,
-                N_('Branches...'), compare.compare_branches)
+                N_('Branches...'), lazy.function(compare, 'compare_branches'))
 
         self.create_tag_action = add_action(self,
-                N_('Create Tag...'), createtag.create_tag)
+                N_('Create Tag...'), lazy.function(createtag, 'create_tag'))
 
         self.create_branch_action = add_action(self,
-                N_('Create...'), createbranch.create_new_branch, 'Ctrl+B')
+                N_('Create...'),
+                lazy.function(createbranch, 'create_new_branch'), 'Ctrl+B')
 
         self.delete_branch_action = add_action(self,
                 N_('Delete...'), guicmds.delete_branch)
@@ -290,7 +298,7 @@ class MainView(standard.MainWindow):
                 N_('Review...'), guicmds.review_branch)
 
         self.browse_action = add_action(self,
-                N_('File Browser...'), browse.worktree_browser)
+                N_('File Browser...'), lazy.function(browse, 'worktree_browser'))
         self.browse_action.setIcon(qtutils.git_icon())
 
         self.dag_action = add_action(self, N_('DAG...'), self.git_dag)
@@ -483,10 +491,31 @@ class MainView(standard.MainWindow):
         self.connect(self, SIGNAL('install_cfg_actions(PyQt_PyObject)'),
                      self._install_config_actions, Qt.QueuedConnection)
 
+        self.connect(self, SIGNAL('autofetched(bool)'),
+                     self._autofetched, Qt.QueuedConnection)
+
         # Install .git-config-defined actions
         self._config_task = None
         self.install_config_actions()
 
+        # Keep the remote-tracking branches fresh in the background
+        self.autofetch = None
+        self.start_autofetch()
+
+        # Run commands that modify the repository in the background
+        self.commands_busy = False
+        self.connect(self, SIGNAL('command_started()'),
+                     self._command_started, Qt.QueuedConnection)
+        self.connect(self, SIGNAL('command_finished(PyQt_PyObject)'),
+                     self._command_finished, Qt.QueuedConnection)
+        self.connect(self, SIGNAL('commands_idle()'),
+                     self._commands_idle, Qt.QueuedConnection)
+        cmds.command_queue().start(
+                started=lambda cmd: self.emit(SIGNAL('command_started()')),
+                finished=lambda cmd, error: self.emit(
+                    SIGNAL('command_finished(PyQt_PyObject)'), error),
+                idle=lambda: self.emit(SIGNAL('commands_idle()')))
+
         # Restore saved settings
         if not self.restore_state(settings=settings):
             self.resize(987, 610)
@@ -512,12 +541,19 @@ class MainView(standard.MainWindow):
         """Save state in the settings manager."""
         commit_msg = self.commitmsgeditor.commit_message(raw=True)
         self.model.save_commitmsg(commit_msg)
+        if self.autofetch is not None:
+            self.autofetch.stop()
+        # Let queued commands finish updating the repository
+        cmds.command_queue().wait()
         standard.MainWindow.closeEvent(self, event)
 
     def build_recent_menu(self):
         settings = Settings()
-        settings.load()
+        settings.load(check_missing=False)
         recent = settings.recent
+        # Start verifying in the background without waiting.  Repositories
+        # that are known to be missing are grayed out.
+        verdicts = settings.verify_all(timeout=0)
         cmd = cmds.OpenRepo
         menu = self.open_recent_menu
         menu.clear()
@@ -525,7 +561,9 @@ class MainView(standard.MainWindow):
             name = os.path.basename(r)
             directory = os.path.dirname(r)
             text = '%s %s %s' % (name, unichr(0x2192), directory)
-            menu.addAction(text, cmds.run(cmd, r))
+            action = menu.addAction(text, cmds.run(cmd, r))
+            if verdicts.get(r) is False:
+                action.setEnabled(False)
 
     # Accessors
     mode = property(lambda self: self.model.mode)
@@ -583,6 +621,41 @@ class MainView(standard.MainWindow):
             if shortcut:
                 action.setShortcut(shortcut)
 
+    def start_autofetch(self):
+        """Fetch remotes periodically when "cola.autofetchinterval" is set"""
+        interval = autofetch.interval()
+        if not interval:
+            return
+        self.autofetch = autofetch.Scheduler(interval, autofetch.max_backoff(),
+                                             on_update=self._autofetch_updated)
+        self.autofetch.start()
+
+    def _autofetch_updated(self, fetched):
+        # Called from the scheduler's thread
+        self.emit(SIGNAL('autofetched(bool)'), fetched)
+
+    def _autofetched(self, fetched):
+        if fetched:
+            # Pick up the new remote branches and upstream changes
+            self.model.update_status()
+        else:
+            self._update()
+
+    def _command_started(self):
+        if not self.commands_busy:
+            self.commands_busy = True
+            QtGui.QApplication.setOverrideCursor(Qt.BusyCursor)
+
+    def _command_finished(self, error):
+        if error is not None:
+            msg, details = error
+            Interaction.critical(N_('Error'), message=msg, details=details)
+
+    def _commands_idle(self):
+        if self.commands_busy:
+            self.commands_busy = False
+            QtGui.QApplication.restoreOverrideCursor()
+
     def _update(self):
         self.emit(SIGNAL('update()'))
 
@@ -598,6 +671,11 @@ class MainView(standard.MainWindow):
         msg += '\n'
         msg += N_('Branch: %s') % branch
 
+        counts = branch and autofetch.ahead_behind(branch)
+        if counts:
+            msg += '\n'
+            msg += autofetch.describe(counts)
+
         if is_rebasing:
             msg += '\n\n'
             msg += N_('This repository is currently being rebased.\n'
@@ -616,6 +694,10 @@ class MainView(standard.MainWindow):
 
         l = unichr(0xab)
         r = unichr(0xbb)
+        if counts and (counts[0] or counts[1]):
+            branch = '%s %s%d %s%d' % (branch, unichr(0x2191), counts[0],
+                                       unichr(0x2193), counts[1])
+
         title = ('%s: %s %s%s' % (
                     self.model.project,
                     branch,
@@ -6,8 +6,10 @@ from PyQt4 import QtGui
 from PyQt4.QtCore import Qt
 from PyQt4.QtCore import SIGNAL
 
+from cola import autofetch
 from cola import gitcmds
 from cola import qtutils
+from cola import remoteops
 from cola import utils
 from cola.compat import ustr
 from cola.guicmds import Task
@@ -25,6 +27,12 @@ FETCH = 'FETCH'
 PUSH = 'PUSH'
 PULL = 'PULL'
 
+REMOTE_ACTIONS = {
+    FETCH: remoteops.FETCH,
+    PUSH: remoteops.PUSH,
+    PULL: remoteops.PULL,
+}
+
 
 def fetch():
     return run(Fetch)
@@ -54,39 +62,27 @@ def run(RemoteDialog):
     return view
 
 
-def combine(result, existing):
-    if existing is None:
-        return result
-
-    if type(existing) is tuple:
-        if len(existing) == 3:
-            return (max(existing[0], result[0]),
-                    combine(existing[1], result[1]),
-                    combine(existing[2], result[2]))
-        else:
-            raise AssertionError('combine() with length %d' % len(existing))
-    else:
-        if existing and result:
-            return existing + '\n\n' + result
-        elif existing:
-            return existing
-        else:
-            return result
-
-
 class ActionTask(Task):
+    """Runs a remote operation against each of the selected remotes"""
+
+    PROGRESS = SIGNAL('remote_progress(PyQt_PyObject)')
 
-    def __init__(self, sender, model_action, remote, kwargs):
+    def __init__(self, sender, action, remotes, kwargs):
         Task.__init__(self, sender)
-        self.model_action = model_action
-        self.remote = remote
+        self.action = action
+        self.remotes = remotes
         self.kwargs = kwargs
 
     def run(self):
-        """Runs the model action and captures the result"""
-        status, out, err = self.model_action(self.remote, **self.kwargs)
+        """Runs the operations and captures the combined result"""
+        results = remoteops.run_all(self.action, self.remotes,
+                                    progress=self.progress, **self.kwargs)
+        status, out, err = remoteops.combine(results)
         self.finish(status, out, err)
 
+    def progress(self, info):
+        self.sender.emit(self.PROGRESS, info)
+
 
 class RemoteActionDialog(standard.Dialog):
 
@@ -106,6 +102,9 @@ class RemoteActionDialog(standard.Dialog):
 
         self.task_runner = TaskRunner(self)
         self.progress = ProgressDialog(title, N_('Updating'), self)
+        self.remote_progress = {}
+        self.connect(self.task_runner, ActionTask.PROGRESS,
+                     self.update_progress, Qt.QueuedConnection)
 
         self.local_label = QtGui.QLabel()
         self.local_label.setText(N_('Local Branch'))
@@ -113,13 +112,14 @@ class RemoteActionDialog(standard.Dialog):
         self.local_branch = QtGui.QLineEdit()
         self.local_branches = QtGui.QListWidget()
         self.local_branches.addItems(self.model.local_branches)
+        self.set_tracking_tooltips()
 
         self.remote_label = QtGui.QLabel()
         self.remote_label.setText(N_('Remote'))
 
         self.remote_name = QtGui.QLineEdit()
         self.remotes = QtGui.QListWidget()
-        if action == PUSH:
+        if action != PULL:
             self.remotes.setSelectionMode(QtGui.QAbstractItemView.ExtendedSelection)
         self.remotes.addItems(self.model.remotes)
 
@@ -230,6 +230,15 @@ class RemoteActionDialog(standard.Dialog):
 
         self.remote_name.setFocus()
 
+    def set_tracking_tooltips(self):
+        """Show the cached ahead/behind counts of the local branches"""
+        state = gitcmds.ref_state()
+        for idx, branch in enumerate(self.model.local_branches):
+            counts = autofetch.ahead_behind(branch, state=state)
+            if counts:
+                item = self.local_branches.item(idx)
+                item.setToolTip(autofetch.describe(counts))
+
     def set_rebase(self, value):
         self.rebase_checkbox.setChecked(value)
 
@@ -380,23 +389,8 @@ class RemoteActionDialog(standard.Dialog):
 
     # Actions
 
-    def push_to_all(self, dummy_remote, *args, **kwargs):
-        selected_remotes = self.selected_remotes
-        all_results = None
-        for remote in selected_remotes:
-            result = self.model.push(remote, *args, **kwargs)
-            all_results = combine(result, all_results)
-        return all_results
-
     def action_callback(self):
         action = self.action
-        if action == FETCH:
-            model_action = self.model.fetch
-        elif action == PUSH:
-            model_action = self.push_to_all
-        else: # if action == PULL:
-            model_action = self.model.pull
-
         remote_name = ustr(self.remote_name.text())
         if not remote_name:
             errmsg = N_('No repository selected.')
@@ -450,11 +444,29 @@ class RemoteActionDialog(standard.Dialog):
         self.close_button.setEnabled(False)
 
         # Use a thread to update in the background
-        task = ActionTask(self.task_runner, model_action, remote, kwargs)
+        if action != PULL and remote in self.selected_remotes:
+            remotes = self.selected_remotes
+        else:
+            remotes = [remote]
+        self.remote_progress = {}
+        self.progress.set_details(self.windowTitle(), N_('Updating'))
+        task = ActionTask(self.task_runner, REMOTE_ACTIONS[action],
+                          remotes, kwargs)
         self.task_runner.start(task,
                                progress=self.progress,
                                finish=self.action_completed)
 
+    def update_progress(self, info):
+        """Show the latest progress reported for each remote"""
+        text = '%s: %d%% (%d/%d)' % (info.phase, info.percent,
+                                     info.done, info.total)
+        if info.rate:
+            text += ', %s' % info.rate
+        self.remote_progress[info.remote] = text
+        lines = ['%s: %s' % (remote, self.remote_progress[remote])
+                 for remote in sorted(self.remote_progress)]
+        self.progress.set_details(self.windowTitle(), '\n'.join(lines))
+
     def action_completed(self, task, status, out, err):
         # Grab the results of the action and finish up
         self.action_button.setEnabled(True)
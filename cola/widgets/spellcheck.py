@@ -7,7 +7,6 @@ __copyright__ = """
 2013, David Aguilar <davvid@gmail.com>
 """
 
-import collections
 import re
 import sys
 
@@ -16,91 +15,93 @@ from PyQt4.Qt import QApplication
 from PyQt4.Qt import QEvent
 from PyQt4.Qt import QMenu
 from PyQt4.Qt import QMouseEvent
+from PyQt4.Qt import QRunnable
 from PyQt4.Qt import QSyntaxHighlighter
 from PyQt4.Qt import QTextCharFormat
 from PyQt4.Qt import QTextCursor
+from PyQt4.Qt import QThreadPool
 from PyQt4.Qt import Qt
 from PyQt4.QtCore import SIGNAL
 
+from cola import cache
+from cola import spellcheck
 from cola.i18n import N_
 from cola.widgets.text import HintedTextEdit
 from cola.compat import ustr
 
 
-alphabet = 'abcdefghijklmnopqrstuvwxyz'
-
-
-def train(features, model):
-    for f in features:
-        model[f] += 1
-    return model
-
-
-def edits1(word):
-    splits     = [(word[:i], word[i:]) for i in range(len(word) + 1)]
-    deletes    = [a + b[1:] for a, b in splits if b]
-    transposes = [a + b[1] + b[0] + b[2:] for a, b in splits if len(b)>1]
-    replaces   = [a + c + b[1:] for a, b in splits for c in alphabet if b]
-    inserts    = [a + c + b     for a, b in splits for c in alphabet]
-    return set(deletes + transposes + replaces + inserts)
-
-
-def known_edits2(word, words):
-    return set(e2 for e1 in edits1(word)
-                  for e2 in edits1(e1) if e2 in words)
-
-def known(word, words):
-    return set(w for w in word if w in words)
-
-
-def suggest(word, words):
-    candidates = (known([word], words) or
-                  known(edits1(word), words) or
-                  known_edits2(word, words) or [word])
-    return candidates
-
+class NorvigSpellCheck(object):
+    """Checks words against the precompiled dictionary index
 
-def correct(word, words):
-    candidates = suggest(word, words)
-    return max(candidates, key=words.get)
+    Words added at runtime, e.g. the user's name, are kept in memory
+    alongside the project vocabulary.  Verdicts are remembered until the
+    set of known words changes, which bumps the generation.
 
+    When the index needs to be built and a `sender` is given, it is built
+    on a background thread.  The plain dictionary words are used until
+    the sender's "spelling_index(PyQt_PyObject)" signal delivers it to
+    set_index().
 
-class NorvigSpellCheck(object):
-    def __init__(self):
-        self.words = collections.defaultdict(lambda: 1)
-        self.extra_words = set()
+    """
+    def __init__(self, sender=None):
+        self.sender = sender
+        self.extra_words = spellcheck.WordIndex()
+        self.vocabulary = frozenset()
+        self.verdicts = cache.LRUCache(maxsize=4096)
+        self.generation = 0
+        self.index = None
         self.initialized = False
+        self.task = None
 
     def init(self):
         if self.initialized:
             return
         self.initialized = True
-        train(self.read(), self.words)
-        train(self.extra_words, self.words)
+        self.index = spellcheck.open_index()
+        if self.index is not None:
+            return
+        if self.sender is None:
+            self.index = spellcheck.load_index()
+            return
+        self.index = spellcheck.WordSet(spellcheck.read_words())
+        self.task = IndexTask(self.sender)
+        QThreadPool.globalInstance().start(self.task)
+
+    def set_index(self, index):
+        self.task = None
+        old_index, self.index = self.index, index
+        old_index.close()
+        self.invalidate()
 
     def add_word(self, word):
         self.extra_words.add(word)
+        self.invalidate()
+
+    def set_vocabulary(self, words):
+        self.vocabulary = frozenset(words)
+        self.invalidate()
+
+    def invalidate(self):
+        self.verdicts.clear()
+        self.generation += 1
 
     def suggest(self, word):
         self.init()
-        return suggest(word, self.words)
+        return self.index.suggest(word, extra_words=self.extra_words)
 
     def check(self, word):
+        verdict = self.verdicts.get(word)
+        if verdict is None:
+            verdict = self._check(word)
+            self.verdicts.put(word, verdict)
+        return verdict
+
+    def _check(self, word):
         self.init()
-        return word.replace('.', '') in self.words
-
-    def read(self):
-        for (path, title) in (('/usr/share/dict/words', True),
-                              ('/usr/share/dict/propernames', False)):
-            try:
-                with open(path, 'r') as f:
-                    for word in f:
-                        yield word.rstrip()
-                        if title:
-                            yield word.rstrip().title()
-            except IOError:
-                pass
-        raise StopIteration
+        word = word.replace('.', '')
+        return (self.extra_words.contains(word) or
+                word in self.vocabulary or
+                self.index.contains(word))
 
 
 class SpellCheckTextEdit(HintedTextEdit):
@@ -109,8 +110,29 @@ class SpellCheckTextEdit(HintedTextEdit):
         HintedTextEdit.__init__(self, hint, parent)
 
         # Default dictionary based on the current locale.
-        self.spellcheck = NorvigSpellCheck()
+        self.spellcheck = NorvigSpellCheck(sender=self)
         self.highlighter = Highlighter(self.document(), self.spellcheck)
+        self.tasks = set()
+        self.connect(self, SIGNAL('vocabulary(PyQt_PyObject)'),
+                     self.set_vocabulary, Qt.QueuedConnection)
+        self.connect(self, SIGNAL('spelling_index(PyQt_PyObject)'),
+                     self.set_index, Qt.QueuedConnection)
+
+    def load_vocabulary(self):
+        """Learn the words used by the current project in the background"""
+        task = VocabularyTask(self)
+        self.tasks.add(task)
+        QThreadPool.globalInstance().start(task)
+
+    def set_vocabulary(self, result):
+        task, words = result
+        self.tasks.discard(task)
+        self.spellcheck.set_vocabulary(words)
+        self.highlighter.refresh()
+
+    def set_index(self, index):
+        self.spellcheck.set_index(index)
+        self.highlighter.refresh()
 
     def mousePressEvent(self, event):
         if event.button() == Qt.RightButton:
@@ -174,23 +196,39 @@ class Highlighter(QSyntaxHighlighter):
         QSyntaxHighlighter.__init__(self, doc)
         self.spellcheck = spellcheck
         self.enabled = False
+        # Misspelled spans keyed by (generation, block text)
+        self.blocks = cache.LRUCache(maxsize=512)
+        self.fmt = QTextCharFormat()
+        self.fmt.setUnderlineColor(Qt.red)
+        self.fmt.setUnderlineStyle(QTextCharFormat.SpellCheckUnderline)
 
     def enable(self, enabled):
         self.enabled = enabled
         self.rehighlight()
 
+    def refresh(self):
+        """Re-check the document after the set of known words changes"""
+        self.blocks.clear()
+        if self.enabled:
+            self.rehighlight()
+
+    def misspellings(self, text):
+        """Return the (start, length) spans of misspelled words in text"""
+        key = (self.spellcheck.generation, text)
+        spans = self.blocks.get(key)
+        if spans is None:
+            check = self.spellcheck.check
+            spans = [(m.start(), m.end() - m.start())
+                     for m in re.finditer(self.WORDS, text)
+                     if not check(m.group())]
+            self.blocks.put(key, spans)
+        return spans
+
     def highlightBlock(self, text):
         if not self.enabled:
             return
-        text = ustr(text)
-        fmt = QTextCharFormat()
-        fmt.setUnderlineColor(Qt.red)
-        fmt.setUnderlineStyle(QTextCharFormat.SpellCheckUnderline)
-
-        for word_object in re.finditer(self.WORDS, text):
-            if not self.spellcheck.check(word_object.group()):
-                self.setFormat(word_object.start(),
-                    word_object.end() - word_object.start(), fmt)
+        for start, length in self.misspellings(ustr(text)):
+            self.setFormat(start, length, self.fmt)
 
 
 class SpellAction(QAction):
@@ -205,6 +243,37 @@ class SpellAction(QAction):
         self.emit(SIGNAL('correct(PyQt_PyObject)'), ustr(self.text()))
 
 
+class VocabularyTask(QRunnable):
+    """Builds the project vocabulary and sends it back to the editor"""
+
+    def __init__(self, sender):
+        QRunnable.__init__(self)
+        self.sender = sender
+
+    def run(self):
+        try:
+            words = spellcheck.load_vocabulary()
+        except (IOError, OSError):
+            words = frozenset()
+        self.sender.emit(SIGNAL('vocabulary(PyQt_PyObject)'), (self, words))
+
+
+class IndexTask(QRunnable):
+    """Builds the dictionary index and sends it back to the editor"""
+
+    def __init__(self, sender):
+        QRunnable.__init__(self)
+        self.sender = sender
+
+    def run(self):
+        try:
+            index = spellcheck.load_index()
+        except (IOError, OSError):
+            # Keep using the plain word list
+            return
+        self.sender.emit(SIGNAL('spelling_index(PyQt_PyObject)'), index)
+
+
 def main(args=sys.argv):
     app = QApplication(args)
 
@@ -1,8 +1,8 @@
 from __future__ import division, absolute_import, unicode_literals
 
+import threading
 import time
 
-
 from PyQt4 import QtGui
 from PyQt4 import QtCore
 from PyQt4.QtCore import Qt
@@ -13,6 +13,8 @@ from cola import core
 from cola import gitcfg
 from cola import qtcompat
 from cola import qtutils
+from cola import utils
+from cola.i18n import N_
 from cola.settings import Settings
 
 
@@ -44,14 +46,14 @@ class WidgetMixin(object):
     def save_state(self, settings=None):
         if settings is None:
             settings = Settings()
-            settings.load()
+            settings.load(check_missing=False)
         if gitcfg.current().get('cola.savewindowsettings', True):
             settings.save_gui_state(self)
 
     def restore_state(self, settings=None):
         if settings is None:
             settings = Settings()
-            settings.load()
+            settings.load(check_missing=False)
         state = settings.get_gui_state(self)
         return bool(state) and self.apply_state(state)
 
@@ -88,7 +90,7 @@ class WidgetMixin(object):
 
     def closeEvent(self, event):
         settings = Settings()
-        settings.load()
+        settings.load(check_missing=False)
         settings.add_recent(core.getcwd())
         self.save_state(settings=settings)
         self.QtClass.closeEvent(self, event)
@@ -449,6 +451,94 @@ class ProgressAnimationThread(QtCore.QThread):
             time.sleep(self.timeout)
 
 
+class ExportDialog(QtGui.QProgressDialog):
+    """Runs an export command in the background with a cancellable progress
+
+    The command's `progress` and `cancelled` attributes are set to callbacks
+    that report the bytes written and whether the user has cancelled.
+    See core.stream_command().
+
+    """
+    PROGRESS = SIGNAL('export_progress(PyQt_PyObject)')
+    FINISHED = SIGNAL('export_finished()')
+
+    def __init__(self, title, label, total, parent):
+        QtGui.QProgressDialog.__init__(self, parent)
+        self.label = label
+        self.total = total
+        self.canceled = False
+        self.error = None
+        self.setWindowTitle(title)
+        self.setLabelText(label)
+        self.setAutoClose(False)
+        self.setAutoReset(False)
+        if parent is not None:
+            self.setWindowModality(Qt.WindowModal)
+        if total:
+            self.setRange(0, 1000)
+        else:
+            self.setRange(0, 0)
+
+        self.connect(self, SIGNAL('canceled()'), self.cancel_export)
+        self.connect(self, self.PROGRESS, self.update_progress,
+                     Qt.QueuedConnection)
+        self.connect(self, self.FINISHED, self.accept, Qt.QueuedConnection)
+
+    def run(self, cmd):
+        """Run the command and return False if it was cancelled"""
+        cmd.progress = self.emit_progress
+        cmd.cancelled = self.is_canceled
+        task = ExportTask(self, cmd)
+        QtCore.QThreadPool.globalInstance().start(task)
+        self.exec_()
+        # Wait for a cancelled command to be stopped
+        task.done.wait()
+        self.error = task.error
+        return not self.canceled
+
+    def details(self):
+        """Return the traceback of an error raised by the command, or None"""
+        if self.error is None:
+            return None
+        return self.error[1]
+
+    def cancel_export(self):
+        self.canceled = True
+
+    def is_canceled(self):
+        return self.canceled
+
+    def emit_progress(self, nbytes):
+        self.emit(self.PROGRESS, nbytes)
+
+    def update_progress(self, nbytes):
+        if self.total:
+            self.setValue(min(1000, nbytes * 1000 // self.total))
+        else:
+            self.setLabelText('%s\n%s' % (self.label, N_('%d KiB written') %
+                                          (nbytes // 1024)))
+
+
+class ExportTask(QtCore.QRunnable):
+    """Runs an export command on behalf of an ExportDialog"""
+
+    def __init__(self, dialog, cmd):
+        QtCore.QRunnable.__init__(self)
+        self.dialog = dialog
+        self.cmd = cmd
+        self.done = threading.Event()
+        self.error = None  # (message, details) when the command raised
+
+    def run(self):
+        try:
+            self.cmd.do()
+        except Exception as e:
+            self.error = utils.format_exception(e)
+        finally:
+            self.done.set()
+            self.dialog.emit(ExportDialog.FINISHED)
+
+
 class SpinBox(QtGui.QSpinBox):
     def __init__(self, parent=None):
         QtGui.QSpinBox.__init__(self, parent)
@@ -7,6 +7,7 @@ found at startup.
 """
 from __future__ import division, absolute_import, unicode_literals
 
+from PyQt4 import QtCore
 from PyQt4 import QtGui
 from PyQt4.QtCore import Qt
 from PyQt4.QtCore import SIGNAL
@@ -19,6 +20,8 @@ from cola.guicmds import TaskRunner
 from cola.i18n import N_
 from cola.settings import Settings
 from cola.widgets import defs
+from cola.widgets.bookmarks import VerifyTask
+from cola.widgets.bookmarks import mark_missing
 from cola.widgets.standard import ProgressDialog
 
 
@@ -44,8 +47,10 @@ class StartupDialog(QtGui.QDialog):
 
         self.close_button = QtGui.QPushButton(N_('Close'))
 
+        # Repositories are verified in the background so that the dialog
+        # is shown without waiting for slow or unreachable paths.
         settings = Settings()
-        settings.load()
+        settings.load(check_missing=False)
 
         self.bookmarks_label = QtGui.QLabel(N_('Select Repository...'))
         self.bookmarks_label.setAlignment(Qt.AlignCenter)
@@ -56,6 +61,7 @@ class StartupDialog(QtGui.QDialog):
         item.setEditable(False)
         self.bookmarks_model.appendRow(item)
 
+        self.items = {}
         added = set()
         all_repos = settings.bookmarks + settings.recent
 
@@ -66,6 +72,7 @@ class StartupDialog(QtGui.QDialog):
             item = QtGui.QStandardItem(repo)
             item.setEditable(False)
             self.bookmarks_model.appendRow(item)
+            self.items[repo] = item
 
         selection_mode = QtGui.QAbstractItemView.SingleSelection
 
@@ -99,6 +106,23 @@ class StartupDialog(QtGui.QDialog):
                      SIGNAL('activated(const QModelIndex &)'),
                      self.open_bookmark)
 
+        self.connect(self, SIGNAL('verified(PyQt_PyObject)'),
+                     self.verified, Qt.QueuedConnection)
+
+        self.tasks = set()
+        if all_repos:
+            task = VerifyTask(self, settings)
+            self.tasks.add(task)
+            QtCore.QThreadPool.globalInstance().start(task)
+
+    def verified(self, result):
+        task, verdicts = result
+        self.tasks.discard(task)
+        for repo, ok in verdicts.items():
+            item = self.items.get(repo)
+            if item is not None and ok is False:
+                mark_missing(item, repo)
+
     def find_git_repo(self):
         """
         Return a path to a git repository
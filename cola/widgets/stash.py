@@ -33,6 +33,7 @@ class StashView(Dialog):
     def __init__(self, model, parent=None):
         Dialog.__init__(self, parent=parent)
         self.model = model
+        self.tasks = set()
         self.stashes = []
         self.revids = []
         self.names = []
@@ -94,6 +95,9 @@ class StashView(Dialog):
         self.connect(self.stash_list, SIGNAL('itemSelectionChanged()'),
                      self.item_selected)
 
+        self.connect(self, SIGNAL('stash_diff(PyQt_PyObject)'),
+                     self.stash_diff_ready, Qt.QueuedConnection)
+
         qtutils.connect_button(self.button_apply, self.stash_apply)
         qtutils.connect_button(self.button_save, self.stash_save)
         qtutils.connect_button(self.button_drop, self.stash_drop)
@@ -131,8 +135,22 @@ class StashView(Dialog):
         selection = self.selected_stash()
         if not selection:
             return
-        diff_text = self.model.stash_diff(selection)
-        self.stash_text.setPlainText(diff_text)
+        diff_text = self.model.cached_stash_diff(selection)
+        if diff_text is not None:
+            self.stash_text.setPlainText(diff_text)
+            return
+        # Large stashes can take a while to diff so read them in the
+        # background and only show the result if it is still selected.
+        self.stash_text.setPlainText('+++ ' + N_('Loading...'))
+        task = StashDiffTask(self, self.model, selection)
+        self.tasks.add(task)
+        QtCore.QThreadPool.globalInstance().start(task)
+
+    def stash_diff_ready(self, result):
+        task, diff_text = result
+        self.tasks.discard(task)
+        if task.rev == self.selected_stash():
+            self.stash_text.setPlainText(diff_text)
 
     def update_actions(self):
         has_changes = self.model.has_stashable_changes()
@@ -203,3 +221,18 @@ class StashView(Dialog):
         cmds.do(DropStash, selection)
         self.update_from_model()
         self.stash_text.setPlainText('')
+
+
+class StashDiffTask(QtCore.QRunnable):
+    """Reads a stash diff and sends it back to the view"""
+
+    def __init__(self, sender, model, rev):
+        QtCore.QRunnable.__init__(self)
+        self.sender = sender
+        self.model = model
+        self.rev = rev
+
+    def run(self):
+        diff_text = self.model.stash_diff(self.rev)
+        self.sender.emit(SIGNAL('stash_diff(PyQt_PyObject)'),
+                         (self, diff_text))
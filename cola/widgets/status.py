@@ -9,6 +9,7 @@ from PyQt4.QtCore import SIGNAL
 
 from cola import cmds
 from cola import core
+from cola import gitcfg
 from cola import qtutils
 from cola import utils
 from cola.i18n import N_
@@ -82,6 +83,9 @@ class StatusTreeWidget(QtGui.QTreeWidget):
     idx_untracked = 3
     idx_end = 4
 
+    # Larger categories start out collapsed and get their rows on expand
+    lazy_rows = 1000
+
     # Read-only access to the mode state
     mode = property(lambda self: self.m.mode)
 
@@ -109,6 +113,10 @@ class StatusTreeWidget(QtGui.QTreeWidget):
         self.old_contents = None
         self.old_current_item = None
         self.expanded_items = set()
+        # The (paths, deleted paths) currently shown in each category
+        self.subtree_state = {}
+        # Updates for categories whose rows have not been created yet
+        self.pending_subtrees = {}
 
         self.process_selection_action = qtutils.add_action(self,
                 cmds.StageOrUnstage.name(),
@@ -187,6 +195,7 @@ class StatusTreeWidget(QtGui.QTreeWidget):
         self.m.add_observer(self.m.message_about_to_update,
                             self.about_to_update)
         self.m.add_observer(self.m.message_updated, self.updated)
+        self.prefetcher = DiffPrefetcher(self.m)
 
         self.connect(self, SIGNAL('itemSelectionChanged()'),
                      self.show_selection)
@@ -198,7 +207,7 @@ class StatusTreeWidget(QtGui.QTreeWidget):
                      lambda x: self.update_column_widths())
 
         self.connect(self, SIGNAL('itemExpanded(QTreeWidgetItem*)'),
-                     lambda x: self.update_column_widths())
+                     self._item_expanded)
 
     def add_item(self, txt, hide=False):
         """Create a new top-level item in the status tree."""
@@ -209,6 +218,8 @@ class StatusTreeWidget(QtGui.QTreeWidget):
         item = QtGui.QTreeWidgetItem(self)
         item.setFont(0, font)
         item.setText(0, txt)
+        # Rows are created on expand so the item may not have children yet
+        item.setChildIndicatorPolicy(QtGui.QTreeWidgetItem.ShowIndicator)
         if hide:
             self.setItemHidden(item, True)
 
@@ -337,6 +348,7 @@ class StatusTreeWidget(QtGui.QTreeWidget):
         return None
 
     def _subtree_item(self, idx, itemidx):
+        self._show_subtree(idx)
         parent = self.topLevelItem(idx)
         return parent.child(itemidx)
 
@@ -379,6 +391,12 @@ class StatusTreeWidget(QtGui.QTreeWidget):
         self.emit(SIGNAL('updated()'))
 
     def _updated(self):
+        # Unchanged rows are reused across updates.  Clear their selection
+        # so that restore_selection() triggers show_selection() as usual.
+        self.blockSignals(True)
+        self.clearSelection()
+        self.blockSignals(False)
+
         self.set_staged(self.m.staged)
         self.set_modified(self.m.modified)
         self.set_unmerged(self.m.unmerged)
@@ -416,7 +434,12 @@ class StatusTreeWidget(QtGui.QTreeWidget):
                      staged=False,
                      untracked=False,
                      deleted_set=None):
-        """Add a list of items to a treewidget item."""
+        """Add a list of items to a treewidget item.
+
+        The rows of a collapsed category that has none yet are created
+        when it is expanded.
+
+        """
         self.blockSignals(True)
         parent = self.topLevelItem(idx)
         if items:
@@ -424,26 +447,81 @@ class StatusTreeWidget(QtGui.QTreeWidget):
         else:
             self.setItemHidden(parent, True)
 
-        # sip v4.14.7 and below leak memory in parent.takeChildren()
-        # so we use this backwards-compatible construct instead
-        while parent.takeChild(0) is not None:
-            pass
+        if deleted_set:
+            deleted = set([item for item in items if item in deleted_set])
+        else:
+            deleted = set()
+        self.pending_subtrees[idx] = (list(items), deleted, staged, untracked)
+        if parent.isExpanded() or parent.childCount():
+            self._show_subtree(idx)
+        self.expand_items(idx, items)
+        self.blockSignals(False)
+
+    def _show_subtree(self, idx):
+        """Apply a pending update to the rows of a category
+
+        Only the rows that changed since the last update are touched;
+        unchanged rows are kept as-is.
+
+        """
+        try:
+            items, deleted, staged, untracked = self.pending_subtrees.pop(idx)
+        except KeyError:
+            return
+        old_items, old_deleted = self.subtree_state.get(idx, ([], set()))
+        if items == old_items and deleted == old_deleted:
+            return
+        self.subtree_state[idx] = (items, deleted)
+        blocked = self.blockSignals(True)
+        parent = self.topLevelItem(idx)
 
-        for item in items:
-            deleted = (deleted_set is not None and item in deleted_set)
+        # Rows whose "deleted" state flipped need a new icon so they are
+        # recreated along with the rows that were added.
+        new_set = set(items)
+        changed = old_deleted.symmetric_difference(deleted)
+        keep_set = set([item for item in old_items
+                        if item in new_set and item not in changed])
+        if ([item for item in old_items if item in keep_set] !=
+                [item for item in items if item in keep_set]):
+            # The relative order changed so rebuild from scratch
+            keep_set = set()
+
+        # Remove rows from the bottom so that the remaining rows keep
+        # their indexes.  sip v4.14.7 and below leak memory in
+        # parent.takeChildren() so we take children one at a time.
+        for row in range(len(old_items) - 1, -1, -1):
+            if old_items[row] not in keep_set:
+                parent.takeChild(row)
+
+        # Insert the new rows in contiguous runs
+        run_start = 0
+        run = []
+        for row, item in enumerate(items):
+            if item in keep_set:
+                if run:
+                    parent.insertChildren(run_start, run)
+                    run = []
+                continue
+            if not run:
+                run_start = row
             treeitem = qtutils.create_treeitem(item,
                                                staged=staged,
-                                               deleted=deleted,
+                                               deleted=item in deleted,
                                                untracked=untracked)
-            parent.addChild(treeitem)
-        self.expand_items(idx, items)
-        self.blockSignals(False)
+            run.append(treeitem)
+        if run:
+            parent.insertChildren(run_start, run)
+        self.blockSignals(blocked)
 
     def update_column_widths(self):
         self.resizeColumnToContents(0)
 
     def expand_items(self, idx, items):
-        """Expand the top-level category "folder" once and only once."""
+        """Expand the top-level category "folder" once and only once.
+
+        Categories with more than lazy_rows items are left collapsed.
+
+        """
         # Don't do this if items is empty; this makes it so that we
         # don't add the top-level index into the expanded_items set
         # until an item appears in a particular category.
@@ -455,9 +533,16 @@ class StatusTreeWidget(QtGui.QTreeWidget):
             return
         self.expanded_items.add(idx)
         item = self.topLevelItem(idx)
-        if item:
+        if item and len(items) <= self.lazy_rows:
+            self._show_subtree(idx)
             self.expandItem(item)
 
+    def _item_expanded(self, item):
+        idx = self.indexOfTopLevelItem(item)
+        if idx >= 0:
+            self._show_subtree(idx)
+        self.update_column_widths()
+
     def contextMenuEvent(self, event):
         """Create context menus for the repo status tree."""
         menu = self.create_context_menu()
@@ -633,6 +718,9 @@ class StatusTreeWidget(QtGui.QTreeWidget):
                     self._open_parent_dir)
             action.setShortcut(cmds.OpenParentDir.SHORTCUT)
 
+        if s.untracked:
+            self._add_untracked_directory_actions(menu, s)
+
         if all_exist and s.untracked:
             menu.addSeparator()
             if self.move_to_trash_action is not None:
@@ -648,6 +736,19 @@ class StatusTreeWidget(QtGui.QTreeWidget):
         menu.addAction(self.copy_relpath_action)
         return menu
 
+    def _add_untracked_directory_actions(self, menu, s):
+        """Expand and collapse actions for summarized untracked directories"""
+        directories = [p for p in s.untracked if p.endswith('/')]
+        if directories:
+            menu.addSeparator()
+            menu.addAction(qtutils.dir_icon(), N_('Expand Directory'),
+                           cmds.run(cmds.ExpandUntracked, directories))
+        parent = utils.dirname(s.untracked[0].rstrip('/')) + '/'
+        if parent in self.m.expanded_untracked:
+            menu.addAction(qtutils.dir_icon(),
+                           N_('Collapse "%s"') % parent,
+                           cmds.run(cmds.CollapseUntracked, parent))
+
     def _create_modified_submodule_context_menu(self, menu, s):
         menu.addAction(qtutils.git_icon(),
                        N_('Launch git-cola'),
@@ -747,8 +848,7 @@ class StatusTreeWidget(QtGui.QTreeWidget):
             if len(content) == 0:
                 continue
             if idx < len(content):
-                parent = self.topLevelItem(toplevel_idx)
-                item = parent.child(idx)
+                item = self._subtree_item(toplevel_idx, idx)
                 self.select_item(item)
                 return
             idx -= len(content)
@@ -850,6 +950,40 @@ class StatusTreeWidget(QtGui.QTreeWidget):
             item = self.unstaged_items()[0]
             cmds.do(cmds.ShowUntracked, item.path)
 
+        self.prefetch_neighbors()
+
+    def prefetch_neighbors(self):
+        """Warm the diff cache for the entries around the selection"""
+        idx = self.selected_idx()
+        if idx is None:
+            self.prefetcher.cancel()
+            return
+        count = self.prefetcher.count
+        entries = []
+        for offset in range(1, count + 1):
+            for neighbor in (idx + offset, idx - offset):
+                entry = self._diff_entry(neighbor)
+                if entry is not None:
+                    entries.append(entry)
+        self.prefetcher.prefetch(entries)
+
+    def _diff_entry(self, idx):
+        """Return (path, cached, deleted) for the entry at a flat index"""
+        if idx < 0:
+            return None
+        m = self.m
+        categories = ((m.staged, True, m.staged_deleted),
+                      (m.unmerged, False, None),
+                      (m.modified, False, m.unstaged_deleted))
+        for items, cached, deleted_set in categories:
+            if idx < len(items):
+                path = items[idx]
+                deleted = deleted_set is not None and path in deleted_set
+                return (path, cached, deleted)
+            idx -= len(items)
+        # Untracked files are read directly and are not worth prefetching
+        return None
+
     def move_up(self):
         idx = self.selected_idx()
         all_files = self.all_files()
@@ -910,6 +1044,69 @@ class StatusTreeWidget(QtGui.QTreeWidget):
         return qtutils.path_mimetypes()
 
 
+class DiffPrefetcher(object):
+    """Computes diffs for nearby status entries on a background thread
+
+    The results land in the diff cache maintained by gitcmds.diff_helper()
+    so that stepping through the status list does not wait on git.
+    Outstanding work is abandoned whenever a new selection is made.
+
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.count = gitcfg.current().get('cola.prefetchdiffs', 3)
+        self.generation = 0
+        self.tasks = set()
+        self.threadpool = QtCore.QThreadPool()
+        self.threadpool.setMaxThreadCount(1)
+        self.notifier = QtCore.QObject()
+        self.notifier.connect(self.notifier,
+                              SIGNAL('task_done(PyQt_PyObject)'),
+                              self.task_done, Qt.QueuedConnection)
+
+    def cancel(self):
+        """Abandon pending prefetches"""
+        self.generation += 1
+
+    def prefetch(self, entries):
+        """Prefetch a list of (path, cached, deleted) entries"""
+        self.cancel()
+        if not entries or self.count < 1:
+            return
+        task = DiffPrefetchTask(self, self.generation,
+                                self.model.head, entries)
+        # prevents garbage collection bugs in certain PyQt4 versions
+        self.tasks.add(task)
+        self.threadpool.start(task)
+
+    def is_current(self, generation):
+        return generation == self.generation
+
+    def task_done(self, task):
+        self.tasks.discard(task)
+
+
+class DiffPrefetchTask(QtCore.QRunnable):
+    """Warms the diff cache for a list of status entries"""
+
+    def __init__(self, prefetcher, generation, head, entries):
+        QtCore.QRunnable.__init__(self)
+        self.prefetcher = prefetcher
+        self.generation = generation
+        self.head = head
+        self.entries = entries
+
+    def run(self):
+        for path, cached, deleted in self.entries:
+            if not self.prefetcher.is_current(self.generation):
+                break
+            cmds.Diff.diff_text_for(path, self.head,
+                                    cached=cached, deleted=deleted)
+        self.prefetcher.notifier.emit(SIGNAL('task_done(PyQt_PyObject)'),
+                                      self)
+
+
 class StatusFilterWidget(QtGui.QWidget):
 
     def __init__(self, parent=None):
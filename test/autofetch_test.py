@@ -0,0 +1,160 @@
+from __future__ import unicode_literals
+
+import unittest
+
+from cola import autofetch
+from cola import gitcfg
+from cola import gitcmds
+
+from test import helper
+
+
+class SchedulerTestCase(unittest.TestCase):
+    """Tests the fetch schedule and its backoff."""
+
+    def setUp(self):
+        self.now = 1000.0
+        self.results = {'origin': True, 'mirror': True}
+        self.fetched = []
+        self.scheduler = autofetch.Scheduler(
+                60, 600, remotes=lambda: sorted(self.results),
+                fetch=self.fetch, cache=NullCache(), clock=self.clock)
+
+    def clock(self):
+        return self.now
+
+    def fetch(self, remote):
+        self.fetched.append(remote)
+        return self.results[remote]
+
+    def test_remotes_are_fetched_once_per_interval(self):
+        self.scheduler.run_pending()
+        self.assertEqual(self.fetched, ['mirror', 'origin'])
+        self.now += 59
+        self.scheduler.run_pending()
+        self.assertEqual(len(self.fetched), 2)
+        self.now += 1
+        self.scheduler.run_pending()
+        self.assertEqual(len(self.fetched), 4)
+
+    def test_failures_back_off(self):
+        self.results['mirror'] = False
+        self.scheduler.run_pending()
+        mirror = self.scheduler.schedule['mirror']
+        self.assertEqual(mirror.due, self.now + 120)
+        self.now = mirror.due
+        self.scheduler.run_pending()
+        self.assertEqual(mirror.due, self.now + 240)
+        for i in range(5):
+            self.now = mirror.due
+            self.scheduler.run_pending()
+        # The delay is capped
+        self.assertEqual(mirror.due, self.now + 600)
+
+        self.results['mirror'] = True
+        self.now = mirror.due
+        self.scheduler.run_pending()
+        self.assertEqual(mirror.failures, 0)
+        self.assertEqual(mirror.due, self.now + 60)
+
+    def test_removed_remotes_are_forgotten(self):
+        self.scheduler.run_pending()
+        del self.results['mirror']
+        self.scheduler.run_pending()
+        self.assertEqual(list(self.scheduler.schedule), ['origin'])
+
+
+class ConfigTestCase(helper.GitRepositoryTestCase):
+    """Tests reading the auto-fetch configuration."""
+
+    def setUp(self):
+        helper.GitRepositoryTestCase.setUp(self)
+        gitcfg.current().reset()
+
+    def set_config(self, key, value):
+        self.git('config', key, value)
+        gitcfg.current().reset()
+
+    def test_defaults(self):
+        self.assertEqual(autofetch.interval(), 0)
+        self.assertEqual(autofetch.max_backoff(),
+                         autofetch.DEFAULT_BACKOFF * 60)
+
+    def test_values_are_minutes(self):
+        self.set_config(autofetch.INTERVAL, '5')
+        self.set_config(autofetch.BACKOFF, '30')
+        self.assertEqual(autofetch.interval(), 300)
+        self.assertEqual(autofetch.max_backoff(), 1800)
+
+    def test_invalid_values_are_ignored(self):
+        self.set_config(autofetch.INTERVAL, 'often')
+        self.set_config(autofetch.BACKOFF, 'never')
+        self.assertEqual(autofetch.interval(), 0)
+        self.assertEqual(autofetch.max_backoff(),
+                         autofetch.DEFAULT_BACKOFF * 60)
+
+
+class NullCache(object):
+
+    def stale(self):
+        return False
+
+    def update(self):
+        return False
+
+
+class AheadBehindTestCase(helper.GitRepositoryTestCase):
+    """Tests fetching from a local bare repository."""
+
+    def setUp(self):
+        helper.GitRepositoryTestCase.setUp(self)
+        self.remote = self.test_path('remote.git')
+        self.git('init', '--bare', self.remote)
+        self.git('remote', 'add', 'origin', self.remote)
+        self.git('push', '-u', 'origin', 'master')
+        gitcfg.current().reset()
+        gitcmds.reset()
+        self.cache = autofetch.AheadBehind()
+
+    def test_counts_follow_the_refs(self):
+        self.assertEqual(self.cache.counts('master'), None)
+        self.assertTrue(self.cache.stale())
+        self.assertTrue(self.cache.update())
+        self.assertEqual(self.cache.counts('master'), (0, 0))
+        self.assertFalse(self.cache.stale())
+
+        self.append_file('A', 'A')
+        self.git('commit', '-m', 'local change', 'A')
+        self.assertEqual(self.cache.counts('master'), None)
+        self.cache.update()
+        self.assertEqual(self.cache.counts('master'), (1, 0))
+
+    def test_scheduler_fetches_upstream_changes(self):
+        # Push a commit to the remote from a second clone
+        clone = self.test_path('clone')
+        self.git('clone', '-q', self.remote, clone)
+        self.git('-C', clone, 'commit', '--allow-empty', '-m', 'remote')
+        self.git('-C', clone, 'push', '-q', 'origin', 'master')
+
+        updates = []
+        scheduler = autofetch.Scheduler(60, 600, cache=self.cache,
+                                        on_update=updates.append)
+        scheduler.run_pending()
+        self.assertEqual(updates, [True])
+        self.assertEqual(self.cache.counts('master'), (0, 1))
+        self.assertEqual(scheduler.schedule['origin'].failures, 0)
+
+        # Fetching again without new commits reports nothing
+        scheduler.schedule['origin'].due = 0
+        scheduler.run_pending()
+        self.assertEqual(updates, [True])
+
+    def test_new_remote_branches_are_reported(self):
+        self.assertTrue(self.cache.update())
+        self.assertFalse(self.cache.update())
+        self.git('push', '-q', 'origin', 'master:topic')
+        self.assertTrue(self.cache.update())
+
+
+if __name__ == '__main__':
+    unittest.main()
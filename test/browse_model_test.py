@@ -2,6 +2,7 @@
 from __future__ import unicode_literals
 
 from cola import core
+from cola import gitcfg
 from cola import gitcmds
 from cola.models.main import MainModel
 
@@ -55,3 +56,20 @@ class ClassicModelTestCase(helper.GitRepositoryTestCase):
 
         self.assertTrue('foo/bar/baz' in self.model.untracked)
         self.assertTrue('foo/bar/baz' not in self.model.staged)
+
+    def test_show_untracked_files(self):
+        """Test the status.showUntrackedFiles modes."""
+        core.makedirs('foo/bar')
+        self.touch('foo/bar/baz')
+        self.model.update_status()
+        self.assertEqual(self.model.untracked, ['foo/bar/baz'])
+
+        self.git('config', 'status.showUntrackedFiles', 'normal')
+        gitcfg.current().reset()
+        self.model.update_status()
+        self.assertEqual(self.model.untracked, ['foo/'])
+
+        self.git('config', 'status.showUntrackedFiles', 'no')
+        gitcfg.current().reset()
+        self.model.update_status()
+        self.assertEqual(self.model.untracked, [])
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals
+
+import os
+import unittest
+
+from cola import cache
+
+from test import helper
+
+
+class LRUCacheTestCase(unittest.TestCase):
+    """Tests the cola.cache module."""
+
+    def test_get_put(self):
+        lru = cache.LRUCache(maxsize=2)
+        lru.put('a', 1)
+        self.assertEqual(lru.get('a'), 1)
+        self.assertEqual(lru.get('b'), None)
+        self.assertEqual(lru.get('b', 2), 2)
+        self.assertTrue('a' in lru)
+        self.assertEqual(len(lru), 1)
+
+    def test_evicts_least_recently_used(self):
+        lru = cache.LRUCache(maxsize=2)
+        lru.put('a', 1)
+        lru.put('b', 2)
+        lru.get('a')
+        lru.put('c', 3)
+        self.assertEqual(lru.keys(), ['a', 'c'])
+        self.assertFalse('b' in lru)
+
+    def test_unbounded(self):
+        lru = cache.LRUCache(maxsize=None)
+        for i in range(1000):
+            lru.put(i, i)
+        self.assertEqual(len(lru), 1000)
+
+    def test_pop_prune_clear(self):
+        lru = cache.LRUCache()
+        for i in range(10):
+            lru.put(i, i * 2)
+        self.assertEqual(lru.pop(3), 6)
+        self.assertEqual(lru.pop(3), None)
+        lru.prune(lambda key: key % 2 == 0)
+        self.assertEqual(lru.keys(), [1, 5, 7, 9])
+        lru.clear()
+        self.assertEqual(len(lru), 0)
+        self.assertEqual(lru.keys(), [])
+
+
+class DiskCacheTestCase(helper.TmpPathTestCase):
+    """Tests the on-disk cache."""
+
+    def setUp(self):
+        helper.TmpPathTestCase.setUp(self)
+        self.disk = cache.DiskCache(self.test_path('cache'), maxbytes=10)
+
+    def test_get_put(self):
+        self.assertEqual(self.disk.get('a'), (None, None))
+        self.disk.put('a', b'data', 100, validator='"etag"')
+        data, meta = self.disk.get('a')
+        self.assertEqual(data, b'data')
+        self.assertEqual(meta['validator'], '"etag"')
+        self.assertTrue(self.disk.is_fresh(meta, now=99))
+        self.assertFalse(self.disk.is_fresh(meta, now=100))
+        self.assertFalse(self.disk.is_fresh(None))
+
+    def test_touch(self):
+        self.disk.touch('missing', 200)
+        self.assertEqual(self.disk.get('missing'), (None, None))
+        self.disk.put('a', b'data', 100)
+        self.disk.touch('a', 200, validator='v2')
+        data, meta = self.disk.get('a')
+        self.assertEqual(data, b'data')
+        self.assertEqual(meta['expires'], 200)
+        self.assertEqual(meta['validator'], 'v2')
+
+    def test_prune_removes_least_recently_used(self):
+        self.disk.put('a', b'aaaa', 100)
+        self.disk.put('b', b'bbbb', 100)
+        os.utime(self.disk._data_path('a'), (1, 1))
+        os.utime(self.disk._data_path('b'), (2, 2))
+        self.disk.put('c', b'cccc', 100)
+        self.assertEqual(self.disk.get('a'), (None, None))
+        self.assertEqual(self.disk.get('b')[0], b'bbbb')
+        self.assertEqual(self.disk.get('c')[0], b'cccc')
+        self.assertFalse(os.path.exists(self.disk._meta_path('a')))
+
+
+if __name__ == '__main__':
+    unittest.main()
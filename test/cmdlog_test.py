@@ -0,0 +1,64 @@
+from __future__ import unicode_literals
+
+import gzip
+import os
+import unittest
+
+from cola import core
+from cola.models import cmdlog
+
+from test import helper
+
+
+class CommandLogTestCase(unittest.TestCase):
+    """Tests the command log's ring buffer."""
+
+    def test_messages_are_batched(self):
+        log = cmdlog.CommandLog(maxlines=100)
+        self.assertTrue(log.append('one', now=0))
+        self.assertFalse(log.append('two\nthree', now=0))
+        self.assertFalse(log.append('', now=0))
+        pending = log.take_pending()
+        self.assertEqual(pending[1:3], ['one', ''])
+        self.assertEqual(pending[4:], ['two', 'three', ''])
+        self.assertEqual(log.take_pending(), [])
+        self.assertTrue(log.append('four', now=0))
+
+    def test_lines_are_capped(self):
+        log = cmdlog.CommandLog(maxlines=10)
+        for i in range(20):
+            log.append('message %d' % i, now=0)
+        lines = log.lines()
+        self.assertEqual(len(lines), 10)
+        self.assertEqual(lines[-2], 'message 19')
+        # Pending lines are not capped so nothing is lost from the history
+        self.assertEqual(len(log.take_pending()), 60)
+
+
+class RotatingFileTestCase(helper.TmpPathTestCase):
+    """Tests the rotating history file."""
+
+    def test_history_is_rotated(self):
+        path = self.test_path('log', 'git-cola.log')
+        history = cmdlog.RotatingFile(path, maxbytes=100, backups=2)
+        log = cmdlog.CommandLog(maxlines=10, history=history)
+        for i in range(3):
+            log.append('x' * 120 + '%d' % i, now=0)
+            log.take_pending()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(history.backup_path(3)))
+        newest = gzip.open(history.backup_path(1), 'rb')
+        try:
+            text = core.decode(newest.read())
+        finally:
+            newest.close()
+        self.assertTrue(('x' * 120 + '2') in text)
+        self.assertTrue(os.path.exists(history.backup_path(2)))
+
+        log.append('small', now=0)
+        log.take_pending()
+        self.assertTrue('small' in core.read(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,12 @@
 #!/usr/bin/env python
 # -*- encoding: utf-8 -*-
 from __future__ import unicode_literals
+import threading
 import unittest
 
 
 from cola import cmds
+from cola.models import main
 from cola.compat import unichr
 
 
@@ -29,5 +31,102 @@ class CmdsTestCase(unittest.TestCase):
         self.assertEqual(expect, actual)
 
 
+class QueuedCommand(object):
+
+    ASYNC = True
+
+    def __init__(self, log, name, error=None):
+        self.log = log
+        self.name = name
+        self.error = error
+
+    def do(self):
+        self.log.append(self.name)
+        if self.error:
+            raise Exception(self.error)
+
+
+class NotifyingCommand(QueuedCommand):
+
+    def do(self):
+        QueuedCommand.do(self)
+        main.model().notify_observers('queue-test')
+
+
+class CommandQueueTestCase(unittest.TestCase):
+    """Tests running commands in the background"""
+
+    def test_commands_run_in_order(self):
+        ran = []
+        errors = []
+        idle = threading.Event()
+        queue = cmds.CommandQueue()
+        queue.start(finished=lambda cmd, error: errors.append(error),
+                    idle=idle.set)
+        self.assertTrue(queue.enabled())
+        self.assertFalse(queue.in_worker())
+        for name in ('a', 'b', 'c'):
+            queue.submit(QueuedCommand(ran, name))
+        queue.wait()
+        self.assertEqual(ran, ['a', 'b', 'c'])
+        self.assertEqual(errors, [None, None, None])
+        idle.wait(5.0)
+        self.assertTrue(idle.is_set())
+
+    def test_errors_are_reported(self):
+        ran = []
+        errors = []
+        queue = cmds.CommandQueue()
+        queue.start(finished=lambda cmd, error: errors.append(error))
+        queue.submit(QueuedCommand(ran, 'a', error='failed'))
+        queue.submit(QueuedCommand(ran, 'b'))
+        queue.wait()
+        self.assertEqual(ran, ['a', 'b'])
+        self.assertTrue('failed' in errors[0][0])
+        self.assertEqual(errors[1], None)
+
+    def test_failing_callbacks_do_not_stop_the_queue(self):
+        ran = []
+
+        def fail(*args):
+            raise Exception('callback failed')
+
+        queue = cmds.CommandQueue()
+        queue.start(started=fail, finished=fail, idle=fail)
+        queue.submit(QueuedCommand(ran, 'a'))
+        queue.wait()
+        queue.submit(QueuedCommand(ran, 'b'))
+        queue.wait()
+        self.assertEqual(ran, ['a', 'b'])
+
+    def test_failing_observers_do_not_stop_the_queue(self):
+        ran = []
+        errors = []
+
+        def fail():
+            raise Exception('observer failed')
+
+        model = main.model()
+        model.add_observer('queue-test', fail)
+        try:
+            queue = cmds.CommandQueue()
+            queue.start(finished=lambda cmd, error: errors.append(error))
+            queue.submit(NotifyingCommand(ran, 'a'))
+            queue.wait()
+            queue.submit(QueuedCommand(ran, 'b'))
+            queue.wait()
+        finally:
+            model.remove_observer(fail)
+        self.assertEqual(ran, ['a', 'b'])
+        self.assertTrue('observer failed' in errors[1][0])
+
+    def test_read_only_commands_do_not_wait(self):
+        self.assertFalse(cmds.Diff.MUTATES)
+        self.assertFalse(cmds.DiffStaged.MUTATES)
+        self.assertFalse(cmds.ResetMode.MUTATES)
+        self.assertTrue(cmds.Commit.MUTATES)
+        self.assertTrue(cmds.Stage.MUTATES)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 # -*- encoding: utf-8 -*-
 from __future__ import unicode_literals
+import os
 import unittest
 
 from cola import core
@@ -35,5 +36,62 @@ class CoreColaUnicodeTestCase(unittest.TestCase):
         self.assertEqual(expect, actual)
 
 
+class StreamCommandTestCase(helper.TmpPathTestCase):
+    """Tests streaming command output to a file"""
+
+    def setUp(self):
+        helper.TmpPathTestCase.setUp(self)
+        self.path = self.test_path('output')
+        self.data = b'\xff\xfe binary \x00 data\n' * 1000
+        self.write_bytes('input', self.data)
+        core.run_command(['git', 'init'])
+        status, out, err = core.run_command(['git', 'hash-object', '-w',
+                                             '--no-filters', 'input'])
+        self.cat = ['git', 'cat-file', 'blob', out.strip()]
+
+    def write_bytes(self, path, data):
+        with open(self.test_path(path), 'wb') as fp:
+            fp.write(data)
+
+    def tmp_files(self):
+        return [name for name in os.listdir(self.test_path())
+                if name.endswith('.tmp')]
+
+    def test_stream_command(self):
+        written = []
+        status, err = core.stream_command(self.cat, self.path,
+                                          progress=written.append,
+                                          chunk_size=4096)
+        self.assertEqual(status, 0)
+        with open(self.path, 'rb') as fp:
+            self.assertEqual(fp.read(), self.data)
+        self.assertEqual(written[-1], len(self.data))
+        self.assertTrue(len(written) > 1)
+
+    def test_stream_command_cancelled(self):
+        self.write_bytes('output', b'old')
+        status, err = core.stream_command(self.cat, self.path,
+                                          cancelled=lambda: True)
+        self.assertEqual(status, None)
+        with open(self.path, 'rb') as fp:
+            self.assertEqual(fp.read(), b'old')
+        self.assertEqual(self.tmp_files(), [])
+
+    def test_stream_command_failure(self):
+        status, err = core.stream_command(['git', 'cat-file', 'blob', 'x'],
+                                          self.path)
+        self.assertNotEqual(status, 0)
+        self.assertTrue(err)
+        self.assertFalse(core.exists(self.path))
+        self.assertEqual(self.tmp_files(), [])
+
+    def test_stream_command_keeps_the_file_mode(self):
+        self.write_bytes('output', b'old')
+        os.chmod(self.path, 0o640)
+        status, err = core.stream_command(self.cat, self.path)
+        self.assertEqual(status, 0)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o640)
+
+
 if __name__ == '__main__':
     unittest.main()
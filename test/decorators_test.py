@@ -0,0 +1,105 @@
+from __future__ import unicode_literals
+
+import threading
+import time
+import unittest
+
+from cola.decorators import memoize
+
+
+class MemoizeTestCase(unittest.TestCase):
+    """Tests the memoize decorator."""
+
+    def setUp(self):
+        self.calls = []
+
+    def square(self, x):
+        self.calls.append(x)
+        return x * x
+
+    def test_memoize(self):
+        square = memoize(self.square)
+        self.assertEqual(square(2), 4)
+        self.assertEqual(square(2), 4)
+        self.assertEqual(self.calls, [2])
+        info = square.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+        self.assertEqual(info.maxsize, None)
+        self.assertEqual(info.currsize, 1)
+
+    def test_decorator_with_options(self):
+        @memoize(maxsize=2)
+        def identity(x, suffix=''):
+            self.calls.append(x)
+            return x + suffix
+        self.assertEqual(identity('a', suffix='!'), 'a!')
+        self.assertEqual(identity('a', suffix='!'), 'a!')
+        self.assertEqual(identity.__name__, 'identity')
+        self.assertEqual(self.calls, ['a'])
+
+    def test_lru_eviction(self):
+        square = memoize(self.square, maxsize=2)
+        square(1)
+        square(2)
+        square(1)
+        square(3)  # evicts 2, the least recently used
+        square(1)
+        square(2)
+        self.assertEqual(self.calls, [1, 2, 3, 2])
+        self.assertEqual(square.cache_info().currsize, 2)
+
+    def test_ttl(self):
+        square = memoize(self.square, ttl=0.05)
+        square(2)
+        square(2)
+        self.assertEqual(self.calls, [2])
+        time.sleep(0.1)
+        square(2)
+        self.assertEqual(self.calls, [2, 2])
+
+    def test_invalidate(self):
+        square = memoize(self.square)
+        square(2)
+        square(3)
+        square.invalidate(2)
+        square(2)
+        square(3)
+        self.assertEqual(self.calls, [2, 3, 2])
+
+        square.cache_clear()
+        self.assertEqual(square.cache_info().currsize, 0)
+        self.assertEqual(square.cache_info().hits, 0)
+
+    def test_none_is_cached(self):
+        @memoize
+        def nothing():
+            self.calls.append(None)
+        nothing()
+        nothing()
+        self.assertEqual(self.calls, [None])
+
+    def test_concurrent_calls_run_once(self):
+        lock = threading.Lock()
+        objects = []
+
+        @memoize
+        def singleton():
+            time.sleep(0.01)
+            return object()
+
+        def worker():
+            value = singleton()
+            with lock:
+                objects.append(value)
+
+        threads = [threading.Thread(target=worker) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(objects), 8)
+        self.assertEqual(len(set(id(obj) for obj in objects)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@ from __future__ import unicode_literals
 import unittest
 
 from cola import core
+from cola import diffparse
 from cola.diffparse import _parse_range_str, DiffParser
 
 from test import helper
@@ -121,6 +122,31 @@ class ParseDiffTestCase(unittest.TestCase):
                          '-first\n'
                          '-second\n')
 
+    def test_hunk_index(self):
+        fixture_path = helper.fixture('diff.txt')
+        parser = DiffParser('cola/diffparse.py', core.read(fixture_path))
+        self.assertEqual(parser.hunk_index(0), 0)
+        self.assertEqual(parser.hunk_index(22), 0)
+        self.assertEqual(parser.hunk_index(23), 1)
+        self.assertEqual(parser.hunk_index(40), 1)
+        self.assertEqual(parser.hunk_index(41), 2)
+        self.assertEqual(parser.hunk_index(1000), 2)
+
+    def test_generate_hunk_patch(self):
+        fixture_path = helper.fixture('diff.txt')
+        parser = DiffParser('cola/diffparse.py', core.read(fixture_path))
+        hunk = parser.hunks[1]
+        self.assertEqual(parser.generate_hunk_patch(30),
+                         parser.generate_patch(hunk.first_line_idx,
+                                               hunk.last_line_idx))
+
+    def test_diff_parser_is_reused(self):
+        diff_text = core.read(helper.fixture('diff.txt'))
+        parser = diffparse.diff_parser('cola/diffparse.py', diff_text)
+        self.assertTrue(
+            parser is diffparse.diff_parser('cola/diffparse.py', diff_text))
+        self.assertFalse(parser is diffparse.diff_parser('other', diff_text))
+
 
 class ParseRangeStrTestCase(unittest.TestCase):
     def test_parse_range_str(self):
@@ -3,6 +3,7 @@
 """
 from __future__ import unicode_literals
 
+import os
 import time
 import signal
 import unittest
@@ -124,6 +125,16 @@ class GitCommandTest(unittest.TestCase):
 
         signal.signal(signal.SIGALRM, prev_handler)
 
+    def test_commands_run_in_a_new_session(self):
+        """Test that git runs detached from our terminal session"""
+        if WIN32:
+            # os.getsid() is not available on Windows
+            return
+        code = 'import os; print(os.getsid(0))'
+        status, out, err = git.Git.execute(['python', '-c', code])
+        self.assertEqual(status, 0)
+        self.assertNotEqual(int(out), os.getsid(0))
+
 
 if __name__ == '__main__':
     unittest.main()
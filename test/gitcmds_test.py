@@ -3,6 +3,7 @@ from __future__ import unicode_literals
 import os
 import unittest
 
+from cola import core
 from cola import gitcmds
 from cola import gitcfg
 
@@ -32,6 +33,43 @@ class GitCmdsTestCase(helper.GitRepositoryTestCase):
         self.git('remote', 'rm', 'origin')
         self.assertEqual(gitcmds.branch_list(remote=True), [])
 
+    def test_ref_state(self):
+        """Test ref_state() and its upstream tracking info."""
+        self.git('remote', 'add', 'origin', '.')
+        self.git('fetch', 'origin')
+        self.git('branch', '--set-upstream-to=origin/master')
+        self.git('tag', 'v1')
+        self.git('commit', '--allow-empty', '-m', 'ahead')
+
+        state = gitcmds.ref_state()
+        self.assertEqual(state.local_branches, ['master'])
+        self.assertEqual(state.remote_branches, ['origin/master'])
+        self.assertEqual(state.tags, ['v1'])
+        self.assertEqual(state.remotes, ['origin'])
+        self.assertEqual(state.upstream('master'), 'origin/master')
+        self.assertEqual(state.tracking['master'], (1, 0))
+        self.assertEqual(state.sha1('refs/heads/master'),
+                         self.git('rev-parse', 'HEAD').decode('ascii'))
+        self.assertEqual(state.head, state.sha1('refs/heads/master'))
+
+    def test_ref_state_detached_head(self):
+        """Test that ref_state() reads a detached HEAD."""
+        self.git('commit', '--allow-empty', '-m', 'second')
+        sha1 = self.git('rev-parse', 'HEAD^').decode('ascii')
+        self.git('checkout', '-q', sha1)
+        self.assertEqual(gitcmds.ref_state().head, sha1)
+
+    def test_ref_state_is_cached_until_refs_change(self):
+        """Test that ref_state() is reused until a ref changes."""
+        state = gitcmds.ref_state()
+        self.assertTrue(gitcmds.ref_state() is state)
+        self.git('branch', 'topic')
+        state = gitcmds.ref_state()
+        self.assertEqual(state.local_branches, ['master', 'topic'])
+        self.git('pack-refs', '--all')
+        self.git('branch', '-D', 'topic')
+        self.assertEqual(gitcmds.ref_state().local_branches, ['master'])
+
     def test_default_remote(self):
         """Test default_remote()."""
         self.assertEqual(gitcmds.default_remote(config=self.config), None)
@@ -63,6 +101,37 @@ class GitCmdsTestCase(helper.GitRepositoryTestCase):
         self.touch('C', 'D', 'E')
         self.assertEqual(gitcmds.untracked_files(), ['C', 'D', 'E'])
 
+    def test_untracked_directories(self):
+        """Test untracked_directories()."""
+        os.makedirs(os.path.join('u', 's', 't'))
+        self.touch('C', 'u/x', 'u/s/y', 'u/s/t/z')
+        self.assertEqual(gitcmds.untracked_files(directory=True),
+                         ['C', 'u/'])
+        self.assertEqual(gitcmds.untracked_directories([]),
+                         ['C', 'u/'])
+        self.assertEqual(gitcmds.untracked_directories(['u/']),
+                         ['C', 'u/s/', 'u/x'])
+        self.assertEqual(gitcmds.untracked_directories(['u/s/', 'u/']),
+                         ['C', 'u/s/t/', 'u/s/y', 'u/x'])
+
+    def test_untracked_directories_skip_empty_and_ignored(self):
+        """Test that empty and ignored-only directories are omitted."""
+        os.makedirs('empty')
+        os.makedirs('build')
+        self.touch('C', 'build/a.o')
+        self.write_file('.gitignore', '*.o\n')
+        self.assertEqual(gitcmds.untracked_files(directory=True),
+                         ['.gitignore', 'C'])
+        self.assertEqual(gitcmds.untracked_directories([]),
+                         ['.gitignore', 'C'])
+
+    def test_collapse_untracked(self):
+        """Test collapse_untracked()."""
+        paths = ['a/b/c', 'a/b/d', 'a/e', 'a/f/g']
+        self.assertEqual(gitcmds.collapse_untracked(paths), ['a/'])
+        self.assertEqual(gitcmds.collapse_untracked(paths, prefix='a/'),
+                         ['a/b/', 'a/e', 'a/f/'])
+
     def test_all_files(self):
         self.touch('other-file')
         all_files = gitcmds.all_files()
@@ -121,6 +190,77 @@ class GitCmdsTestCase(helper.GitRepositoryTestCase):
         self.assertEqual(remote, ['origin/a', 'origin/b', 'origin/c', 'origin/master'])
         self.assertEqual(tags, ['d', 'e', 'f'])
 
+    def test_diff_helper_cache(self):
+        """Test that diff_helper() reuses and invalidates cached diffs"""
+        gitcmds.clear_diff_cache()
+        self.write_file('A', 'a\n')
+        diff = gitcmds.diff_helper(filename='A', cached=False)
+        self.assertTrue('+a' in diff)
+        self.assertEqual(len(gitcmds._diff_cache), 1)
+        self.assertEqual(gitcmds.diff_helper(filename='A', cached=False), diff)
+        self.assertEqual(len(gitcmds._diff_cache), 1)
+
+        # Modifying the file changes its identity
+        self.append_file('A', 'bb\n')
+        diff = gitcmds.diff_helper(filename='A', cached=False)
+        self.assertTrue('+bb' in diff)
+
+        gitcmds.invalidate_diff_cache('A')
+        self.assertEqual(len(gitcmds._diff_cache), 0)
+
+    def test_tree_entries(self):
+        """Test reading one level of a tree at a time."""
+        core.makedirs('dir/sub')
+        self.touch('dir/sub/C', 'dir/D')
+        self.git('add', 'dir')
+        self.git('commit', '-m', 'add dir')
+        root = self.git('rev-parse', 'HEAD^{tree}').decode('ascii')
+        entries = gitcmds.tree_entries(root)
+        names = [(objtype, name) for mode, objtype, sha1, name in entries]
+        self.assertEqual(names, [('blob', 'A'), ('blob', 'B'),
+                                 ('tree', 'dir')])
+
+        subtree = entries[-1][2]
+        names = [name for mode, objtype, sha1, name
+                 in gitcmds.tree_entries(subtree)]
+        self.assertEqual(names, ['D', 'sub'])
+
+        # Trees are immutable so their entries are cached by object id
+        self.assertTrue(gitcmds.tree_entries(root) is entries)
+
+    def test_pathspec_op(self):
+        """Test running git over many paths with a single process."""
+        paths = ['file %d' % i for i in range(2000)] + ['*']
+        self.touch(*paths)
+        status, out, err = gitcmds.pathspec_op('add', paths)
+        self.assertEqual(status, 0)
+        staged = gitcmds.diff_index_filenames('HEAD')
+        self.assertEqual(len(staged), len(paths))
+
+        status, out, err = gitcmds.unstage_paths(paths[:1000])
+        staged = gitcmds.diff_index_filenames('HEAD')
+        self.assertEqual(len(staged), len(paths) - 1000)
+
+        self.assertEqual(gitcmds.pathspec_op('reset', []), (0, '', ''))
+
+    def test_sliced_op(self):
+        """Test the fallback used by older versions of git."""
+        calls = []
+        def map_fn(items):
+            calls.append(len(items))
+            return (len(calls) - 1, 'out', '')
+        status, out, err = gitcmds.sliced_op(list(range(1000)), map_fn)
+        self.assertEqual(calls, [436, 436, 128])
+        self.assertEqual(status, 2)
+        self.assertEqual(out, 'out\nout\nout')
+
+    def test_untrack_paths(self):
+        """Test removing paths from the index."""
+        status, out, err = gitcmds.untrack_paths(['A'])
+        self.assertEqual(status, 0)
+        self.assertEqual(gitcmds.diff_index_filenames('HEAD'), ['A'])
+        self.assertTrue(os.path.exists('A'))
+
 
 if __name__ == '__main__':
     unittest.main()
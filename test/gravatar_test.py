@@ -1,9 +1,25 @@
 #!/usr/bin/env python
 from __future__ import unicode_literals
 
+import threading
+import time
 import unittest
+try:
+    from http.server import BaseHTTPRequestHandler
+    from http.server import HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler
+    from BaseHTTPServer import HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from PyQt4 import QtCore
+from PyQt4 import QtGui
+
 from cola import gravatar
 
+from test import helper
+
 
 class GravatarTestCase(unittest.TestCase):
 
@@ -13,6 +29,186 @@ class GravatarTestCase(unittest.TestCase):
         actual = gravatar.Gravatar.url_for_email(email, 64)
         self.assertEqual(expect, actual)
 
+    def test_url_for_email_base_url(self):
+        email = 'email@example.com'
+        actual = gravatar.Gravatar.url_for_email(
+                email, 32, base_url='http://localhost/avatar/')
+        self.assertTrue(actual.startswith(
+                'http://localhost/avatar/5658ffccee7f0ebfda2b226238b1eb6e?s=32'))
+
+    def test_identicon_cells(self):
+        cells, color = gravatar.identicon_cells('email@example.com')
+        self.assertEqual((cells, color),
+                         gravatar.identicon_cells(' Email@Example.com '))
+        for row, col in cells:
+            self.assertTrue((row, 4 - col) in cells)
+        self.assertEqual(len(color), 3)
+        self.assertNotEqual(cells,
+                            gravatar.identicon_cells('other@example.com')[0])
+
+
+class AvatarServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class AvatarHandler(BaseHTTPRequestHandler):
+    """Serves the responses queued on the server"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.seen.append((self.path, self.headers.get('If-None-Match')))
+            if server.responses:
+                status, headers, body = server.responses.pop(0)
+            else:
+                status, headers, body = server.default
+        server.release.wait(10.0)
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class AvatarServiceTestCase(helper.TmpPathTestCase):
+    """Tests AvatarService against a local HTTP server."""
+
+    def setUp(self):
+        helper.TmpPathTestCase.setUp(self)
+        self.app = (QtGui.QApplication.instance() or
+                    QtGui.QApplication(['gravatar_test']))
+        self.server = AvatarServer(('127.0.0.1', 0), AvatarHandler)
+        self.server.lock = threading.Lock()
+        self.server.seen = []
+        self.server.responses = []
+        self.server.default = (200, [('ETag', '"v1"')], self.image())
+        self.server.release = threading.Event()
+        self.server.release.set()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.ready = []
+        self.service = self.new_service()
+
+    def tearDown(self):
+        self.server.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+        helper.TmpPathTestCase.tearDown(self)
+
+    def new_service(self):
+        base_url = 'http://127.0.0.1:%d/avatar/' % self.server.server_port
+        service = gravatar.AvatarService(cache_dir=self.test_path('avatars'),
+                                         base_url=base_url)
+        service.connect(service, gravatar.AvatarService.AVATAR_READY,
+                        lambda *args: self.ready.append(args))
+        return service
+
+    @staticmethod
+    def image():
+        pixmap = QtGui.QPixmap(4, 4)
+        pixmap.fill(QtCore.Qt.red)
+        data = QtCore.QByteArray()
+        buf = QtCore.QBuffer(data)
+        buf.open(QtCore.QIODevice.WriteOnly)
+        pixmap.save(buf, 'PNG')
+        buf.close()
+        return bytes(data)
+
+    def wait_until(self, condition, timeout=5.0):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline:
+            self.app.processEvents(QtCore.QEventLoop.AllEvents, 50)
+        return condition()
+
+    def wait_for_avatars(self, count):
+        self.assertTrue(self.wait_until(lambda: len(self.ready) >= count))
+
+    def meta(self, email, size=32):
+        return self.service.disk.get(self.service.key(email, size))[1]
+
+    def test_etag_revalidation(self):
+        email = 'a@example.com'
+        self.assertEqual(self.service.avatar(email, 32), None)
+        self.wait_for_avatars(1)
+        self.assertFalse(self.ready[0][2].isNull())
+        self.assertEqual(self.meta(email)['validator'], '"v1"')
+        self.assertEqual(self.server.seen[0][1], None)
+
+        # Expire the entry; a new service serves it from disk at once
+        # and revalidates it in the background
+        key = self.service.key(email, 32)
+        self.service.disk.touch(key, time.time() - 1, validator='"v1"')
+        # The ETag that was sent is kept when the 304 omits it
+        self.server.responses.append((304, [], b''))
+        self.service = self.new_service()
+        pixmap = self.service.avatar(email, 32)
+        self.assertFalse(pixmap.isNull())
+        self.wait_for_avatars(2)
+        self.assertEqual(self.server.seen[1][1], '"v1"')
+        self.assertFalse(self.ready[1][2].isNull())
+        meta = self.meta(email)
+        self.assertTrue(self.service.disk.is_fresh(meta))
+        self.assertEqual(meta['validator'], '"v1"')
+
+    def test_max_age(self):
+        image = self.image()
+        self.server.responses.append(
+                (200, [('Cache-Control', 'max-age=7200')], image))
+        self.server.responses.append(
+                (200, [('Cache-Control', 'max-age=5')], image))
+        self.server.responses.append((200, [], image))
+        now = time.time()
+        for email in ('a@example.com', 'b@example.com', 'c@example.com'):
+            self.service.avatar(email, 32)
+            self.wait_for_avatars(len(self.ready) + 1)
+        service = gravatar.AvatarService
+        expected = (('a@example.com', 7200),
+                    ('b@example.com', service.MIN_MAX_AGE),
+                    ('c@example.com', service.DEFAULT_MAX_AGE))
+        for email, max_age in expected:
+            expires = self.meta(email)['expires']
+            self.assertTrue(now + max_age - 1 <= expires)
+            self.assertTrue(expires <= time.time() + max_age + 1)
+
+    def test_failures_fall_back_to_identicons(self):
+        self.server.responses.append((500, [], b'error'))
+        self.assertEqual(self.service.avatar('a@example.com', 32), None)
+        self.wait_for_avatars(1)
+        self.assertFalse(self.ready[0][2].isNull())
+        self.assertTrue(self.service.offline())
+
+        # While backing off, avatars are identicons and nothing is fetched
+        pixmap = self.service.avatar('b@example.com', 32)
+        self.assertFalse(pixmap.isNull())
+        self.service.prefetch(['c@example.com'], 32)
+        self.assertEqual(len(self.server.seen), 1)
+
+        self.service.failed_at -= gravatar.AvatarService.RETRY_DELAY
+        self.assertFalse(self.service.offline())
+
+    def test_request_limit(self):
+        self.server.release.clear()
+        emails = ['%d@example.com' % i for i in range(6)]
+        self.service.prefetch(emails, 32)
+        limit = gravatar.AvatarService.MAX_REQUESTS
+        self.assertTrue(self.wait_until(
+                lambda: len(self.server.seen) >= limit))
+        self.wait_until(lambda: False, timeout=0.2)
+        self.assertEqual(len(self.server.seen), limit)
+        self.assertEqual(len(self.service.requests), limit)
+        self.assertEqual(len(self.service.queue), len(emails) - limit)
+
+        self.server.release.set()
+        self.wait_for_avatars(len(emails))
+        self.assertEqual(len(self.server.seen), len(emails))
+        self.assertEqual(sorted(args[0] for args in self.ready),
+                         sorted(emails))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals
+
+import sys
+import unittest
+
+from cola import lazy
+
+
+class LazyTestCase(unittest.TestCase):
+    """Tests the cola.lazy module."""
+
+    def setUp(self):
+        sys.modules.pop('colorsys', None)
+
+    def test_module_is_imported_on_first_use(self):
+        colorsys = lazy.module('colorsys')
+        self.assertFalse('colorsys' in sys.modules)
+        self.assertEqual(colorsys.rgb_to_hsv(0, 0, 0), (0, 0, 0))
+        self.assertTrue('colorsys' in sys.modules)
+
+    def test_function_defers_import_until_called(self):
+        colorsys = lazy.module('colorsys')
+        rgb_to_hsv = lazy.function(colorsys, 'rgb_to_hsv')
+        self.assertFalse('colorsys' in sys.modules)
+        self.assertEqual(rgb_to_hsv(0, 0, 0), (0, 0, 0))
+        self.assertTrue('colorsys' in sys.modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,8 +3,10 @@ from __future__ import unicode_literals
 import os
 import unittest
 
+from cola import compat
 from cola import core
 from cola.models import main
+from cola.models import snapshot
 
 from test import helper
 
@@ -73,6 +75,22 @@ class MainModelTestCase(helper.GitRepositoryTestCase):
         self.model.update_status()
         self.assertEqual(self.model.tags, ['test'])
 
+    def test_defer_updates(self):
+        """Test collapsing refreshes into one."""
+        updates = []
+        self.model.add_observer(self.model.message_updated,
+                                lambda: updates.append(True))
+        with self.model.defer_updates():
+            self.model.stage_paths(['A'])
+            with self.model.defer_updates():
+                self.model.update_file_status()
+            self.model.update_file_status()
+            self.assertEqual(updates, [])
+        self.assertEqual(updates, [True])
+
+        self.model.update_file_status()
+        self.assertEqual(updates, [True, True])
+
 
 class RemoteArgsTestCase(unittest.TestCase):
 
@@ -158,21 +176,65 @@ class RemoteArgsTestCase(unittest.TestCase):
         self.assertTrue(kwargs['tags'])
         self.assertFalse(kwargs['rebase'])
 
-    def test_run_remote_action(self):
-
-        def passthrough(*args, **kwargs):
-            return (args, kwargs)
 
-        (args, kwargs) = \
-            main.run_remote_action(passthrough,
-                                   self.remote,
-                                   local_branch=self.local_branch,
-                                   remote_branch=self.remote_branch)
+class SnapshotTestCase(helper.GitRepositoryTestCase):
+    """Tests saving and restoring status snapshots."""
 
-        self.assertEqual(args, (self.remote, 'remote:local'))
-        self.assertTrue(kwargs['verbose'])
-        self.assertFalse(kwargs['tags'])
-        self.assertFalse(kwargs['rebase'])
+    def setUp(self):
+        helper.GitRepositoryTestCase.setUp(self)
+        self.cache_home = core.getenv('XDG_CACHE_HOME')
+        compat.setenv('XDG_CACHE_HOME', self.test_path('.cache'))
+        self.write_file('A', 'change')
+        self.write_file('C', 'C')
+        self.append_file(os.path.join('.git', 'info', 'exclude'), '/.cache\n')
+
+    def tearDown(self):
+        if self.cache_home is None:
+            compat.unsetenv('XDG_CACHE_HOME')
+        else:
+            compat.setenv('XDG_CACHE_HOME', self.cache_home)
+        helper.GitRepositoryTestCase.tearDown(self)
+
+    def test_restore_snapshot(self):
+        main.MainModel(cwd=core.getcwd()).update_status()
+
+        model = main.MainModel(cwd=core.getcwd())
+        self.assertTrue(model.restore_snapshot())
+        self.assertEqual(model.modified, ['A'])
+        self.assertEqual(model.untracked, ['C'])
+        self.assertEqual(model.local_branches, ['master'])
+        self.assertEqual(model.currentbranch, 'master')
+
+    def test_snapshot_is_only_written_when_the_status_changes(self):
+        model = main.MainModel(cwd=core.getcwd())
+        model.update_status()
+        snapshot_path = snapshot.path(model.git)
+        self.assertTrue(core.exists(snapshot_path))
+
+        core.unlink(snapshot_path)
+        model.update_status()
+        self.assertFalse(core.exists(snapshot_path))
+
+        self.write_file('D', 'D')
+        model.update_status()
+        self.assertTrue(core.exists(snapshot_path))
+
+    def test_snapshot_is_ignored_after_head_changes(self):
+        main.MainModel(cwd=core.getcwd()).update_status()
+        self.git('commit', '--allow-empty', '-m', 'empty')
+
+        model = main.MainModel(cwd=core.getcwd())
+        self.assertFalse(model.restore_snapshot())
+        self.assertEqual(model.modified, [])
+
+    def test_snapshot_is_not_restored_after_a_scan(self):
+        main.MainModel(cwd=core.getcwd()).update_status()
+        self.write_file('D', 'D')
+
+        model = main.MainModel(cwd=core.getcwd())
+        model.update_status()
+        self.assertFalse(model.restore_snapshot())
+        self.assertEqual(model.untracked, ['C', 'D'])
 
 
 if __name__ == '__main__':
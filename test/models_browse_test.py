@@ -0,0 +1,36 @@
+from __future__ import unicode_literals
+
+import unittest
+
+from cola.models.browse import PathList
+
+
+class PathListTestCase(unittest.TestCase):
+    """Tests the sorted path list used by the worktree browser."""
+
+    def setUp(self):
+        self.paths = PathList(['a-b', 'a/x', 'a/y/z', 'a/y/w', 'a.c', 'b',
+                               'c/d/e/f', 'a/y0'])
+
+    def test_children_of_root(self):
+        self.assertEqual(self.paths.children(''),
+                         (['a', 'c'], ['a-b', 'a.c', 'b']))
+
+    def test_children_of_subdirectory(self):
+        self.assertEqual(self.paths.children('a'), (['a/y'], ['a/x', 'a/y0']))
+        self.assertEqual(self.paths.children('a/y'), ([], ['a/y/w', 'a/y/z']))
+        self.assertEqual(self.paths.children('c'), (['c/d'], []))
+        self.assertEqual(self.paths.children('missing'), ([], []))
+
+    def test_add(self):
+        self.paths.add('a/0')
+        self.paths.add('a/0')
+        self.assertEqual(len(self.paths), 9)
+        self.assertTrue('a/0' in self.paths)
+        self.assertFalse('a' in self.paths)
+        self.assertEqual(self.paths.children('a'),
+                         (['a/y'], ['a/0', 'a/x', 'a/y0']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+from __future__ import unicode_literals
+
+import unittest
+
+from cola.observable import Observable
+
+
+class ObservableTestCase(unittest.TestCase):
+    """Tests the Observable class."""
+
+    def setUp(self):
+        self.observable = Observable()
+        self.calls = []
+        self.observable.add_observer('updated', self.updated)
+        self.observable.add_observer('changed', self.changed)
+
+    def updated(self):
+        self.calls.append('updated')
+
+    def changed(self, key, value=None):
+        self.calls.append(('changed', key, value))
+
+    def test_notify_observers(self):
+        self.observable.notify_observers('updated')
+        self.observable.notify_observers('changed', 'a', value=1)
+        self.assertEqual(self.calls, ['updated', ('changed', 'a', 1)])
+
+    def test_remove_observer(self):
+        self.observable.remove_observer(self.updated)
+        self.observable.notify_observers('updated')
+        self.assertEqual(self.calls, [])
+
+    def test_observer_can_remove_itself(self):
+        def once():
+            self.calls.append('once')
+            self.observable.remove_observer(once)
+        self.observable.add_observer('updated', once)
+        self.observable.notify_observers('updated')
+        self.observable.notify_observers('updated')
+        self.assertEqual(self.calls.count('once'), 1)
+        self.assertEqual(self.calls.count('updated'), 2)
+
+    def test_batch_collapses_notifications(self):
+        with self.observable.batch():
+            self.observable.notify_observers('updated')
+            self.observable.notify_observers('changed', 'a', value=1)
+            with self.observable.batch():
+                self.observable.notify_observers('updated')
+            self.observable.notify_observers('changed', 'b', value=2)
+            self.observable.notify_observers('changed', 'a', value=1)
+            self.assertEqual(self.calls, [])
+        self.assertEqual(self.calls, ['updated',
+                                      ('changed', 'b', 2),
+                                      ('changed', 'a', 1)])
+
+        self.observable.notify_observers('updated')
+        self.assertEqual(self.calls[-1], 'updated')
+        self.assertEqual(len(self.calls), 4)
+
+    def test_batch_delivers_the_final_state_last(self):
+        with self.observable.batch():
+            self.observable.notify_observers('changed', 'text', value='A')
+            self.observable.notify_observers('changed', 'text', value='B')
+            self.observable.notify_observers('changed', 'text', value='A')
+        self.assertEqual(self.calls, [('changed', 'text', 'B'),
+                                      ('changed', 'text', 'A')])
+
+    def test_batch_is_delivered_after_errors(self):
+        try:
+            with self.observable.batch():
+                self.observable.notify_observers('updated')
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual(self.calls, ['updated'])
+
+    def test_disabled_notifications_are_dropped(self):
+        with self.observable.batch():
+            self.observable.notify_observers('updated')
+            self.observable.notification_enabled = False
+        self.assertEqual(self.calls, [])
+
+    def test_unbatched_delivers_immediately(self):
+        with self.observable.batch():
+            self.observable.notify_observers('updated')
+            with self.observable.unbatched():
+                self.assertEqual(self.calls, ['updated'])
+                self.observable.notify_observers('changed', 'a', value=1)
+                self.assertEqual(self.calls, ['updated', ('changed', 'a', 1)])
+            self.observable.notify_observers('updated')
+            self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.calls,
+                         ['updated', ('changed', 'a', 1), 'updated'])
+
+    def test_unbatched_outside_of_a_batch(self):
+        with self.observable.unbatched():
+            self.observable.notify_observers('updated')
+        self.observable.notify_observers('updated')
+        self.assertEqual(self.calls, ['updated', 'updated'])
+
+
+if __name__ == '__main__':
+    unittest.main()
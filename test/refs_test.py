@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals
+
+import os
+import unittest
+
+from cola import refs
+
+from test import helper
+
+
+class RefDatabaseTestCase(helper.GitRepositoryTestCase):
+    """Tests the cola.refs module."""
+
+    def for_each_ref(self):
+        out = self.git('for-each-ref', '--format=%(refname) %(objectname)')
+        return dict(line.split(' ', 1)
+                    for line in out.decode('utf-8').splitlines())
+
+    def test_parse_packed_refs(self):
+        text = ('# pack-refs with: peeled fully-peeled sorted\n'
+                '1111 refs/heads/master\n'
+                '2222 refs/tags/v1\n'
+                '^3333\n')
+        self.assertEqual(refs.parse_packed_refs(text),
+                         {'refs/heads/master': '1111',
+                          'refs/tags/v1': '2222'})
+
+    def test_refs_match_git(self):
+        self.git('tag', '-a', '-m', 'annotated', 'v1')
+        self.git('branch', 'topic/one')
+        self.git('pack-refs', '--all')
+        self.git('commit', '--allow-empty', '-m', 'loose update')
+        self.git('branch', 'topic/two')
+        self.git('remote', 'add', 'origin', '.')
+        self.git('fetch', 'origin')
+        self.git('remote', 'set-head', 'origin', 'master')
+
+        db = refs.RefDatabase(os.path.join(self.test_path(), '.git'))
+        self.assertTrue(db.supported())
+        values = db.refs()
+        expect = self.for_each_ref()
+        origin_master = expect['refs/remotes/origin/master']
+        expect['refs/remotes/origin/HEAD'] = origin_master
+        self.assertEqual(values, expect)
+
+    def test_refs_are_reread_when_changed(self):
+        db = refs.RefDatabase(os.path.join(self.test_path(), '.git'))
+        self.assertEqual(sorted(db.refs()), ['refs/heads/master'])
+        self.git('branch', 'topic')
+        self.assertEqual(sorted(db.refs()),
+                         ['refs/heads/master', 'refs/heads/topic'])
+        self.git('branch', '-D', 'topic')
+        self.assertEqual(sorted(db.refs()), ['refs/heads/master'])
+
+    def test_worktree_uses_common_dir(self):
+        self.git('worktree', 'add', '-b', 'other', 'wt')
+        git_dir = os.path.join(self.test_path(), '.git', 'worktrees', 'wt')
+        db = refs.RefDatabase(git_dir)
+        self.assertEqual(db.common_dir,
+                         os.path.join(self.test_path(), '.git'))
+        self.assertEqual(sorted(db.refs()),
+                         ['refs/heads/master', 'refs/heads/other'])
+
+
+if __name__ == '__main__':
+    unittest.main()
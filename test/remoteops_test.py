@@ -0,0 +1,121 @@
+from __future__ import unicode_literals
+
+import unittest
+
+from cola import git
+from cola import remoteops
+from cola.interaction import Interaction
+
+from test import helper
+
+
+class ProgressTestCase(unittest.TestCase):
+    """Tests parsing git's progress meter."""
+
+    def test_parse_progress(self):
+        info = remoteops.parse_progress(
+            'origin', 'Receiving objects:  45% (450/1000), '
+                      '1.20 MiB | 2.40 MiB/s')
+        self.assertEqual(info.remote, 'origin')
+        self.assertEqual(info.phase, 'Receiving objects')
+        self.assertEqual(info.percent, 45)
+        self.assertEqual(info.done, 450)
+        self.assertEqual(info.total, 1000)
+        self.assertEqual(info.size, '1.20 MiB')
+        self.assertEqual(info.rate, '2.40 MiB/s')
+
+    def test_parse_remote_progress(self):
+        info = remoteops.parse_progress(
+            'origin', 'remote: Counting objects: 100% (3/3), done.')
+        self.assertEqual(info.phase, 'Counting objects')
+        self.assertEqual(info.percent, 100)
+        self.assertEqual(info.rate, None)
+
+    def test_parse_other_output(self):
+        self.assertEqual(remoteops.parse_progress(
+            'origin', 'To /tmp/remote.git'), None)
+
+    def test_command(self):
+        cmd = remoteops.command(remoteops.FETCH, 'origin',
+                                local_branch='local', remote_branch='remote')
+        self.assertEqual(cmd[:2], ['git', 'fetch'])
+        self.assertTrue('--progress' in cmd)
+        self.assertTrue('--verbose' in cmd)
+        self.assertEqual(cmd[-2:], ['origin', 'remote:local'])
+
+    def test_push_command_swaps_branches(self):
+        cmd = remoteops.command(remoteops.PUSH, 'origin',
+                                local_branch='local', remote_branch='remote')
+        self.assertEqual(cmd[:2], ['git', 'push'])
+        self.assertEqual(cmd[-2:], ['origin', 'local:remote'])
+
+    def test_combine(self):
+        results = [remoteops.Result('a', 0, 'out a', ''),
+                   remoteops.Result('b', 1, '', 'err b')]
+        status, out, err = remoteops.combine(results)
+        self.assertEqual(status, 1)
+        self.assertEqual(out, 'a:\nout a')
+        self.assertEqual(err, 'b:\nerr b')
+
+
+class RemoteOpsTestCase(helper.GitRepositoryTestCase):
+    """Tests running remote operations against local bare repositories."""
+
+    def setUp(self):
+        helper.GitRepositoryTestCase.setUp(self)
+        self.remotes = ['one', 'two', 'three']
+        for remote in self.remotes:
+            path = self.test_path(remote + '.git')
+            self.git('init', '--bare', path)
+            self.git('remote', 'add', remote, path)
+
+    def test_push_to_all(self):
+        updates = []
+        results = remoteops.run_all(remoteops.PUSH, self.remotes,
+                                    progress=updates.append,
+                                    local_branch='master',
+                                    remote_branch='master')
+        self.assertEqual([r.remote for r in results], self.remotes)
+        self.assertEqual([r.status for r in results], [0, 0, 0])
+        head = self.git('rev-parse', 'HEAD')
+        for remote in self.remotes:
+            path = self.test_path(remote + '.git')
+            self.assertEqual(self.git('--git-dir=' + path,
+                                      'rev-parse', 'master'), head)
+
+    def test_fetch_all(self):
+        remoteops.run_all(remoteops.PUSH, self.remotes,
+                          local_branch='master', remote_branch='master')
+        results = remoteops.run_all(remoteops.FETCH, self.remotes)
+        self.assertEqual([r.status for r in results], [0, 0, 0])
+        head = self.git('rev-parse', 'HEAD')
+        for remote in self.remotes:
+            self.assertEqual(self.git('rev-parse', remote + '/master'), head)
+
+    def test_commands_are_traced(self):
+        messages = []
+        trace = git.GIT_COLA_TRACE
+        log_status = Interaction.__dict__['log_status']
+        git.GIT_COLA_TRACE = 'trace'
+        Interaction.log_status = staticmethod(
+                lambda status, out, err: messages.append(out))
+        try:
+            remoteops.run(remoteops.FETCH, 'one')
+        finally:
+            git.GIT_COLA_TRACE = trace
+            Interaction.log_status = log_status
+        self.assertEqual(len(messages), 1)
+        self.assertTrue(messages[0].startswith('trace: git fetch'))
+
+    def test_failure_is_reported_per_remote(self):
+        self.git('remote', 'add', 'missing', self.test_path('missing.git'))
+        results = remoteops.run_all(remoteops.FETCH, ['one', 'missing'])
+        self.assertEqual(results[0].status, 0)
+        self.assertNotEqual(results[1].status, 0)
+        status, out, err = remoteops.combine(results)
+        self.assertNotEqual(status, 0)
+        self.assertTrue('missing:\n' in err)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,9 @@ from __future__ import unicode_literals
 
 import unittest
 import os
+import threading
 
+from cola.settings import PathVerifier
 from cola.settings import Settings
 
 from test import helper
@@ -72,6 +74,67 @@ class SettingsTestCase(unittest.TestCase):
         self.assertEqual(len(settings.bookmarks), 0)
         self.assertFalse(bookmark in bookmarks)
 
+    def test_remove_missing_keeps_slow_entries(self):
+        """Test that entries which do not answer in time are kept"""
+        release = threading.Event()
+        missing = '/tmp/this/does/not/exist'
+        slow = '/net/slow/repo'
+
+        def slow_verify(path):
+            if path == slow:
+                release.wait(5.0)
+                return True
+            return False
+
+        settings = self.new_settings()
+        settings.add_bookmark(missing)
+        settings.add_bookmark(slow)
+        settings.save()
+
+        settings = Settings(verify=slow_verify)
+        settings.load(check_missing=False)
+        settings.remove_missing(timeout=0.1)
+        release.set()
+        self.assertEqual(settings.bookmarks, [slow])
+
+
+class PathVerifierTestCase(unittest.TestCase):
+    """Tests the concurrent, cached repository checks"""
+
+    def setUp(self):
+        self.calls = []
+        self.verifier = PathVerifier(self.verify)
+
+    def verify(self, path):
+        self.calls.append(path)
+        return path.startswith('/ok')
+
+    def test_check(self):
+        verdicts = self.verifier.check(['/ok/a', '/missing/b'])
+        self.assertEqual(verdicts, {'/ok/a': True, '/missing/b': False})
+
+    def test_verdicts_are_cached(self):
+        self.verifier.check(['/ok/a'])
+        self.verifier.check(['/ok/a'])
+        self.assertEqual(self.calls, ['/ok/a'])
+        self.assertEqual(self.verifier.cached('/ok/a'), True)
+
+    def test_verdicts_expire(self):
+        self.verifier.ttl = -1.0
+        self.verifier.check(['/ok/a'])
+        self.assertEqual(self.verifier.cached('/ok/a'), None)
+        self.verifier.check(['/ok/a'])
+        self.assertEqual(self.calls, ['/ok/a', '/ok/a'])
+
+    def test_remember(self):
+        self.verifier.remember('/missing/b', True)
+        self.assertEqual(self.verifier.check(['/missing/b']),
+                         {'/missing/b': True})
+        self.assertEqual(self.calls, [])
+        self.verifier.forget('/missing/b')
+        self.assertEqual(self.verifier.check(['/missing/b']),
+                         {'/missing/b': False})
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals
+
+import os
+import unittest
+
+from cola import spellcheck
+
+from test import helper
+
+
+class SpellCheckTestCase(helper.TmpPathTestCase):
+    """Tests the cola.spellcheck module."""
+
+    def setUp(self):
+        helper.TmpPathTestCase.setUp(self)
+        self.write_file('words', 'hello\nworld\nspelling\nspell\n'
+                                 'international\ninternationalization\n')
+        self.write_file('names', 'David\n')
+        self.dictionaries = ((self.test_path('words'), True),
+                             (self.test_path('names'), False))
+        self.index_path = self.test_path('cache', 'spelling.idx')
+
+    def load_index(self):
+        return spellcheck.load_index(path=self.index_path,
+                                     dictionaries=self.dictionaries)
+
+    def test_contains(self):
+        index = self.load_index()
+        self.assertTrue(index.contains('hello'))
+        self.assertTrue(index.contains('Hello'))
+        self.assertTrue(index.contains('David'))
+        self.assertTrue(index.contains('internationalization'))
+        self.assertFalse(index.contains('david'))
+        self.assertFalse(index.contains('helo'))
+        self.assertFalse(index.contains('internationalizatio'))
+        index.close()
+
+    def test_suggest(self):
+        index = self.load_index()
+        self.assertEqual(index.suggest('helo'), ['hello'])
+        self.assertEqual(index.suggest('wrold'), ['world'])
+        self.assertEqual(index.suggest('speling'), ['spelling'])
+        self.assertEqual(index.suggest('intrenational'), ['international'])
+        self.assertEqual(index.suggest('hello'), ['hello'])
+        # Two substitutions
+        self.assertEqual(index.suggest('hxllx'), ['hello'])
+        self.assertEqual(index.suggest('wxrxd'), ['world'])
+        self.assertEqual(index.suggest('spxllxng'), ['spelling'])
+        self.assertEqual(index.suggest('zzzzzz'), ['zzzzzz'])
+        self.assertEqual(index.suggest('Dvid', extra_words=['Dave']),
+                         ['David'])
+        index.close()
+
+    def test_extra_words_are_indexed(self):
+        index = self.load_index()
+        extra = spellcheck.WordIndex(['prefetcher', 'refspec'])
+        self.assertEqual(index.suggest('prefetchr', extra_words=extra),
+                         ['prefetcher'])
+        self.assertEqual(index.suggest('refspec', extra_words=extra),
+                         ['refspec'])
+        self.assertEqual(extra.candidates('zzzzzz'), set())
+        index.close()
+
+    def test_open_index_does_not_build(self):
+        self.assertEqual(spellcheck.open_index(
+            path=self.index_path, dictionaries=self.dictionaries), None)
+        self.load_index().close()
+        index = spellcheck.open_index(path=self.index_path,
+                                      dictionaries=self.dictionaries)
+        self.assertTrue(index.contains('hello'))
+        index.close()
+
+    def test_word_set(self):
+        words = spellcheck.WordSet(spellcheck.read_words(self.dictionaries))
+        self.assertTrue(words.contains('Hello'))
+        self.assertFalse(words.contains('helo'))
+        self.assertEqual(words.suggest('helo'), ['hello'])
+        self.assertEqual(words.suggest('wrold'), ['world'])
+
+    def test_index_is_rebuilt_when_dictionaries_change(self):
+        index = self.load_index()
+        self.assertFalse(index.contains('cola'))
+        index.close()
+        self.append_file('words', 'cola\n')
+        # Make sure the stamp changes even on coarse mtime filesystems
+        st = os.stat('words')
+        os.utime('words', (st.st_atime, st.st_mtime + 10))
+        index = self.load_index()
+        self.assertTrue(index.contains('cola'))
+        index.close()
+
+    def test_edit_distance(self):
+        self.assertEqual(spellcheck.edit_distance('abc', 'abc'), 0)
+        self.assertEqual(spellcheck.edit_distance('abc', 'acb'), 1)
+        self.assertEqual(spellcheck.edit_distance('abc', 'abcd'), 1)
+        self.assertEqual(spellcheck.edit_distance('abc', 'xyc'), 2)
+        self.assertEqual(spellcheck.edit_distance('abc', 'xyz'), 3)
+        self.assertEqual(spellcheck.edit_distance('a', 'abcdef'), 3)
+
+
+class VocabularyTestCase(helper.GitRepositoryTestCase):
+    """Tests the project vocabulary"""
+
+    def setUp(self):
+        helper.GitRepositoryTestCase.setUp(self)
+        self.write_file('prefetch_helper.py',
+                        'def diffHelper():\n'
+                        '    pass\n'
+                        'class StatusTreeWidget(object):\n'
+                        '    pass\n')
+        self.git('add', 'prefetch_helper.py')
+        self.git('commit', '-m', 'Teach dag about reflogs')
+        self.git('commit', '--allow-empty', '-m', 'dag: reflogs, again')
+        self.path = self.test_path('cache', 'vocabulary')
+
+    def test_split_identifier(self):
+        self.assertEqual(spellcheck.split_identifier('diff_helper'),
+                         ['diff', 'helper'])
+        self.assertEqual(spellcheck.split_identifier('StatusTreeWidget'),
+                         ['Status', 'Tree', 'Widget'])
+        self.assertEqual(spellcheck.split_identifier('HTTPServer2x'),
+                         ['HTTP', 'Server'])
+
+    def test_load_vocabulary(self):
+        words = spellcheck.load_vocabulary(path=self.path)
+        self.assertTrue('prefetch_helper' in words)
+        self.assertTrue('prefetch' in words)
+        self.assertTrue('diffHelper' in words)
+        self.assertTrue('StatusTreeWidget' in words)
+        self.assertTrue('reflogs' in words)
+        self.assertTrue('dag' in words)
+        self.assertFalse('Teach' in words)
+
+    def test_load_vocabulary_is_cached(self):
+        spellcheck.load_vocabulary(path=self.path)
+        with open(self.path, 'a') as f:
+            f.write('cachedword\n')
+        words = spellcheck.load_vocabulary(path=self.path)
+        self.assertTrue('cachedword' in words)
+        self.git('commit', '--allow-empty', '-m', 'new commit')
+        words = spellcheck.load_vocabulary(path=self.path)
+        self.assertFalse('cachedword' in words)
+
+
+if __name__ == '__main__':
+    unittest.main()
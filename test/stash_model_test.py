@@ -0,0 +1,67 @@
+from __future__ import unicode_literals
+
+import os
+import unittest
+
+from cola import core
+from cola import git
+from cola.models.stash import StashModel
+
+from test import helper
+
+
+class StashModelTestCase(helper.GitRepositoryTestCase):
+    """Tests the StashModel class."""
+
+    def setUp(self):
+        helper.GitRepositoryTestCase.setUp(self)
+        StashModel._stash_lists.clear()
+        StashModel._diffs.clear()
+        self.model = StashModel()
+
+    def stash(self, name):
+        self.append_file('A', name + '\n')
+        self.git('stash', 'save', name)
+
+    def test_stash_info(self):
+        self.assertEqual(self.model.stash_info(), ([], [], []))
+        self.stash('first')
+        self.stash('second')
+        stashes, revids, names = self.model.stash_info()
+        self.assertEqual(revids, ['stash@{0}', 'stash@{1}'])
+        self.assertEqual(names, ['second', 'first'])
+        self.assertEqual(stashes[0], 'stash@{0}: On master: second')
+
+    def test_stash_list_is_reread_after_changes(self):
+        self.stash('first')
+        self.assertEqual(len(self.model.stash_list()), 1)
+        self.stash('second')
+        self.assertEqual(len(self.model.stash_list()), 2)
+        self.git('stash', 'drop')
+        self.git('stash', 'drop')
+        self.assertEqual(self.model.stash_list(), [])
+
+    def test_stash_diff_is_cached(self):
+        self.stash('first')
+        self.assertEqual(self.model.cached_stash_diff('stash@{0}'), None)
+        diff = self.model.stash_diff('stash@{0}')
+        self.assertTrue('1 file changed' in diff)
+        self.assertTrue('+first' in diff)
+        self.assertEqual(self.model.cached_stash_diff('stash@{0}'), diff)
+
+        # The older stash keeps its diff when a new stash is added
+        self.stash('second')
+        self.assertEqual(self.model.cached_stash_diff('stash@{1}'), diff)
+        self.assertEqual(self.model.cached_stash_diff('stash@{0}'), None)
+
+    def test_stash_list_in_linked_worktree(self):
+        self.stash('first')
+        self.git('worktree', 'add', '-b', 'other', 'wt')
+        os.chdir(self.test_path('wt'))
+        git.current().set_worktree(core.getcwd())
+        self.assertEqual(self.model.stash_list(),
+                         ['stash@{0}: On master: first'])
+
+
+if __name__ == '__main__':
+    unittest.main()
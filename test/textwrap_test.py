@@ -100,6 +100,24 @@ Cheered-on-by: Avoids word-wrap
         actual = self.wrap(inputs)
         self.assertEqual(expect, actual)
 
+    def test_word_wrap_after_edit(self):
+        self.limit = 8
+        text = 'aaa bbb ccc\nddd eee fff'
+        self.assertEqual(self.wrap(text), 'aaa bbb\nccc\nddd eee\nfff')
+        text = 'aaa bbb ccc\nddd eee ffff gg'
+        self.assertEqual(self.wrap(text),
+                         'aaa bbb\nccc\nddd eee\nffff gg')
+        self.limit = 4
+        self.assertEqual(self.wrap(text),
+                         'aaa\nbbb\nccc\nddd\neee\nffff\ngg')
+
+    def test_word_wrap_tabs(self):
+        self.limit = 10
+        self.tabwidth = 4
+        self.assertEqual(self.wrap('\tab cd ef'), '\tab cd\nef')
+        self.tabwidth = 8
+        self.assertEqual(self.wrap('\tab cd ef'), '\tab\ncd ef')
+
 
 if __name__ == '__main__':
     unittest.main()